@@ -0,0 +1,186 @@
+/*
+ * 蚂蚁行走内核的 C 实现，见 ant_walk.py（纯 Python 版本与此逐步一致）
+ *
+ *   python setup.py build_ext --inplace
+ *
+ * 随机数直接取自 numpy 全局 RandomState 的 BitGenerator (next_double)，
+ * 与 np.random.random_sample 消耗同一个随机数流。
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <math.h>
+#include <stdint.h>
+#include <stdlib.h>
+
+/* numpy/random/bitgen.h 中的结构 */
+typedef struct {
+    void *state;
+    uint64_t (*next_uint64)(void *st);
+    uint32_t (*next_uint32)(void *st);
+    double (*next_double)(void *st);
+    uint64_t (*next_raw)(void *st);
+} bitgen_t;
+
+#define MAX_DEGREE 9   /* 栅格节点最多 9 条边（含原地不动） */
+
+static int
+is_constrained(const int64_t *vertex, Py_ssize_t n_vertex, const int64_t *edges, Py_ssize_t n_edges,
+               int64_t actual, int64_t target, int64_t t)
+{
+    Py_ssize_t k;
+    for (k = 0; k < n_vertex; k++) {
+        if (vertex[2 * k] == target && vertex[2 * k + 1] == t)
+            return 1;
+    }
+    for (k = 0; k < n_edges; k++) {
+        if (edges[3 * k] == actual && edges[3 * k + 1] == target && edges[3 * k + 2] == t)
+            return 1;
+    }
+    return 0;
+}
+
+static PyObject *
+walk(PyObject *self, PyObject *args)
+{
+    Py_buffer offsets_buf, targets_buf, pheromone_buf, eta_buf, vertex_buf, edges_buf, stop_buf;
+    double alpha;
+    Py_ssize_t start, goal;
+    PyObject *capsule;
+    PyObject *result = NULL;
+
+    if (!PyArg_ParseTuple(args, "y*y*y*y*dnny*y*y*O", &offsets_buf, &targets_buf, &pheromone_buf, &eta_buf,
+                          &alpha, &start, &goal, &vertex_buf, &edges_buf, &stop_buf, &capsule))
+        return NULL;
+
+    const int64_t *offsets = (const int64_t *)offsets_buf.buf;
+    const int64_t *targets = (const int64_t *)targets_buf.buf;
+    const double *pheromone = (const double *)pheromone_buf.buf;
+    const double *eta_beta = (const double *)eta_buf.buf;
+    const int64_t *vertex = (const int64_t *)vertex_buf.buf;
+    const int64_t *edges = (const int64_t *)edges_buf.buf;
+    const unsigned char *stop = (const unsigned char *)stop_buf.buf;   /* 空，或每个格子一个字节：到达即停止 */
+    Py_ssize_t n_cells = offsets_buf.len / (Py_ssize_t)sizeof(int64_t) - 1;
+    Py_ssize_t n_vertex = vertex_buf.len / (Py_ssize_t)(2 * sizeof(int64_t));
+    Py_ssize_t n_edge_constraints = edges_buf.len / (Py_ssize_t)(3 * sizeof(int64_t));
+    unsigned char *visited = NULL;
+    int64_t *path = NULL;
+    Py_ssize_t length = 0, capacity = 64;
+    int reached = 0;
+    int has_stop;
+
+    bitgen_t *bitgen = (bitgen_t *)PyCapsule_GetPointer(capsule, "BitGenerator");
+    if (bitgen == NULL)
+        goto done;
+    if (start < 0 || start >= n_cells) {
+        PyErr_SetString(PyExc_ValueError, "start outside the map");
+        goto done;
+    }
+    has_stop = stop_buf.len > 0;
+    if (has_stop && stop_buf.len != n_cells) {
+        PyErr_SetString(PyExc_ValueError, "stop mask must have one byte per cell");
+        goto done;
+    }
+    visited = (unsigned char *)calloc((size_t)n_cells, 1);
+    path = (int64_t *)malloc((size_t)capacity * sizeof(int64_t));
+    if (visited == NULL || path == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+
+    int64_t actual = start;
+    int64_t t = 1;   /* 下一步到达的时间 */
+    path[length++] = actual;
+    visited[actual] = 1;
+    for (;;) {   /* 与 Python 循环相同，至少走一步后才检查是否到达终点 */
+        int64_t candidates[MAX_DEGREE];
+        double att[MAX_DEGREE], cdf[MAX_DEGREE];
+        int n = 0, i;
+        double total = 0.0;
+        if (offsets[actual + 1] - offsets[actual] > MAX_DEGREE) {
+            PyErr_SetString(PyExc_ValueError, "node with more than 9 edges");
+            goto done;
+        }
+        for (int64_t e = offsets[actual]; e < offsets[actual + 1]; e++) {
+            int64_t target = targets[e];
+            if (visited[target] ||
+                is_constrained(vertex, n_vertex, edges, n_edge_constraints, actual, target, t))
+                continue;
+            candidates[n] = target;
+            att[n] = pow(pheromone[e], alpha) * eta_beta[e];
+            total += att[n];
+            n++;
+        }
+        if (n == 0)
+            break;   /* 死胡同 */
+        double s = 0.0;
+        for (i = 0; i < n; i++) {
+            s += total > 0 ? att[i] / total : 1.0 / n;
+            cdf[i] = s;
+        }
+        double last = cdf[n - 1];
+        for (i = 0; i < n; i++)
+            cdf[i] /= last;
+        double u = bitgen->next_double(bitgen->state);
+        for (i = 0; i < n - 1 && cdf[i] <= u; i++)
+            ;
+        actual = candidates[i];
+        if (length == capacity) {
+            int64_t *grown = (int64_t *)realloc(path, (size_t)(capacity * 2) * sizeof(int64_t));
+            if (grown == NULL) {
+                PyErr_NoMemory();
+                goto done;
+            }
+            path = grown;
+            capacity *= 2;
+        }
+        path[length++] = actual;
+        visited[actual] = 1;
+        if (actual == goal || (has_stop && stop[actual])) {
+            reached = 1;
+            break;
+        }
+        t++;
+    }
+
+    PyObject *list = PyList_New(length);
+    if (list == NULL)
+        goto done;
+    for (Py_ssize_t k = 0; k < length; k++) {
+        PyObject *item = PyLong_FromLongLong(path[k]);
+        if (item == NULL) {
+            Py_DECREF(list);
+            goto done;
+        }
+        PyList_SET_ITEM(list, k, item);
+    }
+    result = Py_BuildValue("(NO)", list, reached ? Py_True : Py_False);
+
+done:
+    free(visited);
+    free(path);
+    PyBuffer_Release(&offsets_buf);
+    PyBuffer_Release(&targets_buf);
+    PyBuffer_Release(&pheromone_buf);
+    PyBuffer_Release(&eta_buf);
+    PyBuffer_Release(&vertex_buf);
+    PyBuffer_Release(&edges_buf);
+    PyBuffer_Release(&stop_buf);
+    return result;
+}
+
+static PyMethodDef methods[] = {
+    {"walk", walk, METH_VARARGS,
+     "walk(offsets, targets, pheromone, eta_beta, alpha, start, goal, vertex_constraints, edge_constraints, "
+     "stop_mask, bitgen_capsule) -> (path, reached)"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "_ant_walk", "Compiled ant walk kernel, see ant_walk.py", -1, methods
+};
+
+PyMODINIT_FUNC
+PyInit__ant_walk(void)
+{
+    return PyModule_Create(&module);
+}
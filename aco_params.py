@@ -0,0 +1,67 @@
+# 按地图类别保存/读取蚁群参数，参数文件由 tune_params.py 生成
+#
+# 地图按可通行格子数（small / medium / large）和障碍密度（open / cluttered）分类，
+# 例如 'medium-cluttered'。文件中没有的类别或键使用 DEFAULT_PARAMS。
+
+import json
+import os
+import numpy as np
+
+DEFAULT_FILE = 'aco_params.json'
+# 键与 AntColony 的参数名一致；数值为 aco_resolve_path 原来写死的参数
+DEFAULT_PARAMS = {'n_ants': 80, 'iterations': 300, 'evaporation_factor': 0.3,
+                  'pheromone_adding_constant': 100, 'alpha': 2, 'beta': 4}
+SIZE_CLASSES = ((256, 'small'), (4096, 'medium'), (None, 'large'))   # 可通行格子数上限
+CLUTTERED_DENSITY = 0.2   # 障碍比例达到该值为 'cluttered'
+
+
+def map_class(in_map):
+    """Class of a map, '<size>-<density>', the key of the parameter file"""
+    occupancy = np.asarray(in_map.occupancy_map)
+    free = int(np.count_nonzero(occupancy))
+    size = next(name for limit, name in SIZE_CLASSES if limit is None or free <= limit)
+    density = 1.0 - free / occupancy.size if occupancy.size else 0.0
+    return size + ('-cluttered' if density >= CLUTTERED_DENSITY else '-open')
+
+
+def read_param_file(filepath=DEFAULT_FILE):
+    """Contents of a parameter file ({map class: {'params': ..., ...}}), {} if it does not exist"""
+    if not os.path.exists(filepath):
+        return {}
+    with open(filepath) as f:
+        return json.load(f)
+
+
+def load_params(in_map, filepath=DEFAULT_FILE, defaults=None):
+    """
+    Recommended AntColony parameters for a map
+
+    Args:
+        in_map: Map to plan on
+        filepath: parameter file written by tune_params.py
+        defaults: parameters used for the keys the file does not give, DEFAULT_PARAMS by default
+
+    Returns:
+        dict with the keys of DEFAULT_PARAMS
+    """
+    params = dict(DEFAULT_PARAMS if defaults is None else defaults)
+    entry = read_param_file(filepath).get(map_class(in_map))
+    if entry is not None:
+        params.update({key: value for key, value in entry['params'].items() if key in params})
+    return params
+
+
+def save_params(map_class_name, params, filepath=DEFAULT_FILE, **info):
+    """
+    Stores the parameters of a map class, keeping the other classes of the file
+
+    Args:
+        map_class_name: key, see map_class()
+        params: AntColony parameters
+        info: further fields stored with them (score, cost ratio, time ...)
+    """
+    entries = read_param_file(filepath)
+    entries[map_class_name] = dict(info, params=params)
+    with open(filepath, 'w') as f:
+        json.dump(entries, f, indent=2, sort_keys=True)
+    return filepath
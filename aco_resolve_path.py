@@ -5,6 +5,13 @@ from ant_colony import AntColony
 from plot_picture import plot_picture, motion_move
 import time
 from conflict_free import do_conflict_free
+from pheromone_store import load_snapshot, save_snapshot
+from assignment import assign_goals, apply_assignment
+from telemetry import PrintSink
+from trajectory_log import TrajectoryWriter
+from aco_params import load_params, map_class
+from path_cache import PathCache
+import numpy as np
 import copy
 import os
 
@@ -31,16 +38,36 @@ if __name__ == '__main__':
     alpha = 2      # Pheromone influence factor
     beta = 4        # Heuristic influence factor
     display = True    # Whether to display the result
+    warm_start = False  # Reuse pheromone snapshots saved by previous runs
+    telemetry = PrintSink()  # Progress output, NullSink() for silent runs
+    goal_assignment = None  # None keeps the map's S/F pairing, 'sum' or 'bottleneck' re-pairs robots and goals
+    trajectory_log = 'output/runs.traj'  # Binary log the routes are appended to, None prints them instead
+    seed = None       # Random seed, recorded in the trajectory log
+    colony_sizing = None  # None walks every ant every iteration, 'adaptive' shrinks the colony once the ants converge
+    tuned_params = False  # True uses the parameters tune_params.py wrote to aco_params.json for this map class, if any
+    path_cache = None  # None always runs the colony, a file such as 'output/paths.sqlite' caches the best path of every (map, start, goal)
     
     # Available maps: 'map1.txt', 'map2.txt', 'map3.txt', 'small.txt', 'middle.txt', 'big.txt'
     map_path = 'middle.txt'  # Map file path
     
     print(f"Starting path planning with map: {map_path}")
-    print(f"Parameters: ants={ants}, iterations={iterations}, p={p}, Q={Q}")
-    
+    log = None
+    cache = None
     try:
+        if seed is not None:
+            np.random.seed(seed)
+
         # Get the map
         map = Map(map_path)
+
+        if tuned_params:
+            params = load_params(map, defaults={'n_ants': ants, 'iterations': iterations, 'evaporation_factor': p,
+                                                'pheromone_adding_constant': Q, 'alpha': alpha, 'beta': beta})
+            ants, iterations, p, Q = params['n_ants'], params['iterations'], params['evaporation_factor'], \
+                params['pheromone_adding_constant']
+            alpha, beta = params['alpha'], params['beta']
+            print(f"Map class: {map_class(map)}")
+        print(f"Parameters: ants={ants}, iterations={iterations}, p={p}, Q={Q}, alpha={alpha}, beta={beta}")
         
         if not map.initial_node or not map.final_node:
             raise ValueError("No start (S) or goal (F) positions found in the map!")
@@ -48,6 +75,25 @@ if __name__ == '__main__':
         if len(map.initial_node) != len(map.final_node):
             raise ValueError(f"Number of start positions ({len(map.initial_node)}) does not match number of goal positions ({len(map.final_node)})!")
 
+        # Optional robot-goal assignment, fewer crossing routes means fewer CBS conflicts
+        if goal_assignment is not None and len(map.initial_node) > 1:
+            assignment = assign_goals(map, goal_assignment)
+            apply_assignment(map, assignment)
+            print(f"Goal assignment ({goal_assignment}): {assignment['goals']}, "
+                  f"total {assignment['total']:.2f}, makespan {assignment['makespan']:.2f}")
+
+        if trajectory_log is not None:
+            params = {'ants': ants, 'iterations': iterations, 'p': p, 'Q': Q, 'alpha': alpha, 'beta': beta,
+                      'goal_assignment': goal_assignment}
+            log = TrajectoryWriter(trajectory_log, map, params=params, seed=seed, map_name=map_path)
+
+        if path_cache is not None:
+            os.makedirs(os.path.dirname(path_cache) or '.', exist_ok=True)
+            cache = PathCache(path_cache)
+
+        # Reachability of every robot, the component labels are computed once and shared by the copies below
+        statuses = map.check_robots()
+
         if len(map.initial_node) > 1:  # Multiple robots case
             M = []                     # Split maps for each robot
             n = len(map.initial_node)
@@ -72,18 +118,50 @@ if __name__ == '__main__':
                 # print(f"Robot {i+1} start node edges: {start_node.edges}")
                 # print(f"Robot {i+1} occupancy map at start: {w.occupancy_map[start_pos[0]][start_pos[1]]}")
                 
-                Colony = AntColony(w, ants, iterations, p, Q, alpha, beta)
+                if statuses[i] != 'ok':
+                    # The robot cannot reach its goal: it stays at its start so the others avoid it
+                    print(f"Robot {i+1} skipped, status: {statuses[i]}")
+                    route.append([tuple(M[i].initial_node)])
+                    continue
+
+                hit = cache.get(w, w.initial_node, w.final_node) if cache is not None else None
+                if hit is not None:
+                    # Same mission already planned on this map: reuse its best path
+                    route.append(hit['path'])
+                    print(f"Robot {i+1} cached path length: {hit['cost']}, time step: {len(hit['path'])}")
+                    continue
+
+                prior = load_snapshot(w, radius=1) if warm_start else None
+                if prior is None and cache is not None:
+                    prior = cache.warm_start_prior(w)   # Cached paths of neighbouring missions
+                Colony = AntColony(w, ants, iterations, p, Q, alpha, beta, pheromone_prior=prior, telemetry=telemetry,
+                                   colony_sizing=colony_sizing)
                 path = Colony.calculate_path()
+                if warm_start and path:
+                    save_snapshot(Colony)
+                if cache is not None and path:
+                    cache.put(w, w.initial_node, w.final_node, path, Colony.calculate_euclidean_distance(path))
+                if not path:
+                    print(f"Robot {i+1}: no path found, status: {Colony.status}")
+                    path = [tuple(M[i].initial_node)]
                 route.append(path)
-                print(f"Initial path for robot {i+1}: {path}")
+                if log is None:
+                    print(f"Initial path for robot {i+1}: {path}")
                 print(f"Robot {i+1} path length: {Colony.calculate_euclidean_distance(path)}, time step: {len(path)}")
             
-            print("\nAll routes before conflict resolution:", route)
+            if log is None:
+                print("\nAll routes before conflict resolution:", route)
+            else:
+                log.write_routes('initial', route)
             
             # Check and resolve conflicts
             print("\nResolving conflicts...")
-            route_sort = do_conflict_free(route, M, ants, iterations, p, Q, alpha, beta)
-            print("\nConflict-free routes:", route_sort)
+            route_sort = do_conflict_free(route, M, ants, iterations, p, Q, alpha, beta, telemetry)
+            if log is None:
+                print("\nConflict-free routes:", route_sort)
+            else:
+                log.write_routes('conflict_free', route_sort)
+                print(f"\nRoutes appended to {trajectory_log}")
 
             # Calculate time
             t1 = time.process_time()
@@ -96,19 +174,45 @@ if __name__ == '__main__':
                 motion_move(route_sort, map, save_gif=True, output_folder='output', filename='motion_animation.gif')
         else:
             print("Single robot case - no conflict resolution needed")
+            if statuses[0] != 'ok':
+                raise ValueError(f"The robot cannot reach its goal, status: {statuses[0]}")
             w = copy.deepcopy(map)
             w.initial_node = w.initial_node[0]
             w.final_node = w.final_node[0]
             w.nodes_array = w._create_nodes()   
-            Colony = AntColony(w, ants, iterations, p, Q, alpha, beta)
-            path = Colony.calculate_path()
-            print(f"Path found: {path}")
-            print(f"path length: {Colony.calculate_euclidean_distance(path)}, time step: {len(path)}")
+            hit = cache.get(w, w.initial_node, w.final_node) if cache is not None else None
+            if hit is not None:
+                path, length = hit['path'], hit['cost']
+                print("Cached path")
+            else:
+                prior = load_snapshot(w, radius=1) if warm_start else None
+                if prior is None and cache is not None:
+                    prior = cache.warm_start_prior(w)
+                Colony = AntColony(w, ants, iterations, p, Q, alpha, beta, pheromone_prior=prior, telemetry=telemetry,
+                                   colony_sizing=colony_sizing)
+                path = Colony.calculate_path()
+                length = Colony.calculate_euclidean_distance(path)
+                if warm_start:
+                    save_snapshot(Colony)
+                if cache is not None and path:
+                    cache.put(w, w.initial_node, w.final_node, path, length)
+            if log is None:
+                print(f"Path found: {path}")
+            else:
+                log.write_routes('initial', [path])
+                print(f"Path appended to {trajectory_log}")
+            print(f"path length: {length}, time step: {len(path)}")
             if display:
                 plot_picture(display=display, route=[path], n=1, map=map)
     
     except Exception as e:
         print(f"Error occurred: {str(e)}")
+    finally:
+        if log is not None:
+            log.close()
+        if cache is not None:
+            print(f"Path cache: {cache.stats}")
+            cache.close()
 
 
 
@@ -1,6 +1,13 @@
 #!/usr/bin/env python
 
+import time
 import numpy as np
+from map_class import EDGE_DIRECTIONS, edge_direction_index
+from pheromone_strategies import AntSystem, make_strategy
+from ant_walk import AntWalker
+from path_array import as_path_array, path_length, to_list
+from telemetry import NULL_SINK, PhaseTimer
+from colony_sizing import FixedSize, make_sizing
 
 class AntColony:
     ''' Class used for handling
@@ -58,7 +65,10 @@ class AntColony:
             self.remember_visited_node(self.start_pos)
             self.actual_node = self.start_pos
 
-    def __init__(self, in_map, n_ants, iterations, evaporation_factor, pheromone_adding_constant, alpha, beta, constraints=None):
+    use_walk_kernel = True   # 可以时用 ant_walk 内核行走（结果与 Python 循环完全相同），False 时始终使用下面的循环
+
+    def __init__(self, in_map, n_ants, iterations, evaporation_factor, pheromone_adding_constant, alpha, beta, constraints=None,
+                 pheromone_prior=None, update_strategy=None, telemetry=None, colony_sizing=None, rng=None):
         self.map = in_map
         self.n_ants = n_ants
         self.iterations = iterations
@@ -66,18 +76,33 @@ class AntColony:
         self.pheromone_adding_constant = pheromone_adding_constant
         self.alpha = alpha
         self.beta = beta
-        self.paths = []
-        self.ants = self.create_ants()
+        self.paths = []     # 本次迭代到达终点的路径 (PathArray)
+        self.sizing = make_sizing(colony_sizing)   # 蚁群规模策略，默认每次迭代 n_ants 只
+        self.ants = self.create_ants()              # 蚂蚁池，按最大规模创建一次
+        self.active_ants = self.sizing.initial(self)   # 本次迭代行走的蚂蚁数
+        self._stagnation = 0
         self.best_result = []
-        self.res = []
+        self.res = []       # 每次迭代的最优路径 (PathArray)
         self.shortest_route = []
+        self.run_info = {}
+        self.status = None   # 'ok' / 'no_path' / Map.robot_status 的失败原因
         self.constraints = constraints if constraints is not None else []
+        self.update_strategy = make_strategy(update_strategy)   # 信息素更新策略，默认为 Ant System
+        self.telemetry = telemetry if telemetry is not None else NULL_SINK   # 指标输出，默认不输出
+        self.timer = PhaseTimer()
+        self._walker = None   # ant_walk.AntWalker，每次运行时重新打包
+        # 选择边使用的随机数：默认为 numpy 全局随机数流 (np.random.seed 控制)，
+        # 也可以是独立的 RandomState / Generator，例如多线程中每个任务一个
+        self.rng = rng if rng is not None else np.random
+        if pheromone_prior is not None:
+            self.set_pheromone_matrix(pheromone_prior)   # 热启动：使用之前保存的信息素
 
     # 初始化n_ants只蚂蚁，每只蚂蚁都记录了始、末位置，当前位置，访问过的位置 和 是否到达目的地的flag
     def create_ants(self):
-        ''' Creates a list contain in the total number of ants specified in the initial node '''
+        ''' Creates a list contain in the total number of ants specified in the initial node
+            (the largest colony the sizing strategy may use) '''
         ants = []
-        for i in range(self.n_ants):
+        for i in range(self.sizing.max_ants(self)):
             ants.append(self.Ant(self.map.initial_node, self.map.final_node))
         return ants
     #在map-nodes_array中选择候选地点
@@ -95,9 +120,13 @@ class AntColony:
             if (edge['FinalNode'] in visited_nodes):
                 forbidden = True
             for c in self.constraints:
+                if hasattr(c, 'covers'):  # CBSRangeConstraint：一组格子 x 一个时间窗口
+                    if c.covers(edge['FinalNode'], current_time + 1):
+                        forbidden = True
+                        break
                 # 处理CBSConstraint对象
-                if hasattr(c, 'loc'):  # CBSConstraint对象
-                    if isinstance(c.loc, tuple) and len(c.loc) == 2:
+                elif hasattr(c, 'loc'):  # CBSConstraint对象
+                    if isinstance(c.loc, tuple) and len(c.loc) == 2 and isinstance(c.loc[0], tuple):
                         # 边约束
                         if (actual_node.node_pos == c.loc[0] and 
                             edge['FinalNode'] == c.loc[1] and 
@@ -126,9 +155,7 @@ class AntColony:
         total_attractiveness = 0
         for i,edge in enumerate(valid_edges):
             # 启发式因子
-            dist_to_goal = np.sqrt((actual_node.node_pos[0] - self.map.final_node[0])**2 + (actual_node.node_pos[1] - self.map.final_node[1])**2)
-            heuristic_factor = 1.0 / (edge['Distance']+ dist_to_goal) # 
-            # heuristic_factor = 1.0 / (edge['Distance'])
+            heuristic_factor = self.heuristic(actual_node, edge)
 
             attractiveness = (edge['Pheromone'] ** self.alpha) * (heuristic_factor ** self.beta)
             # attractiveness = edge['Pheromone'] ** self.alpha
@@ -146,9 +173,49 @@ class AntColony:
             
         for edge in valid_edges:
             edge['Probability'] = 0.0
-        # 随机选择下一个节点
-        return np.random.choice(edges_list,1, p)[0]['FinalNode']
+        # 随机选择下一个节点 (策略可以替换选择规则，如ACS的伪随机比例规则)
+        chosen = self.update_strategy.select_edge(edges_list, att, self.rng)
+        if chosen is None:
+            chosen = self.rng.choice(edges_list, 1, p=p)[0]
+        self.update_strategy.local_update(self, chosen)
+        return chosen['FinalNode']
+
+
+    def iter_nodes(self):
+        ''' Iterates over every node of the map '''
+        for row in self.map.nodes_array:
+            for node in row:
+                yield node
+
+    def get_node(self, node_pos):
+        ''' Returns the node at node_pos '''
+        return self.map.nodes_array[int(node_pos[0])][int(node_pos[1])]
+
+    def get_pheromone_matrix(self):
+        ''' Returns the pheromone of every edge as a (rows, cols, 9) array, 0 where there is no edge '''
+        rows = len(self.map.nodes_array)
+        cols = len(self.map.nodes_array[0]) if rows else 0
+        matrix = np.zeros((rows, cols, len(EDGE_DIRECTIONS)))
+        for row in self.map.nodes_array:
+            for node in row:
+                for edge in node.edges:
+                    k = edge_direction_index(node.node_pos, edge['FinalNode'])
+                    matrix[node.node_pos[0], node.node_pos[1], k] = edge['Pheromone']
+        return matrix
+
+    def set_pheromone_matrix(self, matrix):
+        ''' Loads the pheromone of every edge from a (rows, cols, 9) array '''
+        for row in self.map.nodes_array:
+            for node in row:
+                for edge in node.edges:
+                    k = edge_direction_index(node.node_pos, edge['FinalNode'])
+                    edge['Pheromone'] = float(matrix[node.node_pos[0], node.node_pos[1], k])
 
+    def heuristic(self, actual_node, edge):
+        ''' Heuristic desirability (eta) of taking edge from actual_node '''
+        dist_to_goal = np.sqrt((actual_node.node_pos[0] - self.map.final_node[0])**2 + (actual_node.node_pos[1] - self.map.final_node[1])**2)
+        return 1.0 / (edge['Distance']+ dist_to_goal) # 
+        # return 1.0 / (edge['Distance'])
 
     def sort_paths(self):
         ''' Sorts the paths based on their Euclidean distance '''
@@ -181,31 +248,47 @@ class AntColony:
     #                                              (next_node[1] - current_node[1])**2)
     #                             # 根据距离更新pheromone
     #                             edge['Pheromone'] += self.pheromone_adding_constant / distance
+    def evaporate(self, evaporation_factor=None):
+        ''' Evaporates the pheromone of every edge of the map '''
+        if self.telemetry.timing:
+            t = time.perf_counter()
+        rate = self.evaporation_factor if evaporation_factor is None else evaporation_factor
+        for node in self.iter_nodes():
+            for edge in node.edges:
+                edge['Pheromone'] = (1.0 - rate) * edge['Pheromone']
+        if self.telemetry.timing:
+            self.timer.add('evaporate', t)
+
+    def find_edge(self, current_node, next_node):
+        ''' Returns the edge going from current_node to next_node, None if they are not connected '''
+        for edge in self.get_node(current_node).edges:
+            if edge['FinalNode'] == next_node:
+                return edge
+        return None
+
+    def deposit(self, path, amount):
+        ''' Adds amount of pheromone on every edge of the path, returns the highest pheromone reached '''
+        if self.telemetry.timing:
+            t = time.perf_counter()
+        max_pheromone = 0
+        path = to_list(path)   # PathArray 逐个取下标较慢，先转换一次
+        for j in range(len(path)-1):
+            edge = self.find_edge(path[j], path[j+1])
+            if edge is not None:
+                edge['Pheromone'] += amount
+                if edge['Pheromone'] > max_pheromone:
+                    max_pheromone = edge['Pheromone']
+        if self.telemetry.timing:
+            self.timer.add('deposit', t)
+        return max_pheromone
+
     def pheromone_update(self):
-        ''' Updates the pheromone level of the each of the trails and sorts the paths by length '''
+        ''' Updates the pheromone level of the each of the trails and sorts the paths by length,
+            returns the highest pheromone after the update '''
   
         self.sort_paths() # 按照路径长度排序
-        max_pheromone = 0
-        
-        # 对所有边进行信息素蒸发
-        for i in range(len(self.map.nodes_array)):
-            for j in range(len(self.map.nodes_array[i])):
-                node = self.map.nodes_array[i][j]
-                for edge in node.edges:
-                    edge['Pheromone'] = (1.0 - self.evaporation_factor) * edge['Pheromone']
-        
-        # 然后对路径上的边进行信息素累加
-        for path in self.paths:
-            path_length = self.calculate_euclidean_distance(path)
-            for j in range(len(path)-1):
-                current_node = path[j]
-                next_node = path[j+1]
-                for edge in self.map.nodes_array[current_node[0]][current_node[1]].edges:
-                    if edge['FinalNode'] == next_node:
-                        edge['Pheromone'] += self.pheromone_adding_constant/float(path_length)
-                        #edge['Pheromone'] += self.pheromone_adding_constant/float(len(path))
-                        if edge['Pheromone'] > max_pheromone:
-                            max_pheromone = edge['Pheromone']
+        # 蒸发与累加的具体规则由更新策略决定 (AS / MMAS / ACS / rank-based AS)
+        max_pheromone = self.update_strategy.update(self)
         # for i, path in enumerate(self.paths):
         #     path_length = self.calculate_euclidean_distance(path)
         #     for j, element in enumerate(path):
@@ -219,15 +302,15 @@ class AntColony:
         #                 else:
         #                     edge['Pheromone'] = (1.0 - self.evaporation_factor) * edge['Pheromone']
 
-        print("max_pheromone: ", max_pheromone)
+        return max_pheromone
 
     def empty_paths(self):
         ''' Empty the list of paths '''
         self.paths = []
 
     def add_to_path_results(self, path_withloop):   
-        ''' Appends the path to the results path list'''
-        self.paths.append(path_withloop)
+        ''' Appends the path to the results path list, stored as a PathArray '''
+        self.paths.append(as_path_array(path_withloop, self.map.occupancy_map.shape[1]))
 
     def get_coincidence_indices(self,path_withloop, element): # 获取重复元素的索引
         ''' Gets the indices of the coincidences of elements in the path '''
@@ -258,45 +341,182 @@ class AntColony:
         return path_withloop
 
     def calculate_euclidean_distance(self, path):
-        ''' Calculate the total Euclidean distance of a path '''
-        total_distance = 0
-        for i in range(len(path)-1):
-            current_node = path[i]
-            next_node = path[i+1]
-            distance = np.sqrt((next_node[0] - current_node[0])**2 + 
-                             (next_node[1] - current_node[1])**2)
-            total_distance += distance
-        return total_distance
-
-    def calculate_path(self):
-        ''' Carries out the process to get the best path '''
-        # Repeat the cicle for the specified no of times
-        for i in range(self.iterations):            # 迭代iters次数
-            for ant in self.ants:                   # 迭代蚂蚁的个数
-                ant.setup_ant()                     # 初始化/清除 上一个iter蚁群的visited表，将蚂蚁的初始位置 set -> start_pos
-                current_time = 0
-                while not ant.final_node_reached:   # 判断是否到达终点； 条件为 not false -> true
-                    node_to_visit = self.select_next_node(self.map.nodes_array[int(ant.actual_node[0])][int(ant.actual_node[1])], current_time, ant.visited_nodes)
-                    if node_to_visit is None:
-                        # print(f"No valid nodes to visit for ant {i+1} at time step {current_time}")
-                        break # 进入死胡同，判定为死亡。
-                    ant.move_ant(node_to_visit)
-                    ant.is_final_node_reached()
-                    current_time += 1
-                if(ant.final_node_reached):  # 如果蚂蚁到达终点
-                    visited_nodes_path = ant.get_visited_nodes()           # 第i iteration中一只蚂蚁走的路径，经历过的nodes
-                    # path_withoutloop = self.delete_loops(visited_nodes_path)  # 清除循环路径
-                    self.add_to_path_results(visited_nodes_path)
-                ant.enable_start_new_path()             # flag final_node_reached = False 复位，准备下一次迭代
-
-            self.pheromone_update()
-            self.best_result = self.paths[0]
-            self.empty_paths()
-            path_length = self.calculate_euclidean_distance(self.best_result)
-            print('Iteration: ', i, ' path length: ', round(path_length, 2), ' nodes: ', len(self.best_result))
+        ''' Calculate the total Euclidean distance of a path (PathArray or list of positions),
+            its cost along Map.edge_costs on a map with cost layers or one-way cells '''
+        if self.map.weighted:
+            return self.map.path_cost(path)
+        return path_length(path)
+
+    def walk_ant(self, ant):
+        ''' Moves the ant until it reaches the final node or gets stuck, returns the number of steps '''
+        timing = self.telemetry.timing
+        current_time = 0
+        while not ant.final_node_reached:   # 判断是否到达终点； 条件为 not false -> true
+            if timing:
+                t = time.perf_counter()
+            node_to_visit = self.select_next_node(self.get_node(ant.actual_node), current_time, ant.visited_nodes)
+            if timing:
+                self.timer.add('select', t)
+            if node_to_visit is None:
+                break # 进入死胡同，判定为死亡。
+            ant.move_ant(node_to_visit)
+            ant.is_final_node_reached()
+            current_time += 1
+        return current_time
+
+    def get_walker(self):
+        ''' Returns the ant_walk.AntWalker of this run, None when the colony customises the walk
+            (selection rule, heuristic or a map that is not a full grid) and the Python loop is needed '''
+        if self._walker is None:
+            strategy = type(self.update_strategy)
+            if not (self.use_walk_kernel and isinstance(self.map.nodes_array, list)
+                    and type(self).select_next_node is AntColony.select_next_node
+                    and type(self).heuristic is AntColony.heuristic
+                    and strategy.select_edge is AntSystem.select_edge
+                    and strategy.local_update is AntSystem.local_update):
+                return None
+            self._walker = AntWalker(self)
+        return self._walker
+
+    def walk_ants(self):
+        ''' Lets every active ant walk once, the paths reaching the goal go to self.paths;
+            returns (ants walked, ants died, steps) '''
+        timing = self.telemetry.timing
+        steps = 0
+        ants_died = 0
+        walker = self.get_walker()
+        if walker is not None:
+            walker.load_pheromone(self)
+        active = self.ants[:self.active_ants]
+        for ant in active:                      # 迭代蚂蚁的个数
+            ant.setup_ant()                     # 初始化/清除 上一个iter蚁群的visited表，将蚂蚁的初始位置 set -> start_pos
+            if walker is not None:
+                if timing:
+                    t = time.perf_counter()
+                current_time = walker.walk_ant(ant)
+                if timing:
+                    self.timer.add('select', t)
+            else:
+                current_time = self.walk_ant(ant)
+            steps += current_time
+            if(ant.final_node_reached):  # 如果蚂蚁到达终点
+                visited_nodes_path = ant.get_visited_nodes()           # 第i iteration中一只蚂蚁走的路径，经历过的nodes
+                # path_withoutloop = self.delete_loops(visited_nodes_path)  # 清除循环路径
+                self.add_to_path_results(visited_nodes_path)
+            else:
+                ants_died += 1
+            ant.enable_start_new_path()             # flag final_node_reached = False 复位，准备下一次迭代
+        return len(active), ants_died, steps
+
+    def run_iteration(self, i):
+        ''' Lets every ant walk once, updates the pheromone and records the best path of the iteration '''
+        timing = self.telemetry.timing
+        if timing:
+            self.timer.reset()
+            t_iteration = time.perf_counter()
+        previous_route = self.shortest_route
+        ants, ants_died, steps = self.walk_ants()
+
+        if timing:
+            t = time.perf_counter()
+        max_pheromone = self.pheromone_update()
+        if timing:
+            self.timer.add('update', t)
+        # 所有蚂蚁都死亡时本次迭代没有路径
+        self.best_result = self.paths[0] if self.paths else []
+        convergence = self.convergence() if type(self.sizing) is not FixedSize else None
+        self.empty_paths()
+        if self.best_result:
             self.res.append(self.best_result) # 记录每一次的best_result
             #self.shortest_route = min(self.res,key=len) # 记录下最短的一条路径
             self.shortest_route = min(self.res,key=self.calculate_euclidean_distance) # 记录下最短的一条路径
-        return self.shortest_route
+        improved = self.shortest_route is not previous_route
+        self._stagnation = 0 if improved else self._stagnation + 1
+        self.run_info['ant_steps'] = self.run_info.get('ant_steps', 0) + steps
+        if convergence is not None:
+            self.active_ants = self.sizing.resize(self, {'iteration': i, 'ants': ants, 'succeeded': ants - ants_died,
+                                                         'convergence': convergence, 'improved': improved,
+                                                         'stagnation': self._stagnation})
+        if self.telemetry.enabled:
+            metrics = {'iteration': i,
+                       'best_length': float(self.calculate_euclidean_distance(self.best_result)) if self.best_result else None,
+                       'nodes': len(self.best_result),
+                       'ants': ants,
+                       'ants_succeeded': ants - ants_died,
+                       'ants_died': ants_died,
+                       'steps': steps,
+                       'max_pheromone': max_pheromone}
+            if self.telemetry.pheromone_stats:
+                values = np.fromiter((edge['Pheromone'] for node in self.iter_nodes() for edge in node.edges),
+                                     dtype=np.float64)
+                metrics.update(pheromone_min=float(values.min()), pheromone_mean=float(values.mean()),
+                               pheromone_max=float(values.max()))
+            if timing:
+                self.timer.add('iteration', t_iteration)
+                metrics['phase_times'] = dict(self.timer.times)
+            self.telemetry.iteration(metrics)
+        return self.best_result
 
+    def convergence(self):
+        ''' Share of this iteration's paths (sorted) as short as the best one, near 1 when
+            the pheromone has concentrated on a single route '''
+        if not self.paths:
+            return 0.0
+        best = self.calculate_euclidean_distance(self.paths[0])
+        return sum(1 for path in self.paths if self.calculate_euclidean_distance(path) <= best + 1e-9) / len(self.paths)
+
+    def iter_calculate_path(self, max_seconds=None, deadline=None, should_stop=None):
+        ''' Anytime version of calculate_path: a generator yielding a progress dict every time
+            the shortest route improves. It stops after self.iterations iterations or when the
+            time budget is spent (max_seconds from now, or an absolute time.monotonic() deadline);
+            at least one iteration is always run. should_stop() is checked before every
+            iteration, e.g. for cancellation from another thread. Progress is also kept in self.run_info '''
+        t0 = time.monotonic()
+        stop_at = deadline
+        if max_seconds is not None:
+            stop_at = t0 + max_seconds if stop_at is None else min(stop_at, t0 + max_seconds)
+        best_length = float('inf')
+        # 起点和终点不连通时直接失败，不运行任何迭代
+        self.status = self.map.robot_status(self.map.initial_node, self.map.final_node)
+        self.run_info = {'iterations': 0, 'elapsed': 0.0, 'timed_out': False, 'cancelled': False,
+                         'best_iteration': None, 'length': best_length, 'status': self.status, 'ant_steps': 0}
+        self.active_ants = self.sizing.initial(self)
+        self._stagnation = 0
+        if self.status != 'ok':
+            return
+        self._walker = None   # 地图可能在两次运行之间改变
+        for i in range(self.iterations):            # 迭代iters次数
+            if i > 0 and stop_at is not None and time.monotonic() >= stop_at:
+                self.run_info['timed_out'] = True
+                break
+            if should_stop is not None and should_stop():
+                self.run_info['cancelled'] = True
+                break
+            self.run_iteration(i)
+            self.run_info['iterations'] = i + 1
+            self.run_info['elapsed'] = time.monotonic() - t0
+            if not self.shortest_route:
+                continue
+            length = float(self.calculate_euclidean_distance(self.shortest_route))
+            if length < best_length:
+                best_length = length
+                self.run_info['best_iteration'] = i
+                self.run_info['length'] = length
+                yield dict(self.run_info, route=to_list(self.shortest_route))
+        if not self.shortest_route:
+            self.status = self.run_info['status'] = 'no_path'  # 所有迭代中蚂蚁都没有到达终点
+
+    def calculate_path(self, max_seconds=None, deadline=None, callback=None, should_stop=None):
+        ''' Carries out the process to get the best path, [] when there is none (see self.status).
+            callback(progress) is called on every improvement, returning False stops the search;
+            iteration count and timing of the run are left in self.run_info '''
+        # Repeat the cicle for the specified no of times
+        for progress in self.iter_calculate_path(max_seconds, deadline, should_stop):
+            if callback is not None and callback(progress) is False:
+                break
+        return to_list(self.shortest_route)
 
+    def calculate_path_anytime(self, max_seconds=None, deadline=None, callback=None, should_stop=None):
+        ''' Same as calculate_path but returns the route together with the run metadata '''
+        route = self.calculate_path(max_seconds, deadline, callback, should_stop)
+        return dict(self.run_info, route=route)
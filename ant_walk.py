@@ -0,0 +1,174 @@
+# 蚂蚁行走内核：一只蚂蚁从起点走到终点（或进入死胡同）的完整过程
+#
+# 等价于 AntColony 中 select_next_node + move_ant + is_final_node_reached 的循环，
+# 但在打包好的数组上运行（CSR 格式的边表，每条边的 eta**beta 只计算一次）。
+# 如果编译了 C 扩展 _ant_walk（python setup.py build_ext --inplace）就使用它，否则使用纯 Python 实现。
+# 两者与 AntColony.select_next_node 使用同一个随机数流 (colony.rng，默认为 numpy 全局随机数流)，
+# 同一个种子下得到完全相同的路径：
+# 每一步只调用一次 random_sample，并按 np.random.choice 的方式 (cumsum, 归一化, searchsorted right) 选择边。
+
+from bisect import bisect_right
+import numpy as np
+from path_array import PathArray
+
+try:
+    import _ant_walk
+except ImportError:  # 没有编译 C 扩展
+    _ant_walk = None
+
+KERNEL = 'c' if _ant_walk is not None else 'python'
+_NO_STOP = np.zeros(0, dtype=np.uint8)
+
+
+def _bit_generator_capsule(rng=np.random):
+    """
+    PyCapsule of the BitGenerator behind rng: the np.random module (numpy's global RandomState, what
+    np.random.choice draws from), a RandomState or a Generator. None when this NumPy does not expose it;
+    the walker then uses its Python implementation
+    """
+    if rng is np.random:
+        # np.random.mtrand._rand 和 RandomState._bit_generator 都是 NumPy 的私有属性，升级后可能不存在
+        rng = getattr(getattr(np.random, 'mtrand', None), '_rand', None)
+    bit_generator = getattr(rng, 'bit_generator', None)   # Generator (公开属性)
+    if bit_generator is None:
+        bit_generator = getattr(rng, '_bit_generator', None)   # RandomState
+    capsule = getattr(bit_generator, 'capsule', None)
+    return capsule if type(capsule).__name__ == 'PyCapsule' else None
+
+
+def _cell_index(pos, rows, cols):
+    """Flat index of a (row, col) tuple, None when it can never equal a node position"""
+    if not isinstance(pos, tuple) or len(pos) != 2:
+        return None
+    if not (0 <= pos[0] < rows and 0 <= pos[1] < cols):
+        return None
+    return int(pos[0]) * cols + int(pos[1])
+
+
+class AntWalker:
+    """
+    Packed edge tables of a colony's grid map and the ant walk running on them
+
+    Args:
+        colony: AntColony on a Map whose nodes_array is a full grid
+        use_c: use the C extension when it is built (and the BitGenerator of colony.rng is reachable)
+    """
+
+    def __init__(self, colony, use_c=True):
+        nodes_array = colony.map.nodes_array
+        self.rows, self.cols = len(nodes_array), len(nodes_array[0])
+        self.alpha = colony.alpha
+        offsets = [0]
+        targets = []
+        eta_beta = []
+        with np.errstate(divide='ignore'):   # 终点自身的边为 1/0，蚂蚁到达终点后不会再用到
+            for node in colony.iter_nodes():   # 按行优先顺序，与 flat index 一致
+                for edge in node.edges:
+                    targets.append(edge['FinalNode'][0] * self.cols + edge['FinalNode'][1])
+                    eta_beta.append(float(colony.heuristic(node, edge) ** colony.beta))
+                offsets.append(len(targets))
+        self.n_edges = len(targets)
+        self.start_pos = tuple(colony.map.initial_node)
+        self.start = _cell_index(self.start_pos, self.rows, self.cols)
+        self.goal = _cell_index(tuple(colony.map.final_node), self.rows, self.cols)
+        self.vertex_constraints, self.edge_constraints = self._pack_constraints(colony.constraints)
+        self.random = colony.rng.random   # 与 random_sample 相同的 [0, 1) 浮点数
+        self.capsule = _bit_generator_capsule(colony.rng) if use_c and _ant_walk is not None else None
+        self.use_c = self.capsule is not None
+        if self.use_c:
+            self.offsets = np.array(offsets, dtype=np.int64)
+            self.targets = np.array(targets, dtype=np.int64)
+            self.eta_beta = np.array(eta_beta, dtype=np.float64)
+            self.vertex_array = np.array(sorted(self.vertex_constraints), dtype=np.int64).reshape(-1, 2)
+            self.edge_array = np.array(sorted(self.edge_constraints), dtype=np.int64).reshape(-1, 3)
+        else:
+            self.offsets, self.targets, self.eta_beta = offsets, targets, eta_beta
+        self.pheromone = None
+
+    def _pack_constraints(self, constraints):
+        ''' Splits the constraints into {(cell, time)} and {(from_cell, to_cell, time)} sets,
+            with the same matching rules as AntColony.select_next_node '''
+        vertex, edges = set(), set()
+        for c in constraints:
+            if hasattr(c, 'covers'):   # 范围约束展开为逐个 (格子, 时间)
+                for pos in c.loc:
+                    cell = _cell_index(tuple(pos), self.rows, self.cols)
+                    if cell is not None:
+                        vertex.update((cell, t) for t in range(int(c.timestep), int(c.end) + 1))
+                continue
+            if hasattr(c, 'loc'):
+                if isinstance(c.loc, tuple) and len(c.loc) == 2 and isinstance(c.loc[0], tuple):
+                    a = _cell_index(c.loc[0], self.rows, self.cols)
+                    b = _cell_index(c.loc[1], self.rows, self.cols)
+                    if a is not None and b is not None:
+                        edges.add((a, b, int(c.timestep)))
+                    continue
+                pos, timestep = c.loc, c.timestep
+            else:
+                pos, timestep = c['pos'], c['time']
+            cell = _cell_index(pos, self.rows, self.cols)
+            if cell is not None:
+                vertex.add((cell, int(timestep)))
+        return vertex, edges
+
+    def load_pheromone(self, colony):
+        ''' Copies the current pheromone of every edge, called once per iteration '''
+        values = np.fromiter((edge['Pheromone'] for node in colony.iter_nodes() for edge in node.edges),
+                             dtype=np.float64, count=self.n_edges)
+        self.pheromone = values if self.use_c else values.tolist()
+
+    def walk(self, stop=None):
+        ''' One ant walk, returns (list of visited flat indices, goal reached). The walk also
+            ends, as reached, on a cell where stop (uint8 array, one byte per cell) is nonzero '''
+        if self.use_c:
+            return _ant_walk.walk(self.offsets, self.targets, self.pheromone, self.eta_beta, float(self.alpha),
+                                  self.start, self.goal, self.vertex_array, self.edge_array,
+                                  _NO_STOP if stop is None else stop, self.capsule)
+        return self._walk_python(None if stop is None else stop.tobytes())
+
+    def _walk_python(self, stop=None):
+        offsets, targets, pheromone, eta_beta = self.offsets, self.targets, self.pheromone, self.eta_beta
+        vertex, edges = self.vertex_constraints, self.edge_constraints
+        alpha, goal = self.alpha, self.goal
+        random_sample = self.random
+        actual = self.start
+        path = [actual]
+        visited = {actual}
+        t = 1   # 下一步到达的时间
+        while True:   # 与 Python 循环相同，至少走一步后才检查是否到达终点
+            candidates = []
+            att = []
+            total = 0
+            for e in range(offsets[actual], offsets[actual + 1]):
+                target = targets[e]
+                if target in visited or (target, t) in vertex or (actual, target, t) in edges:
+                    continue
+                a = (pheromone[e] ** alpha) * eta_beta[e]
+                candidates.append(target)
+                att.append(a)
+                total += a
+            if not candidates:
+                return path, False
+            # 与 np.random.choice(..., p=p) 相同：p 的累积和除以最后一项，再 searchsorted(side='right')
+            cdf = []
+            s = 0.0
+            for a in att:
+                s += a / total if total > 0 else 1.0 / len(att)
+                cdf.append(s)
+            last = cdf[-1]
+            cdf = [c / last for c in cdf]
+            actual = candidates[min(bisect_right(cdf, random_sample()), len(cdf) - 1)]
+            path.append(actual)
+            visited.add(actual)
+            if actual == goal or (stop is not None and stop[actual]):
+                return path, True
+            t += 1
+
+    def walk_ant(self, ant):
+        ''' Runs one walk for an AntColony.Ant, leaving it in the same state as the Python loop
+            (visited nodes as a PathArray), returns the number of steps '''
+        path, reached = self.walk()
+        ant.visited_nodes = PathArray(path, self.cols)
+        ant.actual_node = divmod(path[-1], self.cols) if len(path) > 1 else self.start_pos
+        ant.final_node_reached = reached
+        return len(path) - 1
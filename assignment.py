@@ -0,0 +1,173 @@
+# 机器人-终点分配：在路径规划前重新配对起点和终点
+#
+# Map 按 np.where 的扫描顺序把第 i 个 S 与第 i 个 F 配对，常常产生交叉的路线和不必要的 CBS 冲突。
+# 当终点可以互换时（任意机器人去任意终点），先用距离场构建 机器人 x 终点 的代价矩阵，再求解：
+#   'sum'        -- 匈牙利算法，总路程最短
+#   'bottleneck' -- 先使最长的一条路程（makespan）最短，再在此前提下使总路程最短
+
+import numpy as np
+from batch_planning import BatchPlanner
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_assignment
+except ImportError:  # scipy 可选，没有时使用下面的 NumPy 实现
+    _scipy_assignment = None
+
+METHODS = ('sum', 'bottleneck')
+
+
+def _hungarian(cost):
+    """Shortest augmenting path Hungarian algorithm for a finite n x m cost matrix with n <= m"""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.int64)   # match[j]: 第 j 列分配的行（1 开始，0 表示未分配）
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        way = np.zeros(m + 1, dtype=np.int64)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+    rows = match[1:] - 1
+    cols = np.nonzero(rows >= 0)[0]
+    order = np.argsort(rows[cols])
+    return rows[cols][order], cols[order]
+
+
+def linear_sum_assignment(cost):
+    """
+    Minimum-cost assignment of the rows of a cost matrix to distinct columns
+
+    Args:
+        cost: n x m array, inf for forbidden pairs
+
+    Returns:
+        (rows, cols) index arrays, sorted by row, min(n, m) pairs (forbidden pairs may be
+        used when no complete assignment avoids them, check the costs)
+    """
+    cost = np.asarray(cost, dtype=float)
+    if cost.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    finite = np.isfinite(cost)
+    big = (np.abs(cost[finite]).sum() + 1.0) * (cost.shape[0] + 1) if finite.any() else 1.0
+    cost = np.where(finite, cost, big)   # 不可达的配对用一个足够大的代价代替
+    if _scipy_assignment is not None:
+        rows, cols = _scipy_assignment(cost)
+        return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+    if cost.shape[0] > cost.shape[1]:
+        cols, rows = _hungarian(cost.T)
+        order = np.argsort(rows)
+        return rows[order], cols[order]
+    return _hungarian(cost)
+
+
+def _has_perfect_matching(allowed):
+    """True if every row of a boolean n x m matrix (n <= m) can get its own allowed column"""
+    n, m = allowed.shape
+    match_col = [-1] * m
+    options = [list(np.nonzero(row)[0]) for row in allowed]
+
+    def augment(i, seen):
+        for j in options[i]:
+            if not seen[j]:
+                seen[j] = True
+                if match_col[j] < 0 or augment(match_col[j], seen):
+                    match_col[j] = i
+                    return True
+        return False
+
+    return all(augment(i, [False] * m) for i in range(n))
+
+
+def bottleneck_assignment(cost):
+    """
+    Assignment minimising the largest cost (makespan), ties broken by the total cost
+
+    Args:
+        cost: n x m array with n <= m, inf for forbidden pairs
+
+    Returns:
+        (rows, cols) index arrays as linear_sum_assignment
+    """
+    cost = np.asarray(cost, dtype=float)
+    if cost.size == 0:
+        return linear_sum_assignment(cost)
+    if cost.shape[0] > cost.shape[1]:
+        cols, rows = bottleneck_assignment(cost.T)
+        order = np.argsort(rows)
+        return rows[order], cols[order]
+    thresholds = np.unique(cost[np.isfinite(cost)])
+    lo, hi = 0, len(thresholds) - 1
+    if hi < 0 or not _has_perfect_matching(cost <= thresholds[hi]):
+        return linear_sum_assignment(cost)   # 没有完全可行的分配
+    while lo < hi:   # 二分查找最小的可行阈值
+        mid = (lo + hi) // 2
+        if _has_perfect_matching(cost <= thresholds[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return linear_sum_assignment(np.where(cost <= thresholds[lo], cost, np.inf))
+
+
+def assign_goals(in_map, method='sum', planner=None):
+    """
+    Pairs the robots of a map with its goals
+
+    Args:
+        in_map: Map with the lists initial_node and final_node
+        method: 'sum' (Hungarian) or 'bottleneck' (makespan first)
+        planner: optional BatchPlanner of the map, to reuse its cached distance fields
+
+    Returns:
+        dict with 'method', 'goals' (goal index of every robot, -1 if none), 'costs'
+        (distance of every robot to its goal, inf if unreachable), 'total', 'makespan'
+        and 'matrix' (the robot x goal cost matrix)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown assignment method: {method}")
+    planner = planner if planner is not None else BatchPlanner(in_map)
+    starts, goals = list(in_map.initial_node), list(in_map.final_node)
+    matrix = planner.distance_matrix(starts, goals)
+    solve = linear_sum_assignment if method == 'sum' else bottleneck_assignment
+    rows, cols = solve(matrix)
+    assigned = np.full(len(starts), -1, dtype=np.int64)
+    assigned[rows] = cols
+    costs = np.full(len(starts), np.inf)
+    costs[rows] = matrix[rows, cols]
+    reached = costs[np.isfinite(costs)]
+    return {
+        'method': method,
+        'goals': assigned.tolist(),
+        'costs': costs,
+        'total': float(reached.sum()),
+        'makespan': float(reached.max()) if len(reached) else 0.0,
+        'matrix': matrix,
+    }
+
+
+def apply_assignment(in_map, assignment):
+    """Reorders in_map.final_node so that robot i goes to the goal the assignment gave it"""
+    goals = list(in_map.final_node)
+    in_map.final_node = [goals[j] for j in assignment['goals'] if j >= 0]
+    return in_map
@@ -1,8 +1,10 @@
 import numpy as np
 import heapq
-from map_class import Map
+from map_class import Map, edge_direction_index
 from plot_picture import plot_picture, motion_move
 
+STOP_CHECK_INTERVAL = 256   # find_path 每扩展多少个节点检查一次 should_stop
+
 class Node:
     def __init__(self, position, g_cost=0, h_cost=0, parent=None):
         self.position = position  # (x, y)
@@ -19,28 +21,37 @@ class AStarPlanner:
         self.map = map_obj
         self.occupancy_map = map_obj.occupancy_map
         self.rows, self.cols = self.occupancy_map.shape
+        # 有代价层/单行道的地图使用 Map.edge_costs；启发式乘以最小代价系数，保持可采纳
+        self.edge_costs = map_obj.edge_costs() if map_obj.weighted else None
+        self.h_scale = float(map_obj.cell_costs()[self.occupancy_map == 1].min()) if map_obj.weighted else 1.0
+        self.stopped = False   # 上一次 find_path 是否被 should_stop 中止
 
-    def get_neighbors(self, node):
-        """获取节点的相邻节点"""
+    def get_neighbors(self, node, bounds=None):
+        """获取节点的相邻节点，bounds=(row_min, row_max, col_min, col_max) 时只在该矩形内（不含max）搜索"""
         x, y = node.position
         neighbors = []
         # 8个方向：上、下、左、右、左上、右上、左下、右下
         directions = [(-1,0), (1,0), (0,-1), (0,1), (-1,-1), (-1,1), (1,-1), (1,1)]
+        row_min, row_max, col_min, col_max = bounds if bounds is not None else (0, self.rows, 0, self.cols)
         
         for dx, dy in directions:
             new_x, new_y = x + dx, y + dy
             # 检查是否在地图范围内且不是障碍物（0表示障碍物，1表示可通行）
-            if (0 <= new_x < self.rows and 0 <= new_y < self.cols and 
+            if (row_min <= new_x < row_max and col_min <= new_y < col_max and 
                 self.occupancy_map[new_x][new_y] == 1):
+                if self.edge_costs is not None and self.edge_costs[x, y, edge_direction_index((x, y), (new_x, new_y))] == np.inf:
+                    continue  # 逆向进入/离开单行道
                 neighbors.append((new_x, new_y))
         return neighbors
 
     def calculate_h_cost(self, current, goal):
         """计算启发式代价（使用欧几里得距离）"""
-        return np.sqrt((current[0] - goal[0])**2 + (current[1] - goal[1])**2)
+        return self.h_scale * np.sqrt((current[0] - goal[0])**2 + (current[1] - goal[1])**2)
 
     def calculate_g_cost(self, current, neighbor):
         """计算从当前节点到相邻节点的实际代价"""
+        if self.edge_costs is not None:  # 代价层地图：查表
+            return self.edge_costs[current[0], current[1], edge_direction_index(current, neighbor)]
         # 如果是斜向移动，代价为根号2，否则为1
         if abs(current[0] - neighbor[0]) + abs(current[1] - neighbor[1]) == 2:
             return np.sqrt(2)
@@ -55,8 +66,14 @@ class AStarPlanner:
             current = current.parent
         return path[::-1]  # 反转路径，从起点到终点
 
-    def find_path(self, start, goal):
-        """使用A*算法寻找从起点到终点的路径"""
+    def find_path(self, start, goal, bounds=None, should_stop=None):
+        """使用A*算法寻找从起点到终点的路径，bounds 限制搜索范围（用于分层地图的簇内细化）；
+        should_stop() 每扩展 STOP_CHECK_INTERVAL 个节点检查一次，返回 True 时停止搜索并返回 None (self.stopped 为 True)"""
+        self.stopped = False
+        # 起点和终点不在同一连通域时直接返回，避免搜索整张地图
+        if not self.map.is_reachable(start, goal):
+            return None
+
         # 初始化开放列表和关闭列表
         open_list = []
         closed_set = set()
@@ -68,7 +85,12 @@ class AStarPlanner:
         # 用于快速查找节点
         node_dict = {start: start_node}
         
+        expanded = 0
         while open_list:
+            if should_stop is not None and expanded % STOP_CHECK_INTERVAL == 0 and should_stop():
+                self.stopped = True
+                return None
+            expanded += 1
             current = heapq.heappop(open_list)
             
             # 如果到达目标
@@ -79,7 +101,7 @@ class AStarPlanner:
             closed_set.add(current.position)
             
             # 检查所有相邻节点
-            for neighbor_pos in self.get_neighbors(current):
+            for neighbor_pos in self.get_neighbors(current, bounds):
                 if neighbor_pos in closed_set:
                     continue
                 
@@ -115,6 +137,7 @@ def astar_resolve_path(map_obj, display=1):
     print(f"Number of robots: {len(map_obj.initial_node)}")
     
     # 为每个机器人规划路径
+    statuses = map_obj.check_robots()  # 每个机器人的可达性，O(1) 判断
     for i in range(len(map_obj.initial_node)):
         start = tuple(map_obj.initial_node[i])
         goal = tuple(map_obj.final_node[i])
@@ -123,18 +146,9 @@ def astar_resolve_path(map_obj, display=1):
         print(f"Start position: {start}")
         print(f"Goal position: {goal}")
         
-        # 检查起点和终点是否有效
-        if (not (0 <= start[0] < map_obj.occupancy_map.shape[0] and 
-                 0 <= start[1] < map_obj.occupancy_map.shape[1]) or
-            not (0 <= goal[0] < map_obj.occupancy_map.shape[0] and 
-                 0 <= goal[1] < map_obj.occupancy_map.shape[1])):
-            print(f"Error: Start or goal position out of map bounds for robot {i+1}")
-            continue
-            
-        # 检查起点和终点是否在障碍物上（0表示障碍物，1表示可通行）
-        if (map_obj.occupancy_map[start[0]][start[1]] == 0 or 
-            map_obj.occupancy_map[goal[0]][goal[1]] == 0):
-            print(f"Error: Start or goal position is on an obstacle for robot {i+1}")
+        # 检查起点和终点是否有效、是否连通
+        if statuses[i] != 'ok':
+            print(f"Error: robot {i+1} cannot be planned, status: {statuses[i]}")
             continue
         
         # 寻找路径
@@ -0,0 +1,193 @@
+# 批量规划：同一张地图上的大量起点/终点查询
+#
+# 与逐个调用 AStarPlanner.find_path 不同：
+#   邻接表只建一次（NeighbourTable），所有查询共用
+#   终点相同的查询合并为一次反向 Dijkstra（地图是无向的，终点出发的距离场即所有起点到终点的距离）
+#   距离场按终点缓存，任务分配需要的 N x M 距离矩阵是对距离场的向量化索引
+#
+#   planner = BatchPlanner(Map('middle.txt'))
+#   result = planner.plan_many(pairs)                  # {'distances': (K,), 'paths': [...]}
+#   costs = planner.distance_matrix(robots, tasks)     # (N, M)，不可达为 inf
+
+import heapq
+import math
+from collections import OrderedDict
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as _csgraph_dijkstra
+except ImportError:  # scipy 可选，没有时使用下面的纯 Python Dijkstra
+    csr_matrix = _csgraph_dijkstra = None
+
+SQRT2 = math.sqrt(2)
+# 与 AStarPlanner.get_neighbors 相同的8个方向（不检查拐角）
+MOVES = [(-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0),
+         (-1, -1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (1, 1, SQRT2)]
+
+
+class NeighbourTable:
+    """Flat-index neighbour table of the free cells of a map, built once with NumPy"""
+
+    def __init__(self, occupancy_map):
+        occupancy_map = np.asarray(occupancy_map)
+        self.shape = occupancy_map.shape
+        rows, cols = self.shape
+        self.size = rows * cols
+        self.free = (occupancy_map == 1).ravel()
+        self.neighbours = np.full((self.size, len(MOVES)), -1, dtype=np.int64)  # -1：无此邻居
+        self.costs = np.array([cost for _, _, cost in MOVES])
+        r, c = np.divmod(np.arange(self.size), cols)
+        for k, (dr, dc, _) in enumerate(MOVES):
+            nr, nc = r + dr, c + dc
+            valid = self.free & (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+            target = np.where(valid, nr * cols + nc, 0)
+            valid &= self.free[target]
+            self.neighbours[valid, k] = target[valid]
+        self._adjacency = None
+        self._csr = None
+
+    def index(self, positions):
+        """Flat indices of an iterable of (row, col)"""
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        return positions[:, 0] * self.shape[1] + positions[:, 1]
+
+    def position(self, index):
+        return divmod(int(index), self.shape[1])
+
+    def adjacency(self):
+        """Per-cell lists of (neighbour, cost) for the pure-Python Dijkstra, built on first use"""
+        if self._adjacency is None:
+            costs = self.costs.tolist()
+            self._adjacency = [[(j, costs[k]) for k, j in enumerate(row) if j >= 0]
+                               for row in self.neighbours.tolist()]
+        return self._adjacency
+
+    def csr(self):
+        """Sparse adjacency matrix for scipy.sparse.csgraph"""
+        if self._csr is None:
+            src, k = np.nonzero(self.neighbours >= 0)
+            self._csr = csr_matrix((self.costs[k], (src, self.neighbours[src, k])), shape=(self.size, self.size))
+        return self._csr
+
+
+def _dijkstra(adjacency, size, source):
+    dist = [math.inf] * size
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, i = heapq.heappop(heap)
+        if d > dist[i]:
+            continue
+        for j, cost in adjacency[i]:
+            nd = d + cost
+            if nd < dist[j]:
+                dist[j] = nd
+                heapq.heappush(heap, (nd, j))
+    return np.array(dist)
+
+
+class BatchPlanner:
+    """
+    Answers many shortest-path / shortest-distance queries on one map
+
+    Args:
+        in_map: Map object
+        cache_size: number of per-goal distance fields kept in memory (LRU)
+    """
+
+    def __init__(self, in_map, cache_size=256):
+        self.map = in_map
+        self.table = NeighbourTable(in_map.occupancy_map)
+        self.cache_size = cache_size
+        self._fields = OrderedDict()  # 终点的 flat index -> 距离场 (rows*cols,)
+
+    def _compute_fields(self, goals):
+        if _csgraph_dijkstra is not None:
+            return list(_csgraph_dijkstra(self.table.csr(), directed=True, indices=goals))
+        adjacency = self.table.adjacency()
+        return [_dijkstra(adjacency, self.table.size, goal) for goal in goals]
+
+    def distance_fields(self, goals):
+        """
+        Distance from every cell to each goal, one reverse Dijkstra per goal not yet cached
+
+        Args:
+            goals: iterable of (row, col)
+
+        Returns:
+            (len(goals), rows*cols) float array, inf on unreachable cells and obstacles
+        """
+        goals = self.table.index(goals).tolist()
+        missing = [g for g in dict.fromkeys(goals) if g not in self._fields and self.table.free[g]]
+        for goal, field in zip(missing, self._compute_fields(missing)):
+            self._fields[goal] = field
+        fields = np.full((len(goals), self.table.size), np.inf)
+        for k, goal in enumerate(goals):
+            if goal in self._fields:
+                self._fields.move_to_end(goal)
+                fields[k] = self._fields[goal]
+        while len(self._fields) > self.cache_size:
+            self._fields.popitem(last=False)
+        return fields
+
+    def distance_matrix(self, starts, goals):
+        """
+        N x M matrix of shortest distances from each start to each goal (inf if unreachable),
+        e.g. the robot x task cost matrix of a task allocator. The map is undirected, so the
+        fields are computed from whichever side has fewer distinct cells
+        """
+        start_index, goal_index = self.table.index(starts), self.table.index(goals)
+        if len(start_index) == 0 or len(goal_index) == 0:
+            return np.zeros((len(start_index), len(goal_index)))
+        if len(np.unique(start_index)) < len(np.unique(goal_index)):
+            return self.distance_fields(starts)[:, goal_index]
+        return self.distance_fields(goals)[:, start_index].T
+
+    def extract_path(self, field, start):
+        """Follows a distance field downhill from start, returns the list of (row, col) or None"""
+        if not np.isfinite(field[start]):
+            return None
+        neighbours, costs = self.table.neighbours, self.table.costs
+        path = [self.table.position(start)]
+        current = start
+        while field[current] > 0:
+            candidates = neighbours[current]
+            valid = candidates >= 0
+            totals = np.where(valid, costs + field[np.where(valid, candidates, 0)], np.inf)
+            current = candidates[int(np.argmin(totals))]
+            path.append(self.table.position(current))
+        return path
+
+    def plan_many(self, pairs, return_paths=True):
+        """
+        Plans every (start, goal) pair, grouping the pairs that share a goal
+
+        Args:
+            pairs: iterable of (start, goal), positions as (row, col)
+            return_paths: also extract the cell paths, otherwise only the distances
+
+        Returns:
+            dict with 'distances' (float array, inf when unreachable), 'reachable' (bool array)
+            and, when return_paths, 'paths' (list of paths, None when unreachable)
+        """
+        pairs = list(pairs)
+        if not pairs:
+            result = {'distances': np.zeros(0), 'reachable': np.zeros(0, dtype=bool)}
+            if return_paths:
+                result['paths'] = []
+            return result
+        starts = self.table.index([start for start, _ in pairs])
+        goals = self.table.index([goal for _, goal in pairs])
+        unique_goals, group = np.unique(goals, return_inverse=True)
+        fields = self.distance_fields([self.table.position(g) for g in unique_goals])
+        distances = fields[group, starts]
+        result = {'distances': distances, 'reachable': np.isfinite(distances)}
+        if return_paths:
+            result['paths'] = [self.extract_path(fields[g], s) for g, s in zip(group, starts)]
+        return result
+
+
+def plan_many(in_map, pairs, return_paths=True):
+    """Shortcut for BatchPlanner(in_map).plan_many(pairs), see BatchPlanner.plan_many"""
+    return BatchPlanner(in_map).plan_many(pairs, return_paths)
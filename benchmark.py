@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# 基准测试：在 maps/*.txt 和 gen_map 生成的规模序列上运行 ACO、A* 和 CBS
+#
+#   python benchmark.py                              # 运行并打印结果
+#   python benchmark.py --save-baseline baseline.json
+#   python benchmark.py --baseline baseline.json     # 与基线比较，有退化时返回 1
+
+import argparse
+import copy
+import glob
+import json
+import multiprocessing as mp
+import os
+import queue
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from map_class import Map
+from ant_colony import AntColony
+from astar_path_planning import AStarPlanner
+from conflict_free import cbs_search
+from gen_map import CELL_CHARS, generate_large_map
+from telemetry import RecordingSink
+
+SIZES = [8, 16, 32, 64, 128, 256, 512]
+ROBOTS = [2, 5, 10, 20, 50, 100]
+
+
+def robot_maps(in_map):
+    """Split a multi-robot map into one single-robot map per robot"""
+    maps = []
+    for i in range(len(in_map.initial_node)):
+        robot = copy.deepcopy(in_map)
+        robot.initial_node = robot.initial_node[i]
+        robot.final_node = robot.final_node[i]
+        maps.append(robot)
+    return maps
+
+
+def path_length(path):
+    return float(sum(np.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(path[:-1], path[1:])))
+
+
+# 每个结果都记录 failures（没有找到路径的机器人数，CBS 为未解决的实例数）：
+# cost 只累加找到的路径，失败增多时 cost 反而会下降，所以 compare 先比较 failures
+
+def run_aco(in_map, args):
+    sink = RecordingSink(timing=True)
+    cost, convergence, statuses = 0.0, [], []
+    for robot in robot_maps(in_map):
+        robot.nodes_array = robot._create_nodes()
+        colony = AntColony(robot, args.ants, args.iterations, 0.3, 100, 2, 4, telemetry=sink)
+        cost += path_length(colony.calculate_path())
+        best = colony.run_info['best_iteration']
+        convergence.append(best + 1 if best is not None else None)
+        statuses.append(colony.status)
+    return {'cost': cost, 'failures': sum(status != 'ok' for status in statuses),
+            'iterations_to_convergence': convergence, 'statuses': statuses, 'phase_times': sink.phase_totals()}
+
+
+def run_astar(in_map, args):
+    planner = AStarPlanner(in_map)
+    cost, found = 0.0, 0
+    for start, goal in zip(in_map.initial_node, in_map.final_node):
+        path = planner.find_path(tuple(start), tuple(goal))
+        if path is not None:
+            cost += path_length(path)
+            found += 1
+    return {'cost': cost, 'found': found, 'failures': len(in_map.initial_node) - found}
+
+
+def run_cbs(in_map, args):
+    # CBS 以 A* 路径为初始解，保证结果可复现
+    planner = AStarPlanner(in_map)
+    routes = [planner.find_path(tuple(s), tuple(g)) for s, g in zip(in_map.initial_node, in_map.final_node)]
+    if any(route is None for route in routes):
+        raise ValueError("a robot has no path")
+    max_bytes = int(args.cbs_max_mb * 2 ** 20) if args.cbs_max_mb else None
+    result = cbs_search(routes, robot_maps(in_map), args.ants, args.iterations, 0.3, 100, 2, 4,
+                        max_nodes=args.cbs_max_nodes or None, max_bytes=max_bytes,
+                        max_seconds=args.cbs_max_seconds or None,
+                        spill=args.cbs_spill, suboptimality=args.cbs_suboptimality)
+    return {'cost': sum(len(path) for path in result['routes']), 'status': result['status'],
+            'failures': int(result['status'] != 'solved'),
+            'conflicts': result['conflicts'], 'expanded': result['expanded'], 'generated': result['generated'],
+            'cbs_peak_bytes': result['peak_bytes']}
+
+
+PLANNERS = {'aco': run_aco, 'astar': run_astar, 'cbs': run_cbs}
+
+
+def measure(planner, in_map, args):
+    """Runs one case: a timed pass, then an optional tracemalloc pass for the peak memory"""
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    t0 = time.perf_counter()
+    result = PLANNERS[planner](in_map, args)
+    result['wall'] = time.perf_counter() - t0
+    if args.memory:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        tracemalloc.start()
+        PLANNERS[planner](in_map, args)
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def _measure_worker(results, planner, in_map, args):
+    try:
+        results.put(measure(planner, in_map, args))
+    except Exception as e:
+        results.put({'error': str(e)})
+
+
+def run_case(planner, in_map, args):
+    """Runs measure() in a child process so a case that does not terminate is cut at args.timeout"""
+    results = mp.Queue()
+    worker = mp.Process(target=_measure_worker, args=(results, planner, in_map, args))
+    worker.start()
+    worker.join(args.timeout)
+    if worker.is_alive():
+        worker.terminate()
+        worker.join()
+        return {'error': f'timeout after {args.timeout}s'}
+    try:
+        return results.get(timeout=1)
+    except queue.Empty:
+        return {'error': f'exit code {worker.exitcode}'}
+
+
+def scenarios(args):
+    """Yields (name, map, planners) for every benchmark case"""
+    for filename in sorted(glob.glob(os.path.join('maps', '*.txt'))):
+        try:
+            in_map = Map(os.path.basename(filename))
+        except ValueError:
+            continue  # 不是地图文件（如 说明.txt）
+        if not in_map.initial_node or len(in_map.initial_node) != len(in_map.final_node):
+            continue
+        yield 'map:' + os.path.basename(filename)[:-4], in_map, ['aco', 'astar', 'cbs']
+
+    for size in args.sizes:
+        grid, _, _ = generate_large_map(size, size, 2, args.density, args.template, seed=args.seed)
+        planners = ['astar'] + (['aco'] if size <= args.aco_max_size else [])
+        yield f'size:{size}x{size}', Map(in_map=CELL_CHARS[grid]), planners
+
+    for n in args.robots:
+        grid, _, _ = generate_large_map(args.robot_map_size, args.robot_map_size, n, args.density, args.template,
+                                        seed=args.seed)
+        planners = ['astar'] + (['cbs'] if n <= args.cbs_max_robots else [])
+        yield f'robots:{n}', Map(in_map=CELL_CHARS[grid]), planners
+
+
+def compare(results, baseline, tolerance, min_delta=0.005):
+    """
+    Returns the list of regressions against a baseline: a case that now fails with an error,
+    more failures (robots without a path, unsolved CBS), wall time above the baseline by more
+    than `tolerance` (relative) and `min_delta` seconds, or a worse solution cost with the
+    same number of failures
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or 'error' in base:
+            continue
+        if 'error' in result:
+            regressions.append(f"{key}: error {result['error']}")
+            continue
+        failures, base_failures = result.get('failures'), base.get('failures')   # 旧基线没有 failures
+        if failures is not None and base_failures is not None and failures > base_failures:
+            regressions.append(f"{key}: failures {base_failures} -> {failures}")
+        if result['wall'] > base['wall'] * (1.0 + tolerance) and result['wall'] - base['wall'] > min_delta:
+            regressions.append(f"{key}: wall {base['wall']:.4f}s -> {result['wall']:.4f}s")
+        if failures == base_failures and result['cost'] > base['cost'] + 1e-9:
+            regressions.append(f"{key}: cost {base['cost']:.3f} -> {result['cost']:.3f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ACO, A* and CBS on the bundled and generated maps')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ants', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--sizes', type=int, nargs='*', default=SIZES)
+    parser.add_argument('--robots', type=int, nargs='*', default=ROBOTS)
+    parser.add_argument('--template', default='random', help='gen_map template of the generated maps')
+    parser.add_argument('--robot-map-size', type=int, default=64)
+    parser.add_argument('--aco-max-size', type=int, default=32, help='largest generated map ACO is run on')
+    parser.add_argument('--cbs-max-robots', type=int, default=10, help='largest fleet CBS is run on')
+    parser.add_argument('--cbs-max-nodes', type=int, default=2000, help='CBS node budget (0 for none)')
+    parser.add_argument('--cbs-max-seconds', type=float, default=30, help='CBS time limit (0 for none)')
+    parser.add_argument('--cbs-max-mb', type=float, default=None, help='CBS open list memory budget in MB')
+    parser.add_argument('--cbs-spill', action='store_true', help='spill the compacted CBS nodes to disk instead of dropping them')
+    parser.add_argument('--cbs-suboptimality', type=float, default=1.0, help='CBS focal search bound (ECBS), 1 for plain CBS')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip the tracemalloc pass')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds before a case is abandoned')
+    parser.add_argument('--only', nargs='*', default=None, help='run only these planners')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this results JSON file')
+    parser.add_argument('--save-baseline', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative wall time increase')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, in_map, planners in scenarios(args):
+        for planner in planners:
+            if args.only and planner not in args.only:
+                continue
+            key = f'{planner}/{name}'
+            result = results[key] = run_case(planner, in_map, args)
+            if 'error' in result:
+                print(f"{key:<28} error: {result['error']}")
+            else:
+                print(f"{key:<28} wall {result['wall']:9.4f}s  cost {result['cost']:9.3f}  failures {result['failures']}"
+                      + (f"  peak {result['peak_memory'] / 1024:9.1f} KiB" if 'peak_memory' in result else ''))
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
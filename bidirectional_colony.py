@@ -0,0 +1,158 @@
+# 双向蚁群：从起点出发的前向蚁群和从终点出发的后向蚁群，各自有独立的信息素，在中间相遇
+#
+# 每次迭代：
+#   1. 后向蚂蚁从终点出发，走到起点或走到上一次迭代前向蚂蚁访问过的格子时停止
+#   2. 前向蚂蚁从起点出发，走到本次迭代后向蚂蚁访问过的格子（包括终点）时停止
+# 每个格子记录最先到达它的蚂蚁和步数（按格子 flat index 的数组，每次迭代重建），
+# 相遇时用这只蚂蚁的路径前缀补全整条路径，再去掉两半之间的环路。
+# 完整路径同时更新两个信息素场（后向场使用反向路径）。
+# 前向/后向蚂蚁各走大约一半的路程，长走廊地图（narrow.txt, big.txt）上每次迭代的步数大约减半。
+
+import copy
+import numpy as np
+from ant_colony import AntColony
+from path_array import PathArray
+
+
+def _reverse_map(in_map):
+    """
+    Copy of a single-robot map going from its goal to its start, with its own nodes (pheromone field);
+    its edges are those of in_map reversed, a backward move u -> v being allowed when v -> u is
+    """
+    backward = copy.copy(in_map)
+    backward.initial_node, backward.final_node = in_map.final_node, in_map.initial_node
+    if in_map.one_way is None:
+        # 代价系数和障碍对两个方向相同，没有单行道时反向的边与原来的边一样
+        backward.nodes_array = copy.deepcopy(in_map.nodes_array)
+        return backward
+    # 单行道反向：u -> v 与 v -> u 的方向分量相反，两个格子的行进方向取反后允许的移动正好互换
+    backward.one_way = -in_map.one_way
+    backward._clear_edge_caches()
+    backward.nodes_array = backward._create_nodes() if in_map.nodes_array else []
+    return backward
+
+
+def _join(prefix, suffix):
+    """Path prefix + suffix (lists of cells, both loop free, sharing the meeting cell) with the loop between them removed"""
+    in_suffix = {cell: j for j, cell in enumerate(suffix)}
+    for a, cell in enumerate(prefix):   # 前缀中最早出现在后缀里的格子，之前的部分与后缀没有交集
+        if cell in in_suffix:
+            return prefix[:a] + suffix[in_suffix[cell]:]
+    return prefix + suffix
+
+
+class _VisitIndex:
+    """Cells visited by a set of walks: for each cell the walk and step that reached it first"""
+
+    def __init__(self, n_cells, walks):
+        self.walks = walks
+        self.mask = np.zeros(n_cells, dtype=np.uint8)
+        self.owner = np.full(n_cells, -1, dtype=np.int64)
+        self.step = np.zeros(n_cells, dtype=np.int64)
+        if not walks:
+            return
+        cells = np.concatenate([np.asarray(walk, dtype=np.int64) for walk in walks])
+        owners = np.repeat(np.arange(len(walks)), [len(walk) for walk in walks])
+        steps = np.concatenate([np.arange(len(walk)) for walk in walks])
+        order = np.lexsort((steps, cells))   # 每个格子步数最少的记录排在最前
+        cells, owners, steps = cells[order], owners[order], steps[order]
+        first = np.ones(len(cells), dtype=bool)
+        first[1:] = cells[1:] != cells[:-1]
+        self.owner[cells[first]] = owners[first]
+        self.step[cells[first]] = steps[first]
+        self.mask[cells[first]] = 1
+
+    def prefix(self, cell):
+        ''' Walk from its root to cell '''
+        return self.walks[self.owner[cell]][:int(self.step[cell]) + 1]
+
+
+class BidirectionalAntColony(AntColony):
+    """
+    AntColony searching from both ends: n_ants // 2 backward ants from the goal, the rest
+    from the start, each direction with its own pheromone field
+
+    The Args are those of AntColony; time constraints (CBS) and colony_sizing are not
+    supported, since backward ants do not know the time at which they reach a cell
+    """
+
+    def __init__(self, in_map, n_ants, iterations, evaporation_factor, pheromone_adding_constant, alpha, beta,
+                 constraints=None, pheromone_prior=None, update_strategy=None, telemetry=None, rng=None):
+        if constraints:
+            raise ValueError("BidirectionalAntColony does not support time constraints")
+        super().__init__(in_map, n_ants - n_ants // 2, iterations, evaporation_factor, pheromone_adding_constant,
+                         alpha, beta, None, pheromone_prior, update_strategy, telemetry, rng=rng)
+        self.backward = AntColony(_reverse_map(in_map), n_ants // 2, iterations, evaporation_factor,
+                                  pheromone_adding_constant, alpha, beta, update_strategy=update_strategy,
+                                  rng=self.rng)
+        self.cols = in_map.occupancy_map.shape[1]
+        self.n_cells = in_map.occupancy_map.size
+        self._forward_visits = None   # 上一次迭代前向蚂蚁的访问记录
+
+    def _walk(self, colony, walker, stop):
+        ''' One walk of colony, as flat indices, ending at its goal, a dead end or a stop cell '''
+        if walker is not None:
+            return walker.walk(stop)
+        # 没有行走内核时（自定义选择规则）与 AntColony.walk_ant 相同的循环
+        cols = self.cols
+        goal = tuple(colony.map.final_node)
+        actual = tuple(colony.map.initial_node)
+        visited = [actual]
+        while True:
+            node = colony.select_next_node(colony.get_node(actual), len(visited) - 1, visited)
+            if node is None:
+                return [r * cols + c for r, c in visited], False
+            actual = tuple(node)
+            visited.append(actual)
+            if actual == goal or stop[actual[0] * cols + actual[1]]:
+                return [r * cols + c for r, c in visited], True
+
+    def walk_ants(self):
+        ''' Backward then forward walks; the completed paths go to self.paths (start -> goal) '''
+        if self.run_info.get('iterations', 0) == 0:   # 新的一次运行
+            self.backward._walker = None
+            self._forward_visits = None
+        walkers = []
+        for colony in (self.backward, self):
+            walker = colony.get_walker()
+            if walker is not None:
+                walker.load_pheromone(colony)
+            walkers.append(walker)
+        start = self.map.initial_node[0] * self.cols + self.map.initial_node[1]
+        goal = self.map.final_node[0] * self.cols + self.map.final_node[1]
+        forward_visits = self._forward_visits
+        stop = forward_visits.mask if forward_visits is not None else np.zeros(self.n_cells, dtype=np.uint8)
+
+        steps, died = 0, 0
+        backward_walks = []
+        for _ in range(self.backward.active_ants):
+            walk, reached = self._walk(self.backward, walkers[0], stop)
+            steps += len(walk) - 1
+            backward_walks.append(walk)
+            if not reached:
+                died += 1
+            elif walk[-1] == start:
+                self.add_to_path_results(PathArray(walk[::-1], self.cols))
+            else:   # 遇到上一次迭代的前向蚂蚁
+                self.add_to_path_results(PathArray(_join(forward_visits.prefix(walk[-1]), walk[::-1]), self.cols))
+
+        backward_visits = _VisitIndex(self.n_cells, backward_walks)
+        forward_walks = []
+        for _ in range(self.active_ants):
+            walk, reached = self._walk(self, walkers[1], backward_visits.mask)
+            steps += len(walk) - 1
+            forward_walks.append(walk)
+            if not reached:
+                died += 1
+            elif walk[-1] == goal:
+                self.add_to_path_results(PathArray(walk, self.cols))
+            else:   # 遇到本次迭代的后向蚂蚁
+                self.add_to_path_results(PathArray(_join(walk, backward_visits.prefix(walk[-1])[::-1]), self.cols))
+        self._forward_visits = _VisitIndex(self.n_cells, forward_walks)
+        return self.backward.active_ants + self.active_ants, died, steps
+
+    def pheromone_update(self):
+        ''' Updates both pheromone fields with the completed paths, the backward one with the reversed paths '''
+        max_pheromone = super().pheromone_update()
+        self.backward.paths = [PathArray(path.cells[::-1], self.cols) for path in self.paths]
+        return max(max_pheromone, self.backward.update_strategy.update(self.backward))
@@ -0,0 +1,90 @@
+# 蚁群规模策略：每次迭代后决定下一次迭代有多少只蚂蚁行走
+#
+# AntColony 在开始时按 max_ants 创建蚂蚁池，之后只改变参与行走的数量 (colony.active_ants)，
+# 蚂蚁对象在迭代之间复用，不重新分配。
+#   resize(colony, stats) -- 每次迭代结束后调用，返回下一次迭代的蚂蚁数
+# stats 的内容：
+#   iteration   -- 本次迭代的序号（从 0 开始）
+#   ants        -- 本次迭代行走的蚂蚁数
+#   succeeded   -- 到达终点的蚂蚁数
+#   convergence -- 到达终点的蚂蚁中，路径长度等于本次最优长度的比例（信息素集中在一条路径上时接近 1）
+#   improved    -- 本次迭代是否缩短了最短路径
+#   stagnation  -- 最短路径连续多少次迭代没有改进
+
+
+class FixedSize:
+    """Every iteration walks n_ants ants, the classic behaviour"""
+
+    def max_ants(self, colony):
+        return colony.n_ants
+
+    def initial(self, colony):
+        return colony.n_ants
+
+    def resize(self, colony, stats):
+        return stats['ants']
+
+
+class AdaptiveSize(FixedSize):
+    """
+    Starts with a large exploratory colony and shrinks it while the ants converge on one
+    route, grows it again when the search stagnates before converging
+
+    Args:
+        warmup: iterations run with the full colony before any resizing
+        min_ants: smallest colony, max(2, n_ants // 8) by default
+        max_ants: largest colony (size of the ant pool), n_ants by default
+        shrink: factor applied when the convergence reaches `converged`
+        grow: factor applied when no ant succeeds, or after `patience` iterations without
+              improvement while the colony has not converged
+        converged: convergence above which the colony shrinks
+        patience: iterations without improvement counted as stagnation
+    """
+
+    def __init__(self, warmup=10, min_ants=None, max_ants=None, shrink=0.75, grow=2.0, converged=0.8, patience=5):
+        self.warmup = warmup
+        self.smallest = min_ants
+        self.largest = max_ants
+        self.shrink = shrink
+        self.grow = grow
+        self.converged = converged
+        self.patience = patience
+
+    def max_ants(self, colony):
+        return self.largest if self.largest is not None else colony.n_ants
+
+    def _min_ants(self, colony):
+        return self.smallest if self.smallest is not None else max(2, colony.n_ants // 8)
+
+    def initial(self, colony):
+        return self.max_ants(colony)
+
+    def resize(self, colony, stats):
+        n = stats['ants']
+        if stats['iteration'] + 1 < self.warmup:
+            return n
+        if stats['succeeded'] == 0 or (stats['stagnation'] >= self.patience and stats['convergence'] < self.converged):
+            n = int(round(n * self.grow))   # 停滞：增加探索
+        elif stats['convergence'] >= self.converged:
+            n = int(n * self.shrink)        # 收敛：减少蚂蚁
+        return max(self._min_ants(colony), min(self.max_ants(colony), n))
+
+
+SIZINGS = {'fixed': FixedSize, 'adaptive': AdaptiveSize}
+
+
+def make_sizing(sizing=None, **kwargs):
+    """
+    Returns a colony sizing instance
+
+    Args:
+        sizing: None (fixed), 'fixed', 'adaptive', or a sizing instance
+        kwargs: passed to the constructor when a name is given
+    """
+    if sizing is None:
+        return FixedSize()
+    if isinstance(sizing, str):
+        if sizing not in SIZINGS:
+            raise ValueError(f"Unknown colony sizing: {sizing}")
+        return SIZINGS[sizing](**kwargs)
+    return sizing
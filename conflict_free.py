@@ -1,193 +1,485 @@
-# 解决点冲突问题
-
-# 检查是否有冲突出现 并 解决冲突
-import copy
-from ant_colony import AntColony
-from heapq import heappush, heappop
-
-class CBSConstraint:
-    """Constraint class for CBS"""
-    def __init__(self, agent, loc, timestep):
-        self.agent = agent       # Agent that is constrained
-        self.loc = loc          # Location that is constrained
-        self.timestep = timestep # Timestep at which the constraint is active
-    
-    def __eq__(self, other):
-        """Check if two constraints are equal (same agent, location, and timestep)"""
-        if not isinstance(other, CBSConstraint):
-            return False
-        return (self.agent == other.agent and 
-                self.loc == other.loc and 
-                self.timestep == other.timestep)
-    
-    def __hash__(self):
-        """Hash function for constraint comparison"""
-        return hash((self.agent, self.loc, self.timestep))
-    
-    def __repr__(self):
-        """String representation for debugging"""
-        return f"CBSConstraint(agent={self.agent}, loc={self.loc}, timestep={self.timestep})"
-
-class CBSNode:
-    """Node class for CBS constraint tree"""
-    def __init__(self, solution, cost, constraints=None):
-        self.solution = solution    # List of paths for each agent
-        self.cost = cost           # Sum of individual path costs
-        self.constraints = constraints if constraints else []  # List of constraints
-
-    def __lt__(self, other):
-        return self.cost < other.cost
-
-def get_path_cost(path):
-    """Calculate the cost of a path"""
-    return len(path) if path else 0
-
-def detect_conflicts(solution):
-    """Detect both vertex and edge conflicts between all pairs of agents"""
-    conflicts = []
-    for i in range(len(solution)):
-        for j in range(i + 1, len(solution)):
-            flag = False
-            path1, path2 = solution[i], solution[j]
-            
-            # Pad shorter path with its last position
-            max_len = max(len(path1), len(path2))
-            path1_padded = path1 + [path1[-1]] * (max_len - len(path1))
-            path2_padded = path2 + [path2[-1]] * (max_len - len(path2))
-            
-            # Check for vertex conflicts
-            for t in range(max_len):
-                if path1_padded[t] == path2_padded[t]:
-                    conflicts.append({
-                        'type': 'vertex',
-                        'time': t,
-                        'agents': (i, j),
-                        'loc': path1_padded[t]
-                    })
-                    break   
-            
-            # Check for edge conflicts
-            for t in range(max_len - 1):
-                if path1_padded[t] == path2_padded[t+1] and path1_padded[t+1] == path2_padded[t]:
-                    conflicts.append({
-                        'type': 'edge',
-                        'time': t,
-                        'agents': (i, j),
-                        'loc1': path1_padded[t],
-                        'loc2': path1_padded[t+1]
-                    })
-                    break
-
-    return conflicts
-
-def find_new_path(agent_path, constraints, start, goal, w, ants, iterations, p, Q, alpha, beta):
-    """Find a new path that satisfies the constraints using A* search"""
-    # For simplicity, we'll just modify the existing path to avoid constraints
-    # In a full implementation, this should be replaced with A* search
-    new_path1 = copy.deepcopy(agent_path)
-    
-    # 等待策略
-    for constraint in constraints:
-        if constraint.timestep < len(new_path1):
-            # 简单处理，采用等待策略
-            print("agent: ", constraint.agent, "timestep: ", constraint.timestep, "loc: ", constraint.loc,"wait")
-            new_path1.insert(constraint.timestep, new_path1[constraint.timestep - 1])
-    return new_path1
-    # # 使用蚁群算法
-    # Colony = AntColony(w, ants, iterations, p, Q, alpha, beta, constraints)
-    # new_path2 = Colony.calculate_path()
-
-    # # 选择最优路径
-    # if new_path1 and new_path2:
-    #     cost1 = get_path_cost(new_path1)
-    #     cost2 = get_path_cost(new_path2)
-    #     if cost1 < cost2:
-    #         print("new_path1 cost: ", cost1, "new_path2 cost: ", cost2)
-    #         return new_path1
-    #     else:
-    #         print("new_path2 cost: ", cost2, "new_path1 cost: ", cost1)
-    #         return new_path2
-    # elif new_path1: # 只有new_path1
-    #     return new_path1
-    # return new_path2
-
-def do_conflict_free(routes, M, ants, iterations, p, Q, alpha, beta):
-    """
-    Implement Conflict-Based Search (CBS) for multi-agent path finding
-    
-    Args:
-        routes: List of paths for each agent, where each path is a list of coordinates
-    
-    Returns:
-        Conflict-free routes for all agents
-    """
-    # Initialize CBS
-    root = CBSNode(routes, sum(get_path_cost(path) for path in routes))
-    open_list = []
-    heappush(open_list, root) # 将根节点加入到open_list中
-    
-    while open_list:
-        node = heappop(open_list)
-        
-        # Detect conflicts in current solution
-        conflicts = detect_conflicts(node.solution)
-        
-        if not conflicts:  # Solution is conflict-free
-            print("Solution is conflict-free")
-            return node.solution
-            
-        # Take first conflict and create two child nodes
-        conflict = conflicts[0]
-        for agent_idx in conflict['agents']: # 遍历冲突的agent(左右子节点)
-            # Create new constraints
-            new_constraints = copy.deepcopy(node.constraints)
-            if conflict['type'] == 'vertex': # 顶点冲突
-                print("Conflict type: vertex, loc: ", conflict['loc'])
-                new_constraint = CBSConstraint(
-                    agent_idx,
-                    conflict['loc'],
-                    conflict['time']
-                )
-            else:  # 边冲突 
-                print("Conflict type: edge, loc1: ", conflict['loc1'], "loc2: ", conflict['loc2'])
-                new_constraint = CBSConstraint(
-                    agent_idx,
-                    (conflict['loc1'], conflict['loc2']),
-                    conflict['time']
-                )
-            
-            # 检查约束是否已存在，避免重复添加
-            if new_constraint not in new_constraints:
-                new_constraints.append(new_constraint)
-                print(f"添加新约束: {new_constraint}")
-            else:
-                print(f"约束已存在，跳过: {new_constraint}")
-                continue  # 如果约束已存在，跳过这个分支
-            
-            # Find new path for constrained agent
-            new_solution = copy.deepcopy(node.solution)
-            w = copy.deepcopy(M[agent_idx])
-            w.nodes_array = w._create_nodes()
-            new_path = find_new_path(
-                new_solution[agent_idx],
-                new_constraints,
-                new_solution[agent_idx][0],  # start
-                new_solution[agent_idx][-1],  # goal
-                w, ants, iterations, p, Q, alpha, beta
-            )
-            
-            if new_path:  # If a new path is found
-                new_solution[agent_idx] = new_path
-                new_cost = sum(get_path_cost(path) for path in new_solution)
-                new_node = CBSNode(new_solution, new_cost, new_constraints)
-                heappush(open_list, new_node)
-    
-    # # If no solution is found, return original routes
-    return routes
-
-
-
-
-
-
-
+# 解决点冲突问题
+
+# 检查是否有冲突出现 并 解决冲突
+import pickle
+import sys
+import tempfile
+import time
+import numpy as np
+from ant_colony import AntColony
+from conflict_graph import conflict_graph, count_conflicting_pairs
+from heapq import heapify, heappush, heappop
+from telemetry import NULL_SINK
+
+class CBSConstraint:
+    """Constraint class for CBS"""
+    def __init__(self, agent, loc, timestep):
+        self.agent = agent       # Agent that is constrained
+        self.loc = loc          # Location that is constrained
+        self.timestep = timestep # Timestep at which the constraint is active
+    
+    def __eq__(self, other):
+        """Check if two constraints are equal (same agent, location, and timestep)"""
+        if not isinstance(other, CBSConstraint):
+            return False
+        return (self.agent == other.agent and 
+                self.loc == other.loc and 
+                self.timestep == other.timestep)
+    
+    def __hash__(self):
+        """Hash function for constraint comparison"""
+        return hash((self.agent, self.loc, self.timestep))
+    
+    def __repr__(self):
+        """String representation for debugging"""
+        return f"CBSConstraint(agent={self.agent}, loc={self.loc}, timestep={self.timestep})"
+
+class CBSRangeConstraint(CBSConstraint):
+    """Range constraint: the agent may not occupy any of the cells at any timestep in [timestep, end]"""
+    def __init__(self, agent, cells, timestep, end):
+        super().__init__(agent, frozenset(tuple(c) for c in cells), timestep)
+        self.end = end           # Last constrained timestep (inclusive)
+
+    def covers(self, pos, timestep):
+        """True if being at pos at timestep violates the constraint"""
+        return self.timestep <= timestep <= self.end and tuple(pos) in self.loc
+
+    def __eq__(self, other):
+        return (isinstance(other, CBSRangeConstraint) and super().__eq__(other) and
+                self.end == other.end)
+
+    def __hash__(self):
+        return hash((self.agent, self.loc, self.timestep, self.end))
+
+    def __repr__(self):
+        return (f"CBSRangeConstraint(agent={self.agent}, cells={sorted(self.loc)}, "
+                f"timesteps={self.timestep}..{self.end})")
+
+class CBSNode:
+    """Node class for CBS constraint tree, storing only the paths that differ from the root solution"""
+    __slots__ = ('paths', 'cost', 'constraints', 'conflicts', 'size')
+
+    def __init__(self, paths, cost, constraints=(), conflicts=0):
+        self.paths = paths             # agent -> path, only the agents replanned since the root
+        self.cost = cost               # Sum of individual path costs
+        self.constraints = constraints # Tuple of constraints, shared with the parent's prefix
+        self.conflicts = conflicts     # Conflicting agent pairs, see count_conflicting_pairs
+        self.size = 0                  # Estimated bytes, see node_bytes
+
+    def solution(self, root):
+        """Paths of every agent, given the root solution"""
+        return [self.paths.get(i, path) for i, path in enumerate(root)]
+
+    def __lt__(self, other):
+        # 代价相同时冲突少的节点优先
+        return (self.cost, self.conflicts) < (other.cost, other.conflicts)
+
+NODE_OVERHEAD = 96        # CBSNode 对象本身的字节数（估计值）
+SEEN_ENTRY_BYTES = 100    # 去重表每项除约束集合本身外的字节数（估计值）
+
+def node_bytes(node, new_path=()):
+    """Estimated memory of a node: its own objects, the paths shared with other nodes are not counted"""
+    return NODE_OVERHEAD + sys.getsizeof(node.paths) + sys.getsizeof(node.constraints) + sys.getsizeof(new_path)
+
+def seen_bytes(key):
+    """Estimated memory of a dedup table entry keyed by the frozenset key (its constraints are shared with the nodes)"""
+    return SEEN_ENTRY_BYTES + sys.getsizeof(key)
+
+class _Spill:
+    """Batches of CBS nodes moved out of memory into a temporary file, read back in the order written"""
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.batches = []   # 每批在文件中的偏移
+
+    def write(self, nodes):
+        self.batches.append(self.file.seek(0, 2))
+        pickle.dump([(n.paths, n.cost, n.constraints, n.conflicts, n.size) for n in nodes], self.file)
+
+    def read(self):
+        self.file.seek(self.batches.pop(0))
+        nodes = []
+        for paths, cost, constraints, conflicts, size in pickle.load(self.file):
+            node = CBSNode(paths, cost, constraints, conflicts)
+            node.size = size
+            nodes.append(node)
+        return nodes
+
+    def close(self):
+        self.file.close()
+
+def get_path_cost(path):
+    """Calculate the cost of a path"""
+    return len(path) if path else 0
+
+def footprint_cells(pos, reach):
+    """Cells within Chebyshev distance `reach` of pos"""
+    return [(pos[0] + dr, pos[1] + dc) for dr in range(-reach, reach + 1) for dc in range(-reach, reach + 1)]
+
+def detect_proximity_conflicts(solution, radius=0, k=0, horizon=None):
+    """
+    Conflicts of robots with a footprint and a safety buffer in time, found with a
+    (timestep, cell) -> agents index instead of comparing every pair step by step
+
+    Two agents conflict when their centres are within Chebyshev distance 2 * radius
+    (their square footprints of `radius` cells overlap) at timesteps at most k apart
+    (k-robustness). Agents stay at their goal after their path ends. One conflict,
+    the earliest, is reported per pair, pairs in the same order as detect_conflicts.
+    With a horizon only the conflicts before that timestep are reported
+    """
+    if not solution:
+        return []
+    steps = max(len(path) for path in solution)
+    if horizon is not None:
+        steps = min(steps, horizon)   # 更晚的时间步不可能产生 time < horizon 的冲突
+    index = {}
+    for agent, path in enumerate(solution):
+        for t in range(steps + k):
+            index.setdefault((t, tuple(path[min(t, len(path) - 1)])), []).append(agent)
+
+    reach = 2 * radius
+    offsets = footprint_cells((0, 0), reach)
+    earliest = {}   # (i, j) -> (time, t_i, t_j)
+    for i, path in enumerate(solution):
+        for t in range(steps + k):
+            pos = path[min(t, len(path) - 1)]
+            for t_j in range(max(t - k, 0), t + k + 1):
+                for dr, dc in offsets:
+                    for j in index.get((t_j, (pos[0] + dr, pos[1] + dc)), ()):
+                        if j <= i:
+                            continue
+                        found = (min(t, t_j), t, t_j)
+                        if horizon is not None and found[0] >= horizon:
+                            continue
+                        if (i, j) not in earliest or found < earliest[(i, j)]:
+                            earliest[(i, j)] = found
+
+    conflicts = []
+    for (i, j), (time, t_i, t_j) in sorted(earliest.items()):
+        conflicts.append({
+            'type': 'proximity',
+            'time': time,
+            'agents': (i, j),
+            'loc': tuple(solution[i][min(t_i, len(solution[i]) - 1)]),
+            'time_i': t_i,
+            'loc_j': tuple(solution[j][min(t_j, len(solution[j]) - 1)]),
+            'time_j': t_j,
+        })
+    return conflicts
+
+def detect_conflicts(solution, radius=0, k=0, horizon=None):
+    """
+    Detect both vertex and edge conflicts between all pairs of agents
+
+    With radius > 0 (footprint in cells) or k > 0 (k-robust, timesteps of safety buffer)
+    the proximity conflicts of detect_proximity_conflicts are returned instead.
+    With a horizon (rolling-horizon planning) only the conflicts before that timestep are reported
+    """
+    if radius > 0 or k > 0:
+        return detect_proximity_conflicts(solution, radius, k, horizon)
+    if len(solution) < 2:
+        return []
+    # 所有机器人对一次向量化统计 (conflict_graph)，每对报告最早的顶点冲突和最早的边冲突
+    graph = conflict_graph(solution, horizon)
+    first_edge, first_wait = graph['first_edge'], graph['first_shared_wait']
+    conflicts = []
+    for i, j in graph['pairs']:   # 同一格子上的等待也是顶点冲突，这些对都在 pairs 中
+        path1 = solution[i]
+        t = int(graph['first_vertex'][i, j])
+        if t >= 0:
+            conflicts.append({
+                'type': 'vertex',
+                'time': t,
+                'agents': (i, j),
+                'loc': path1[min(t, len(path1) - 1)]
+            })
+        times = [int(x) for x in (first_edge[i, j], first_wait[i, j]) if x >= 0]
+        if times:
+            t = min(times)
+            conflicts.append({
+                'type': 'edge',
+                'time': t,
+                'agents': (i, j),
+                'loc1': path1[min(t, len(path1) - 1)],
+                'loc2': path1[min(t + 1, len(path1) - 1)]
+            })
+
+    return conflicts
+
+def find_new_path(agent_path, constraints, start, goal, w, ants, iterations, p, Q, alpha, beta, telemetry=NULL_SINK):
+    """Find a new path that satisfies the constraints using A* search"""
+    # For simplicity, we'll just modify the existing path to avoid constraints
+    # In a full implementation, this should be replaced with A* search
+    new_path1 = list(agent_path)   # 路径点不会被修改，浅复制即可
+    
+    # 等待策略
+    for constraint in constraints:
+        if isinstance(constraint, CBSRangeConstraint):
+            if telemetry.enabled:
+                telemetry.event('wait', agent=constraint.agent, timestep=constraint.timestep, loc=sorted(constraint.loc))
+            new_path1 = wait_out_range(new_path1, constraint)
+            continue
+        if constraint.timestep < len(new_path1):
+            # 简单处理，采用等待策略
+            if telemetry.enabled:
+                telemetry.event('wait', agent=constraint.agent, timestep=constraint.timestep, loc=constraint.loc)
+            new_path1.insert(constraint.timestep, new_path1[constraint.timestep - 1])
+    return new_path1
+    # # 使用蚁群算法
+    # Colony = AntColony(w, ants, iterations, p, Q, alpha, beta, constraints)
+    # new_path2 = Colony.calculate_path()
+
+    # # 选择最优路径
+    # if new_path1 and new_path2:
+    #     cost1 = get_path_cost(new_path1)
+    #     cost2 = get_path_cost(new_path2)
+    #     if cost1 < cost2:
+    #         print("new_path1 cost: ", cost1, "new_path2 cost: ", cost2)
+    #         return new_path1
+    #     else:
+    #         print("new_path2 cost: ", cost2, "new_path1 cost: ", cost1)
+    #         return new_path2
+    # elif new_path1: # 只有new_path1
+    #     return new_path1
+    # return new_path2
+
+def wait_out_range(path, constraint):
+    """Delays the path with waits before constraint.timestep until it no longer violates the range constraint"""
+    start = max(constraint.timestep, 1)
+    horizon = constraint.end + 1
+    for delay in range(horizon + len(path) + 1):
+        if start > len(path):
+            return path
+        delayed = path[:start] + [path[start - 1]] * delay + path[start:]
+        if not any(constraint.covers(delayed[min(t, len(delayed) - 1)], t)
+                   for t in range(constraint.timestep, horizon)):
+            return delayed
+    return path   # 等待无法避开（例如约束覆盖了起点或终点）
+
+def range_constraints(conflict, radius, k):
+    """The two CBSRangeConstraint of a proximity conflict: each agent must keep clear of the other's
+    footprint during the other's k-robust time window"""
+    reach = 2 * radius
+    i, j = conflict['agents']
+    return {
+        i: CBSRangeConstraint(i, footprint_cells(conflict['loc_j'], reach),
+                              max(conflict['time_j'] - k, 0), conflict['time_j'] + k),
+        j: CBSRangeConstraint(j, footprint_cells(conflict['loc'], reach),
+                              max(conflict['time_i'] - k, 0), conflict['time_i'] + k),
+    }
+
+def cbs_search(routes, M, ants, iterations, p, Q, alpha, beta, telemetry=NULL_SINK, radius=0, k=0, horizon=None,
+               max_nodes=None, max_bytes=None, max_seconds=None, spill=False, suboptimality=1.0, should_stop=None):
+    """
+    Conflict-Based Search (CBS) with resource limits
+
+    Args:
+        routes, M, ants ... horizon: see do_conflict_free
+        max_nodes: stop after generating this many nodes
+        max_bytes: memory budget of the open list and the duplicate table (estimated, see node_bytes);
+                   when exceeded, the open list is compacted: the cheapest nodes filling half of the
+                   budget are kept, the others are dropped (or spilled), and the duplicate table is
+                   reduced to the kept nodes
+        max_seconds: time limit
+        spill: write the nodes removed by the compaction to a temporary file instead of dropping
+               them, they are searched after the nodes kept in memory
+        suboptimality: with w > 1, focal search (ECBS style): the next node is the one with the fewest
+                       conflicting pairs among the nodes costing at most w times the cheapest one,
+                       so the solution costs at most w times the optimum of the search
+        should_stop: callable checked before every expansion, returning True stops the search
+                     (status 'cancelled'), e.g. for cancellation from another thread
+
+    Nodes are expanded by cost, ties broken by their number of conflicting agent pairs (vertex and
+    edge conflicts, see count_conflicting_pairs, also for radius / k where it is a lower bound).
+
+    Returns:
+        dict with 'routes' (the solution, or when the search stops without one the expanded node
+        with the fewest conflicts), 'status' ('solved', 'node_limit', 'time_limit', 'memory_limit',
+        'cancelled' or 'exhausted'), 'solved', 'conflicts' (left in 'routes'), 'cost', 'expanded', 'generated',
+        'duplicates', 'dropped', 'spilled', 'peak_bytes' and 'elapsed'
+    """
+    t0 = time.monotonic()
+    root = CBSNode({}, sum(get_path_cost(path) for path in routes), (), count_conflicting_pairs(routes, horizon))
+    root.size = node_bytes(root)
+    open_list = [root]
+    open_bytes = root.size
+    # 约束集合 -> 最低代价；同一约束集合的节点只保留代价最低的。键是集合本身而不是它的 hash，
+    # hash 冲突会把不同约束集合的节点当作重复剪掉，CBS 就不再完备/最优
+    seen = {frozenset(): root.cost}
+    seen_total = seen_bytes(frozenset())
+    stats = {'expanded': 0, 'generated': 1, 'duplicates': 0, 'dropped': 0, 'spilled': 0, 'peak_bytes': open_bytes}
+    best = None   # (冲突数, 代价, 节点)
+    status = 'exhausted'
+    spilled = _Spill() if spill and max_bytes else None
+    try:
+        while True:
+            if not open_list:
+                if spilled is None or not spilled.batches:
+                    break
+                for node in spilled.read():   # 内存中的节点已经搜索完，读回一批溢出的节点
+                    heappush(open_list, node)
+                    open_bytes += node.size
+            if max_seconds is not None and time.monotonic() - t0 >= max_seconds:
+                status = 'time_limit'
+                break
+            if should_stop is not None and should_stop():
+                status = 'cancelled'
+                break
+            if max_nodes is not None and stats['generated'] >= max_nodes:
+                status = 'node_limit'
+                break
+            node = heappop(open_list) if suboptimality <= 1.0 else _pop_focal(open_list, suboptimality)
+            open_bytes -= node.size
+            stats['expanded'] += 1
+            solution = node.solution(routes)
+
+            # Detect conflicts in current solution
+            conflicts = detect_conflicts(solution, radius, k, horizon)
+            if best is None or (len(conflicts), node.cost) < best[:2]:
+                best = (len(conflicts), node.cost, node)
+
+            if not conflicts:  # Solution is conflict-free
+                if telemetry.enabled:
+                    telemetry.event('solved', cost=node.cost, constraints=len(node.constraints))
+                status = 'solved'
+                break
+
+            # Take first conflict and create two child nodes
+            conflict = conflicts[0]
+            for agent_idx in conflict['agents']: # 遍历冲突的agent(左右子节点)
+                # Create new constraints
+                if telemetry.enabled:
+                    telemetry.event('conflict', **conflict)
+                if conflict['type'] == 'proximity':  # 占地/k-robust 冲突：一次分裂约束一片格子 x 时间窗口
+                    new_constraint = range_constraints(conflict, radius, k)[agent_idx]
+                elif conflict['type'] == 'vertex': # 顶点冲突
+                    new_constraint = CBSConstraint(
+                        agent_idx,
+                        conflict['loc'],
+                        conflict['time']
+                    )
+                else:  # 边冲突
+                    new_constraint = CBSConstraint(
+                        agent_idx,
+                        (conflict['loc1'], conflict['loc2']),
+                        conflict['time']
+                    )
+
+                # 检查约束是否已存在，避免重复添加
+                if new_constraint in node.constraints:
+                    if telemetry.enabled:
+                        telemetry.event('constraint_skipped', constraint=new_constraint)
+                    continue  # 如果约束已存在，跳过这个分支
+                new_constraints = node.constraints + (new_constraint,)
+                if telemetry.enabled:
+                    telemetry.event('constraint_added', constraint=new_constraint)
+
+                # Find new path for constrained agent
+                # 等待策略不需要地图节点；改回蚁群重规划时才需要复制地图并 _create_nodes()
+                old_path = solution[agent_idx]
+                new_path = find_new_path(
+                    old_path,
+                    list(new_constraints),
+                    old_path[0],  # start
+                    old_path[-1],  # goal
+                    M[agent_idx], ants, iterations, p, Q, alpha, beta, telemetry
+                )
+                if not new_path:  # No new path found
+                    continue
+                new_cost = node.cost - get_path_cost(old_path) + get_path_cost(new_path)
+                key = frozenset(new_constraints)
+                if seen.get(key, float('inf')) <= new_cost:   # 相同约束集合的节点已生成过（被支配）
+                    stats['duplicates'] += 1
+                    continue
+                if key not in seen:
+                    seen_total += seen_bytes(key)
+                seen[key] = new_cost
+                paths = dict(node.paths)
+                paths[agent_idx] = new_path
+                child_solution = list(solution)
+                child_solution[agent_idx] = new_path
+                child = CBSNode(paths, new_cost, new_constraints, count_conflicting_pairs(child_solution, horizon))
+                child.size = node_bytes(child, new_path)
+                heappush(open_list, child)
+                open_bytes += child.size
+                stats['generated'] += 1
+
+            used = open_bytes + seen_total
+            stats['peak_bytes'] = max(stats['peak_bytes'], used)
+            if max_bytes is not None and used > max_bytes:
+                # 保留代价最低、占用不超过预算一半的节点；去重表只保留这些节点的约束集合
+                open_list, removed = _compact(open_list, max_bytes // 2)
+                open_bytes = sum(n.size for n in open_list)
+                seen = {}
+                for n in open_list:
+                    key = frozenset(n.constraints)
+                    seen[key] = min(n.cost, seen.get(key, float('inf')))
+                seen_total = sum(seen_bytes(key) for key in seen)
+                if spilled is not None:
+                    spilled.write(removed)
+                    stats['spilled'] += len(removed)
+                else:
+                    stats['dropped'] += len(removed)
+                if open_bytes + seen_total > max_bytes:
+                    status = 'memory_limit'   # 单个节点已超出预算
+                    break
+    finally:
+        if spilled is not None:
+            spilled.close()
+
+    if status == 'exhausted' and stats['dropped']:
+        status = 'memory_limit'   # 丢弃过节点，搜索不完整
+    if best is None:   # 扩展根节点之前就停止 (时间用完或被取消)
+        best = (len(detect_conflicts(routes, radius, k, horizon)), root.cost, root)
+    if status != 'solved' and telemetry.enabled:
+        telemetry.event('cbs_stopped', status=status, conflicts=best[0], expanded=stats['expanded'])
+    return dict(stats, routes=best[2].solution(routes), status=status, solved=status == 'solved',
+                conflicts=best[0], cost=best[1], elapsed=time.monotonic() - t0)
+
+def _pop_focal(open_list, suboptimality):
+    """Removes and returns the node with the fewest conflicts (then the cheapest) among the nodes
+    costing at most suboptimality times the cheapest one"""
+    bound = open_list[0].cost * suboptimality
+    best = min((i for i, node in enumerate(open_list) if node.cost <= bound),
+               key=lambda i: (open_list[i].conflicts, open_list[i].cost))
+    node = open_list[best]
+    last = open_list.pop()
+    if best < len(open_list):
+        open_list[best] = last
+        heapify(open_list)
+    return node
+
+def _compact(open_list, budget):
+    """Splits the open list into the cheapest nodes fitting in budget bytes (at least one) and the rest"""
+    open_list.sort()
+    kept, used = 0, 0
+    while kept < len(open_list):
+        entry = open_list[kept].size + seen_bytes(frozenset(open_list[kept].constraints))
+        if kept and used + entry > budget:
+            break
+        used += entry
+        kept += 1
+    keep = open_list[:kept]
+    heapify(keep)
+    return keep, open_list[kept:]
+
+def do_conflict_free(routes, M, ants, iterations, p, Q, alpha, beta, telemetry=NULL_SINK, radius=0, k=0,
+                     horizon=None, max_nodes=None, max_bytes=None, max_seconds=None, spill=False, suboptimality=1.0):
+    """
+    Implement Conflict-Based Search (CBS) for multi-agent path finding
+    
+    Args:
+        routes: List of paths for each agent, where each path is a list of coordinates
+        radius: robot footprint in cells around its position (0: point robots)
+        k: k-robustness, an agent may not enter a cell another one occupied up to k timesteps before
+        horizon: only resolve the conflicts before this timestep (windowed / rolling-horizon planning)
+        max_nodes, max_bytes, max_seconds, spill: resource limits, see cbs_search
+        suboptimality: focal search bound, see cbs_search
+        telemetry: sink receiving 'conflict', 'constraint_added', 'constraint_skipped',
+                   'wait', 'solved' and 'cbs_stopped' events (see telemetry.py)
+    
+    Returns:
+        Conflict-free routes for all agents; when the search stops without a solution, the
+        routes with the fewest conflicts found (cbs_search also reports why it stopped)
+    """
+    return cbs_search(routes, M, ants, iterations, p, Q, alpha, beta, telemetry, radius, k, horizon,
+                      max_nodes, max_bytes, max_seconds, spill, suboptimality)['routes']
@@ -0,0 +1,150 @@
+# 向量化的冲突统计：把所有机器人的路径（到达终点后原地等待）堆叠成 (agents, T) 的格子矩阵，
+# 用排序找出同一 (时间步, 格子) 或同一 (时间步, 边) 上的所有机器人对
+#
+#   顶点冲突 -- 两个机器人在同一时间步位于同一格子
+#   边冲突   -- 两个机器人在同一时间步沿同一条边相向移动（交换位置）
+#
+# 与 detect_conflicts 不同，每一对机器人的所有冲突都会被统计（不在第一个冲突处停止），
+# 结果是一个冲突图：节点为机器人，两个机器人之间有冲突时相连。
+# 用于 CBS 节点的排序 (冲突数作为 tie-breaking / focal search 的依据) 和 detect_conflicts 的点机器人情况。
+
+import itertools
+import numpy as np
+
+
+def stack_paths(solution, horizon=None):
+    """
+    Flat cell index of every agent at every timestep, agents waiting at their goal after their path ends
+
+    Returns:
+        (cells, n_cells): (agents, T) int32 matrix (int64 on maps too large for it), T being the longest
+        path (at most horizon), and the number of flat indices (rows * columns of the bounding grid)
+    """
+    steps = max((len(path) for path in solution), default=0)
+    if horizon is not None:
+        steps = min(steps, horizon)
+    lengths = np.asarray([min(len(path), steps) for path in solution], dtype=np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros((len(solution), 0), dtype=np.int32), 1
+    # 所有路径点一次读入，再用下标取出每个时间步的位置（路径结束后停在最后一个点）
+    coords = np.fromiter(itertools.chain.from_iterable(itertools.chain.from_iterable(path[:steps] for path in solution)),
+                         dtype=np.int64, count=2 * total).reshape(-1, 2)
+    width = int(coords[:, 1].max()) + 1
+    n_cells = (int(coords[:, 0].max()) + 1) * width
+    flat = coords[:, 0] * width + coords[:, 1]
+    offsets = np.cumsum(lengths) - lengths
+    index = offsets[:, None] + np.minimum(np.arange(steps), lengths[:, None] - 1)
+    cells = flat[index].astype(np.int32 if n_cells < 2 ** 31 else np.int64)
+    return cells, n_cells
+
+
+def _equal_key_pairs(keys):
+    """Index pairs (a, b), a < b, of the entries with equal keys; entries are ordered by agent, one per agent and key"""
+    order = np.argsort(keys, kind='stable')   # 稳定排序：相同的键按机器人顺序排列
+    sorted_keys = keys[order]
+    first, second = [], []
+    d = 1
+    while d < len(order):
+        same = sorted_keys[d:] == sorted_keys[:-d]   # 排序后相同的键连续，距离 d 的两项相同即为一对
+        if not same.any():
+            break
+        first.append(order[:-d][same])
+        second.append(order[d:][same])
+        d += 1
+    if not first:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(first), np.concatenate(second)
+
+
+def _edge_keys(t, lo, hi, n_cells):
+    ''' One key per undirected edge and timestep '''
+    if (int(t.max()) + 1) * n_cells * n_cells < 2 ** 63:
+        return (t * n_cells + lo) * n_cells + hi
+    return np.unique(np.stack([t, lo, hi], axis=1), axis=0, return_inverse=True)[1].ravel()
+
+
+def _conflicts(solution, horizon, shared_waits=True):
+    """
+    Every vertex conflict, swap and shared wait (see conflict_graph), each as a
+    (first agents, second agents, timesteps) tuple of arrays, first agent < second agent
+    """
+    n = len(solution)
+    cells, n_cells = stack_paths(solution, horizon)
+    steps = cells.shape[1]
+    cells = cells.astype(np.int64)
+    empty = np.zeros(0, dtype=np.int64)
+
+    # 顶点冲突：键为 t * n_cells + cell，第 e 项属于机器人 e // steps
+    t = np.tile(np.arange(steps, dtype=np.int64), n)
+    a, b = _equal_key_pairs(t * n_cells + cells.ravel())
+    vertex = (a // steps, b // steps, t[a]) if steps else (empty, empty, empty)
+
+    # 边冲突：t -> t+1 的移动，键为 (t, 较小格子, 较大格子)，方向不同的两项为一次交换
+    moves = steps - 1
+    if moves <= 0:
+        return vertex, (empty, empty, empty), (empty, empty, empty)
+    u, v = cells[:, :-1].ravel(), cells[:, 1:].ravel()
+    t = np.tile(np.arange(moves, dtype=np.int64), n)
+    a, b = _equal_key_pairs(_edge_keys(t, np.minimum(u, v), np.maximum(u, v), n_cells))
+    swap = u[a] != u[b]
+    swaps = (a[swap] // moves, b[swap] // moves, t[a[swap]])
+    if not shared_waits:
+        return vertex, swaps, (empty, empty, empty)
+    # 两个机器人在同一格子上同时等待（同时也是顶点冲突；detect_conflicts 把它报告为 loc1 == loc2 的边冲突），
+    # 两个机器人都已到达终点之后的等待不计入
+    lengths = np.asarray([len(path) for path in solution], dtype=np.int64)
+    a, b = a[~swap], b[~swap]
+    wait = (u[a] == v[a]) & (t[a] + 1 < np.maximum(lengths[a // moves], lengths[b // moves]))
+    return vertex, swaps, (a[wait] // moves, b[wait] // moves, t[a[wait]])
+
+
+def conflict_graph(solution, horizon=None):
+    """
+    All vertex and edge (swap) conflicts between every pair of agents
+
+    Args:
+        solution: list of paths, lists of (row, col)
+        horizon: only count the conflicts before this timestep
+
+    Returns:
+        dict with
+            'vertex', 'edge': (agents, agents) symmetric matrices of conflict counts
+            'first_vertex', 'first_edge': earliest timestep of the conflicts of every pair, -1 if none
+            'first_shared_wait': earliest timestep two agents stay on the same cell until the next one, before
+                                 both reach their goal (already a vertex conflict, reported as an edge
+                                 conflict by detect_conflicts)
+            'pairs': (i, j) pairs (i < j) with at least one conflict, sorted
+            'degree': number of agents every agent conflicts with
+    """
+    n = len(solution)
+    vertex, swaps, waits = _conflicts(solution, horizon)
+    result = {}
+    result['vertex'], result['first_vertex'] = _pair_stats(n, *vertex)
+    result['edge'], result['first_edge'] = _pair_stats(n, *swaps)
+    _, result['first_shared_wait'] = _pair_stats(n, *waits)
+    both = (result['vertex'] + result['edge']) > 0
+    i, j = np.nonzero(np.triu(both, 1))
+    result['pairs'] = list(zip(i.tolist(), j.tolist()))
+    result['degree'] = both.sum(axis=1)
+    return result
+
+
+def _pair_stats(n, a, b, t):
+    ''' Symmetric count and earliest time matrices of the conflicts (a[k], b[k]) at times t[k] '''
+    counts = np.bincount(a * n + b, minlength=n * n).reshape(n, n)
+    first = np.full(n * n, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, a * n + b, t)
+    first = first.reshape(n, n)
+    first = np.minimum(first, first.T)
+    first[first == np.iinfo(np.int64).max] = -1
+    return counts + counts.T, first
+
+
+def count_conflicting_pairs(solution, horizon=None):
+    """Number of agent pairs with at least one vertex or edge conflict (edges of the conflict graph)"""
+    n = len(solution)
+    if n < 2:
+        return 0
+    vertex, swaps, _ = _conflicts(solution, horizon, shared_waits=False)
+    return len(np.unique(np.concatenate([vertex[0] * n + vertex[1], swaps[0] * n + swaps[1]])))
@@ -0,0 +1,179 @@
+# 连通域标记：用于保证起点和终点可达
+#
+# 规划器允许8方向移动（包括对角线，不检查拐角），所以默认按8连通标记。
+# 有单行道的地图上移动有方向，用强连通分量 (strong_components) 判断可达性。
+
+import numpy as np
+
+try:
+    from scipy import ndimage
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import connected_components
+except ImportError:  # scipy 可选，没有时使用下面的纯 NumPy / Python 实现
+    ndimage = None
+    csr_matrix = connected_components = None
+
+
+def _label_runs(passable, diagonal):
+    """Run-based union-find labelling, only NumPy operations over the horizontal runs of free cells"""
+    rows, cols = passable.shape
+    padded = np.zeros((rows, cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = passable
+    change = np.diff(padded, axis=1)
+    run_rows, run_starts = np.nonzero(change == 1)   # 每一段连续空地的起始列
+    _, run_ends = np.nonzero(change == -1)           # 结束列（不含）
+    n_runs = len(run_rows)
+    labels = np.zeros((rows, cols), dtype=np.int32)
+    if n_runs == 0:
+        return labels, 0
+
+    # 相邻两行的两段是否相连：8连通时 [s1, e1) 与 [s2, e2) 满足 s1 <= e2 且 s2 <= e1
+    width = cols + 2
+    start_keys = run_rows.astype(np.int64) * width + run_starts
+    end_keys = run_rows.astype(np.int64) * width + run_ends
+    below = run_rows > 0
+    b_idx = np.nonzero(below)[0]
+    prev_row = run_rows[b_idx].astype(np.int64) - 1
+    slack = 0 if diagonal else 1
+    lo = np.searchsorted(end_keys, prev_row * width + run_starts[b_idx] + slack, side='left')
+    hi = np.searchsorted(start_keys, prev_row * width + run_ends[b_idx] - slack, side='right')
+    counts = np.maximum(hi - lo, 0)
+    a = np.repeat(b_idx, counts)
+    b = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    # 最小标签传播 + 指针跳跃，直到收敛
+    parent = np.arange(n_runs)
+    while True:
+        low = np.minimum(parent[a], parent[b])
+        updated = parent.copy()
+        np.minimum.at(updated, a, low)
+        np.minimum.at(updated, b, low)
+        np.minimum.at(updated, parent, updated)
+        updated = updated[updated]
+        if np.array_equal(updated, parent):
+            break
+        parent = updated
+
+    _, run_labels = np.unique(parent, return_inverse=True)
+    labels[passable] = np.repeat(run_labels + 1, run_ends - run_starts)
+    return labels, int(run_labels.max()) + 1
+
+
+def label_components(passable, diagonal=True):
+    """
+    Label the connected components of the free cells
+
+    Args:
+        passable: 2D array, non-zero / True for free cells (e.g. Map.occupancy_map)
+        diagonal: 8-connectivity when True, 4-connectivity otherwise
+
+    Returns:
+        (labels, count): int32 array with 0 on obstacles and 1..count on free cells
+    """
+    passable = np.asarray(passable) != 0
+    if ndimage is not None:
+        structure = np.ones((3, 3), dtype=bool) if diagonal else None
+        labels, count = ndimage.label(passable, structure=structure)
+        return labels.astype(np.int32), int(count)
+    return _label_runs(passable, diagonal)
+
+
+def largest_component(labels):
+    """Label of the largest component (0 if there is no free cell)"""
+    sizes = np.bincount(labels.ravel())
+    if len(sizes) <= 1:
+        return 0
+    return int(np.argmax(sizes[1:])) + 1
+
+
+def _tarjan(offsets, targets):
+    """Strongly connected component of every node of a CSR graph, iterative Tarjan"""
+    n = len(offsets) - 1
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    component = [0] * n
+    stack = []
+    counter = count = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [[root, offsets[root]]]   # (节点, 下一条要访问的边)
+        while work:
+            top = work[-1]
+            v, e = top
+            if e < offsets[v + 1]:
+                top[1] = e + 1
+                w = targets[e]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append([w, offsets[w]])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work and low[v] < low[work[-1][0]]:
+                low[work[-1][0]] = low[v]
+            if low[v] == index[v]:   # v 是一个分量的根
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component[w] = count
+                    if w == v:
+                        break
+                count += 1
+    return np.asarray(component, dtype=np.int64)
+
+
+def strong_components(passable, allowed, directions):
+    """
+    Label the strongly connected components of the directed grid graph of the allowed moves
+
+    Args:
+        passable: 2D array, non-zero / True for free cells
+        allowed: (rows, cols, len(directions)) bool, the move directions[k] from a cell is allowed
+                 (never off the map or onto an obstacle)
+        directions: (drow, dcol) of every move
+
+    Returns:
+        (labels, count, edges): int32 array with 0 on obstacles and 1..count on free cells, and the
+        (m, 2) array of the distinct (from, to) label pairs of the moves between two components
+    """
+    passable = np.asarray(passable) != 0
+    rows, cols = passable.shape
+    cells = np.arange(rows * cols).reshape(rows, cols)
+    src, dst = [], []
+    for k, (di, dj) in enumerate(directions):
+        if di == 0 and dj == 0:
+            continue
+        moves = cells[allowed[:, :, k]]
+        src.append(moves)
+        dst.append(moves + di * cols + dj)
+    src = np.concatenate(src) if src else np.zeros(0, dtype=np.int64)
+    dst = np.concatenate(dst) if dst else np.zeros(0, dtype=np.int64)
+    n = rows * cols
+    if connected_components is not None:
+        graph = csr_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+        _, component = connected_components(graph, directed=True, connection='strong')
+    else:
+        order = np.argsort(src, kind='stable')
+        offsets = np.searchsorted(src[order], np.arange(n + 1)).tolist()
+        component = _tarjan(offsets, dst[order].tolist())
+    # 障碍为 0，空地的分量编号压缩为 1..count
+    labels = np.zeros(n, dtype=np.int32)
+    free = passable.ravel()
+    _, compact = np.unique(component[free], return_inverse=True)
+    labels[free] = compact.ravel() + 1
+    count = int(labels.max())
+    a, b = labels[src], labels[dst]
+    between = a != b
+    keys = np.unique(a[between].astype(np.int64) * (count + 1) + b[between])
+    edges = np.stack(np.divmod(keys, count + 1), axis=1)
+    return labels.reshape(rows, cols), count, edges
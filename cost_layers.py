@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# 代价层：为 Map.add_cost_layer 生成每个格子的通行代价系数（1 为正常）
+#
+#   慢速区 (slow_zone)          -- 矩形、格子列表或布尔掩码内的格子使用给定的系数
+#   拥堵热度 (congestion_layer) -- 按历史轨迹统计每个格子被占用的时间步数（可做平滑），热点代价升高
+#
+# congestion_replan：每个机器人用其它机器人路径的拥堵热度重新规划 (A*)，路径分散到车流少的通道，
+# 互相冲突的机器人对减少，CBS 需要解决的冲突随之减少。只用全部路径的热度时所有机器人会一起绕到
+# 同一条较冷的通道，冲突反而增加，所以每个机器人的热度不包含它自己的路径。
+#
+#   in_map.add_cost_layer('slow', slow_zone(in_map, (10, 0, 12, 40), 3.0))
+#   in_map.add_cost_layer('traffic', congestion_from_log(in_map, 'output/runs.traj'))
+#   in_map.set_one_way([(r, 5) for r in range(2, 30)], (1, 0))   # 单行道：只能向下行驶
+
+import copy
+import numpy as np
+from astar_path_planning import AStarPlanner
+from trajectory_log import load_trajectories
+
+
+def slow_zone(in_map, cells, factor):
+    """
+    Cost layer with `factor` on some cells and 1 elsewhere
+
+    Args:
+        cells: (top, left, bottom, right) rectangle (bottom and right excluded), list of (row, col),
+               or boolean mask of the map's shape
+    """
+    layer = np.ones(in_map.occupancy_map.shape)
+    if isinstance(cells, np.ndarray) and cells.dtype == bool:
+        layer[cells] = factor
+    elif len(cells) == 4 and np.ndim(cells[0]) == 0:
+        top, left, bottom, right = cells
+        layer[top:bottom, left:right] = factor
+    else:
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        layer[cells[:, 0], cells[:, 1]] = factor
+    return layer
+
+
+def visit_counts(shape, routes):
+    """Number of timesteps every cell is occupied by the routes (lists of (row, col) or PathArrays)"""
+    rows, cols = shape
+    flat = []
+    for path in routes:
+        if hasattr(path, 'cells'):   # PathArray
+            flat.append(np.asarray(path.cells, dtype=np.int64))
+        elif len(path):
+            positions = np.asarray([tuple(p) for p in path], dtype=np.int64).reshape(-1, 2)
+            flat.append(positions[:, 0] * cols + positions[:, 1])
+    if not flat:
+        return np.zeros(shape)
+    return np.bincount(np.concatenate(flat), minlength=rows * cols)[:rows * cols].reshape(shape).astype(np.float64)
+
+
+def _box_blur(counts, radius):
+    ''' Sum of every (2 * radius + 1) square window, clipped at the borders '''
+    if radius <= 0:
+        return counts
+    rows, cols = counts.shape
+    padded = np.zeros((rows + 2 * radius + 1, cols + 2 * radius + 1))
+    padded[radius + 1:radius + 1 + rows, radius + 1:radius + 1 + cols] = counts
+    sums = padded.cumsum(axis=0).cumsum(axis=1)
+    w = 2 * radius + 1
+    return sums[w:, w:] - sums[:-w, w:] - sums[w:, :-w] + sums[:-w, :-w]
+
+
+def congestion_layer(in_map, routes, weight=1.0, radius=0):
+    """
+    Cost layer from the traffic of past routes: 1 + weight * heat / max heat, the heat of a cell being
+    the occupied timesteps within `radius` cells of it; all ones without traffic
+    """
+    return _heat_layer(in_map, visit_counts(in_map.occupancy_map.shape, routes), weight, radius)
+
+
+def _heat_layer(in_map, counts, weight, radius):
+    heat = _box_blur(counts, radius)
+    heat[np.asarray(in_map.occupancy_map) == 0] = 0
+    if heat.max() <= 0:
+        return np.ones(heat.shape)
+    return 1.0 + weight * heat / heat.max()
+
+
+def congestion_replan(in_map, routes, weight=0.5, radius=0, name='traffic'):
+    """
+    Replans every robot of a multi-robot map with A* on a congestion layer of the other robots' routes
+
+    Args:
+        in_map: multi-robot Map (initial_node / final_node lists), possibly with its own cost layers
+        routes: current route of every robot, e.g. the shortest paths
+        weight, radius: see congestion_layer
+
+    Returns:
+        list of the new routes (the current one when A* finds none)
+    """
+    counts = visit_counts(in_map.occupancy_map.shape, routes)
+    new_routes = []
+    for start, goal, route in zip(in_map.initial_node, in_map.final_node, routes):
+        weighted = copy.copy(in_map)   # 共享格子数组，只替换代价层
+        weighted.cost_layers = dict(in_map.cost_layers)
+        weighted.nodes_array = []
+        weighted.add_cost_layer(name, _heat_layer(in_map, counts - visit_counts(counts.shape, [route]), weight, radius))
+        path = AStarPlanner(weighted).find_path(tuple(start), tuple(goal))
+        new_routes.append(path if path is not None else route)
+    return new_routes
+
+
+def congestion_from_log(in_map, filepath, weight=1.0, radius=0, stage='conflict_free'):
+    """
+    congestion_layer of the routes of a stage in every run of a trajectory log (trajectory_log.py)
+    recorded on the same layout as in_map (cost layers aside)
+    """
+    fingerprint = in_map.fingerprint(costs=False)
+    routes = []
+    for run in load_trajectories(filepath):
+        if run.header['fingerprint'] == fingerprint:
+            routes.extend(run.paths(stage))
+    return congestion_layer(in_map, routes, weight, radius)
+
+
+if __name__ == '__main__':
+    # 示例：仓库地图上比较最短路径和 congestion_replan 的路径：互相冲突的机器人对和 CBS 的搜索量
+    import sys
+    import time
+    from map_class import Map
+    from gen_map import CELL_CHARS, generate_large_map
+    from benchmark import robot_maps
+    from conflict_free import cbs_search
+    from conflict_graph import count_conflicting_pairs
+
+    n_robots = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for seed in range(5):
+        grid, _, _ = generate_large_map(32, 32, n_robots, 0.2, 'warehouse', seed=seed)
+        in_map = Map(in_map=CELL_CHARS[grid])
+        planner = AStarPlanner(in_map)
+        shortest = [planner.find_path(tuple(s), tuple(g)) for s, g in zip(in_map.initial_node, in_map.final_node)]
+        if any(route is None for route in shortest):
+            continue
+        for label, routes in (('shortest', shortest), ('congestion', congestion_replan(in_map, shortest))):
+            t0 = time.perf_counter()
+            result = cbs_search(routes, robot_maps(in_map), 20, 30, 0.3, 100, 2, 4, max_nodes=5000)
+            print(f"seed {seed} {label:<10} length {sum(in_map.path_cost(r) for r in routes):7.1f}  "
+                  f"conflicting pairs {count_conflicting_pairs(routes):3d}  CBS {result['status']}, "
+                  f"{result['expanded']} nodes, {time.perf_counter() - t0:.2f}s")
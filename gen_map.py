@@ -1,16 +1,19 @@
 import random
 import os
+import numpy as np
+from connectivity import label_components, largest_component
 
-def generate_map(rows, cols, num_robots, obstacle_density, filename):
+# 二进制地图中的格子编码，0/1 与 Map.occupancy_map 一致
+CELL_CHARS = np.array(['O', 'E', 'S', 'F'])
+OBSTACLE, EMPTY, START, GOAL = 0, 1, 2, 3
+
+def build_grid(rows, cols, num_robots, obstacle_density, seed=None):
     """
-    生成地图并保存为txt文件
-    :param rows: 行数
-    :param cols: 列数
-    :param num_robots: 机器人数量（2~6）
-    :param obstacle_density: 障碍物密度（0~1之间的小数，建议0.1~0.4）
-    :param filename: 保存的文件名
+    生成地图字符矩阵（不限制机器人数量，供 benchmark 使用）
+    :param seed: 随机种子，None 表示使用全局随机状态
+    :return: rows x cols 的列表，元素为 'E' / 'O' / 'S' / 'F'
     """
-    assert 2 <= num_robots <= 6, "机器人数量应在2~6之间"
+    rng = random.Random(seed) if seed is not None else random
     total_cells = rows * cols
     num_obstacles = int(total_cells * obstacle_density)
 
@@ -20,15 +23,15 @@ def generate_map(rows, cols, num_robots, obstacle_density, filename):
     # 随机放障碍物
     obstacle_positions = set()
     while len(obstacle_positions) < num_obstacles:
-        r = random.randint(0, rows-1)
-        c = random.randint(0, cols-1)
+        r = rng.randint(0, rows-1)
+        c = rng.randint(0, cols-1)
         obstacle_positions.add((r, c))
     for (r, c) in obstacle_positions:
         grid[r][c] = 'O'
 
     # 随机放置起点和终点，不能和障碍物重叠
     free_positions = [(r, c) for r in range(rows) for c in range(cols) if grid[r][c] == 'E']
-    random.shuffle(free_positions)
+    rng.shuffle(free_positions)
     assert len(free_positions) >= 2 * num_robots, "空地太少，无法放置所有机器人起点和终点"
 
     for i in range(num_robots):
@@ -37,6 +40,20 @@ def generate_map(rows, cols, num_robots, obstacle_density, filename):
     for i in range(num_robots):
         fr, fc = free_positions.pop()
         grid[fr][fc] = 'F'
+    return grid
+
+
+def generate_map(rows, cols, num_robots, obstacle_density, filename):
+    """
+    生成地图并保存为txt文件
+    :param rows: 行数
+    :param cols: 列数
+    :param num_robots: 机器人数量（2~6）
+    :param obstacle_density: 障碍物密度（0~1之间的小数，建议0.1~0.4）
+    :param filename: 保存的文件名
+    """
+    assert 2 <= num_robots <= 6, "机器人数量应在2~6之间"
+    grid = build_grid(rows, cols, num_robots, obstacle_density)
 
     # 保存到文件
     with open(filename, 'w') as f:
@@ -44,6 +61,124 @@ def generate_map(rows, cols, num_robots, obstacle_density, filename):
             f.write('\t'.join(row) + '\n')
     print(f"地图已保存到 {filename}")
 
+def _random_template(rng, rows, cols, obstacle_density):
+    """Exactly int(rows*cols*density) obstacles, sampled without replacement"""
+    free = np.ones(rows * cols, dtype=bool)
+    free[rng.permutation(rows * cols)[:int(rows * cols * obstacle_density)]] = False
+    return free.reshape(rows, cols)
+
+
+def _warehouse_template(rng, rows, cols, obstacle_density, shelf_length=8, aisle=2):
+    """Shelf blocks two cells deep, separated by aisles, with cross aisles every shelf_length cells"""
+    r = np.arange(rows)[:, None]
+    c = np.arange(cols)[None, :]
+    shelf_rows = ((r - aisle) % (2 + aisle) < 2) & (r >= aisle) & (r < rows - aisle)
+    shelf_cols = ((c - aisle) % (shelf_length + aisle) < shelf_length) & (c >= aisle) & (c < cols - aisle)
+    free = ~(shelf_rows & shelf_cols)
+    if obstacle_density > 0:   # 过道中零散的障碍物（托盘、推车）
+        free &= rng.random((rows, cols)) >= obstacle_density * 0.1
+    return free
+
+
+def _rooms_template(rng, rows, cols, obstacle_density, room_size=12, door=2):
+    """Square rooms separated by one-cell walls, one door per wall segment"""
+    free = np.ones((rows, cols), dtype=bool)
+    free[::room_size, :] = False
+    free[:, ::room_size] = False
+    wall_rows = np.arange(0, rows, room_size)
+    wall_cols = np.arange(0, cols, room_size)
+    # 水平墙上每个房间宽度的墙段开一扇门
+    seg_starts = wall_cols + 1
+    offsets = rng.integers(0, max(room_size - door, 1), size=(len(wall_rows), len(seg_starts)))
+    for k in range(door):
+        door_cols = np.minimum(seg_starts[None, :] + offsets + k, cols - 1)
+        free[np.repeat(wall_rows, len(seg_starts)), door_cols.ravel()] = True
+    # 竖直墙同理
+    seg_starts = wall_rows + 1
+    offsets = rng.integers(0, max(room_size - door, 1), size=(len(wall_cols), len(seg_starts)))
+    for k in range(door):
+        door_rows = np.minimum(seg_starts[None, :] + offsets + k, rows - 1)
+        free[door_rows.ravel(), np.repeat(wall_cols, len(seg_starts))] = True
+    if obstacle_density > 0:
+        free &= rng.random((rows, cols)) >= obstacle_density * 0.2
+    return free
+
+
+def _maze_template(rng, rows, cols, obstacle_density):
+    """Binary-tree maze on the odd cells (every cell opens north or west), then
+    `obstacle_density` is used as the fraction of remaining walls kept, lower means more loops"""
+    free = np.zeros((rows, cols), dtype=bool)
+    cell_r = np.arange(1, rows, 2)
+    cell_c = np.arange(1, cols, 2)
+    free[np.ix_(cell_r, cell_c)] = True
+    north = rng.random((len(cell_r), len(cell_c))) < 0.5
+    north[0, :] = False          # 第一行只能向西打通
+    north[:, 0] = True           # 第一列只能向北打通
+    north[0, 0] = False
+    rr, cc = np.meshgrid(cell_r, cell_c, indexing='ij')
+    open_north = north & (rr > 1)
+    open_west = ~north & (cc > 1)
+    free[rr[open_north] - 1, cc[open_north]] = True
+    free[rr[open_west], cc[open_west] - 1] = True
+    walls = ~free
+    walls[0, :] = walls[-1, :] = False    # 边框不打通
+    walls[:, 0] = walls[:, -1] = False
+    knock = walls & (rng.random((rows, cols)) >= obstacle_density)
+    return free | knock
+
+
+TEMPLATES = {
+    'random': _random_template,
+    'warehouse': _warehouse_template,
+    'rooms': _rooms_template,
+    'maze': _maze_template,
+}
+
+
+def generate_large_map(rows, cols, num_robots, obstacle_density=0.2, template='random', seed=None, filename=None):
+    """
+    快速生成大规模地图（NumPy 向量化），所有起点和终点都位于同一个连通域（最大连通域）
+    :param template: 'random' / 'warehouse' / 'rooms' / 'maze'
+    :param seed: 随机种子
+    :param filename: 以 .txt 结尾保存为文本格式，以 .npz 结尾保存为二进制格式，None 不保存
+    :return: (grid, starts, goals)，grid 为 uint8 编码矩阵 (见 CELL_CHARS)，starts/goals 为 (num_robots, 2) 数组，按行一一对应
+    """
+    if template not in TEMPLATES:
+        raise ValueError(f"Unknown map template: {template}")
+    rng = np.random.default_rng(seed)
+    free = TEMPLATES[template](rng, rows, cols, obstacle_density)
+
+    # 一次连通域标记，从最大连通域中选取所有起点和终点
+    labels, _ = label_components(free)
+    candidates = np.flatnonzero(labels.ravel() == largest_component(labels))
+    if len(candidates) < 2 * num_robots:
+        raise ValueError(f"The largest free component has {len(candidates)} cells, "
+                         f"not enough for {num_robots} robots")
+    chosen = rng.choice(candidates, size=2 * num_robots, replace=False)
+    grid = free.astype(np.uint8)
+    grid.flat[chosen[:num_robots]] = START
+    grid.flat[chosen[num_robots:]] = GOAL
+    starts = np.stack(np.unravel_index(chosen[:num_robots], (rows, cols)), axis=1).astype(np.int32)
+    goals = np.stack(np.unravel_index(chosen[num_robots:], (rows, cols)), axis=1).astype(np.int32)
+    if filename is not None:
+        save_grid(grid, filename, starts, goals)
+    return grid, starts, goals
+
+
+def save_grid(grid, filename, starts=None, goals=None):
+    """
+    保存编码地图
+    .npz: 二进制格式，保存 grid 以及起点/终点的配对关系
+    其他: 与 maps/*.txt 相同的文本格式（起点和终点按扫描顺序配对）
+    """
+    if filename.endswith('.npz'):
+        np.savez_compressed(filename, grid=grid, starts=starts, goals=goals)
+        return
+    chars = CELL_CHARS[grid]
+    with open(filename, 'w') as f:
+        f.write('\n'.join('\t'.join(row) for row in chars) + '\n')
+
+
 # 示例用法
 if __name__ == '__main__':
     os.makedirs('maps', exist_ok=True)
@@ -52,4 +187,6 @@ if __name__ == '__main__':
     # 生成中地图
     generate_map(rows=12, cols=12, num_robots=4, obstacle_density=0.22, filename='maps/my_middle.txt')
     # 生成大地图
-    generate_map(rows=24, cols=24, num_robots=6, obstacle_density=0.4, filename='maps/my_big.txt')
\ No newline at end of file
+    generate_map(rows=24, cols=24, num_robots=6, obstacle_density=0.4, filename='maps/my_big.txt')
+    # 压力测试用的大规模地图
+    # generate_large_map(1000, 1000, 200, obstacle_density=0.05, template='warehouse', seed=0, filename='maps/warehouse_1000.npz')
\ No newline at end of file
@@ -0,0 +1,287 @@
+# 分层地图 (HPA*)：把栅格地图划分为簇，先在簇入口组成的抽象图上搜索，再只在用到的簇内细化路径
+#
+# 抽象图节点是簇边界上的入口格子，边有两类：
+#   簇间边：相邻簇边界两侧的一对入口格子，代价为这一步的移动代价
+#   簇内边：同一簇内两个入口之间的最短距离（只在簇内搜索）
+# 代价都来自 Map.edge_costs()，所以代价层和单行道也生效；单行道让抽象图成为有向图
+# （graph[a][b] 是从 a 到 b 的代价，不允许的方向没有边）。
+# 同一张地图（相同 fingerprint）的抽象图会被缓存，见 get_hierarchy()。
+
+import heapq
+import math
+from collections import OrderedDict
+import numpy as np
+from ant_colony import AntColony
+from astar_path_planning import AStarPlanner
+from map_class import EDGE_DIRECTIONS, edge_direction_index
+
+MOVES = [(di, dj, k) for k, (di, dj) in enumerate(EDGE_DIRECTIONS) if di != 0 or dj != 0]
+
+
+def _runs(mask):
+    """(start, end) of every run of True values in a 1D boolean array, end excluded"""
+    change = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return [(int(s), int(e)) for s, e in zip(np.flatnonzero(change == 1), np.flatnonzero(change == -1))]
+
+
+class HierarchicalMap:
+    ''' Abstract graph over the cluster entrances of a map, directed when the map has one-way cells '''
+
+    def __init__(self, in_map, cluster_size=10, max_entrance_width=6):
+        self.map = in_map
+        self.occupancy_map = in_map.occupancy_map
+        self.rows, self.cols = self.occupancy_map.shape
+        self.cluster_size = cluster_size
+        self.max_entrance_width = max_entrance_width  # 更宽的入口在两端各放一个节点
+        self.planner = AStarPlanner(in_map)
+        self.h_scale = self.planner.h_scale   # 启发式系数，代价层的最小系数，保持可采纳
+        self.edge_costs = in_map.edge_costs()
+        self.symmetric = in_map.one_way is None or not in_map.one_way.any()
+        self.graph = {}              # 抽象图：pos -> {pos: cost}，从 pos 出发的边
+        self.cluster_entrances = {}  # 簇 -> 入口格子集合
+        self._build_entrances()
+        self._build_intra_edges()
+
+    def cluster_of(self, pos):
+        return (pos[0] // self.cluster_size, pos[1] // self.cluster_size)
+
+    def cluster_bounds(self, cluster):
+        ''' (row_min, row_max, col_min, col_max) of a cluster, max excluded '''
+        r0, c0 = cluster[0] * self.cluster_size, cluster[1] * self.cluster_size
+        return (r0, min(r0 + self.cluster_size, self.rows), c0, min(c0 + self.cluster_size, self.cols))
+
+    def _add_edge(self, a, b, cost):
+        ''' Adds the edge a -> b (and b -> a on a map without one-way cells) '''
+        for pos in (a, b):
+            if pos not in self.graph:
+                self.graph[pos] = {}
+                self.cluster_entrances.setdefault(self.cluster_of(pos), set()).add(pos)
+        if cost < self.graph[a].get(b, math.inf):
+            self.graph[a][b] = cost
+            if self.symmetric:
+                self.graph[b][a] = cost
+
+    def _add_crossing(self, a, b):
+        ''' Inter-cluster edges between the neighbouring cells a and b, in the directions that are allowed '''
+        for u, v in ((a, b), (b, a)):
+            cost = float(self.edge_costs[u[0], u[1], edge_direction_index(u, v)])
+            if cost != math.inf:
+                self._add_edge(u, v, cost)
+
+    def _entrance_offsets(self, start, end):
+        if end - start < self.max_entrance_width:
+            return [(start + end - 1) // 2]
+        return [start, end - 1]
+
+    def _build_entrances(self):
+        ''' Finds the free transitions on every cluster border and adds the inter-cluster edges '''
+        free = self.occupancy_map != 0
+        cs = self.cluster_size
+        for c in range(cs, self.cols, cs):         # 竖直边界：左列 c-1，右列 c
+            both = free[:, c - 1] & free[:, c]
+            for r0 in range(0, self.rows, cs):
+                for start, end in _runs(both[r0:r0 + cs]):
+                    for k in self._entrance_offsets(start, end):
+                        self._add_crossing((r0 + k, c - 1), (r0 + k, c))
+        for r in range(cs, self.rows, cs):         # 水平边界：上行 r-1，下行 r
+            both = free[r - 1, :] & free[r, :]
+            for c0 in range(0, self.cols, cs):
+                for start, end in _runs(both[c0:c0 + cs]):
+                    for k in self._entrance_offsets(start, end):
+                        self._add_crossing((r - 1, c0 + k), (r, c0 + k))
+
+    def _cluster_dijkstra(self, source, targets, reverse=False):
+        ''' Distances from source to the reachable targets, searching only inside the source's cluster;
+            from the targets to source with reverse (following the allowed moves backwards) '''
+        row_min, row_max, col_min, col_max = self.cluster_bounds(self.cluster_of(source))
+        dist = {source: 0.0}
+        found = {}
+        remaining = set(targets)
+        heap = [(0.0, source)]
+        while heap and remaining:
+            d, pos = heapq.heappop(heap)
+            if d > dist[pos]:
+                continue
+            if pos in remaining:
+                remaining.discard(pos)
+                found[pos] = d
+            for dr, dc, k in MOVES:
+                nxt = (pos[0] - dr, pos[1] - dc) if reverse else (pos[0] + dr, pos[1] + dc)
+                if not (row_min <= nxt[0] < row_max and col_min <= nxt[1] < col_max):
+                    continue
+                # 反向搜索时这一步是 nxt -> pos
+                cost = self.edge_costs[nxt[0], nxt[1], k] if reverse else self.edge_costs[pos[0], pos[1], k]
+                if d + cost < dist.get(nxt, math.inf):
+                    dist[nxt] = d + cost
+                    heapq.heappush(heap, (d + cost, nxt))
+        return found
+
+    def _build_intra_edges(self):
+        for entrances in self.cluster_entrances.values():
+            entrances = sorted(entrances)
+            for i, source in enumerate(entrances):
+                # 没有单行道时代价对称，每对入口只搜索一次
+                targets = entrances[i + 1:] if self.symmetric else entrances[:i] + entrances[i + 1:]
+                for target, d in self._cluster_dijkstra(source, targets).items():
+                    self._add_edge(source, target, d)
+
+    def _query_edges(self, start, goal):
+        ''' Temporary edges from start to the entrances of its cluster and from the entrances of goal's
+            cluster to goal '''
+        extra = {}
+        for pos in (start, goal):
+            if pos in self.graph:
+                continue
+            targets = set(self.cluster_entrances.get(self.cluster_of(pos), ()))
+            other = goal if pos == start else start
+            if self.cluster_of(other) == self.cluster_of(pos):
+                targets.add(other)
+            for target, d in self._cluster_dijkstra(pos, targets, reverse=pos == goal).items():
+                if pos == start:
+                    extra.setdefault(start, {})[target] = d
+                else:
+                    extra.setdefault(target, {})[goal] = d
+        return extra
+
+    def neighbours(self, pos, extra):
+        edges = self.graph.get(pos, {})
+        if pos in extra:
+            edges = {**edges, **extra[pos]}
+        return edges
+
+    def abstract_path(self, start, goal):
+        ''' A* on the abstract graph, returns the list of abstract nodes from start to goal or None '''
+        start, goal = tuple(start), tuple(goal)
+        extra = self._query_edges(start, goal)
+        h = lambda pos: self.h_scale * math.hypot(pos[0] - goal[0], pos[1] - goal[1])
+        g = {start: 0.0}
+        parent = {start: None}
+        heap = [(h(start), start)]
+        closed = set()
+        while heap:
+            _, pos = heapq.heappop(heap)
+            if pos == goal:
+                path = []
+                while pos is not None:
+                    path.append(pos)
+                    pos = parent[pos]
+                return path[::-1]
+            if pos in closed:
+                continue
+            closed.add(pos)
+            for nxt, cost in self.neighbours(pos, extra).items():
+                if g[pos] + cost < g.get(nxt, math.inf):
+                    g[nxt] = g[pos] + cost
+                    parent[nxt] = pos
+                    heapq.heappush(heap, (g[nxt] + h(nxt), nxt))
+        return None
+
+    def refine(self, abstract_path):
+        ''' Expands an abstract path into grid cells, searching only the clusters it crosses '''
+        path = [abstract_path[0]]
+        for a, b in zip(abstract_path[:-1], abstract_path[1:]):
+            cluster = self.cluster_of(a)
+            if cluster != self.cluster_of(b):   # 簇间边：两个格子相邻
+                path.append(b)
+                continue
+            segment = self.planner.find_path(a, b, self.cluster_bounds(cluster))
+            if segment is None:
+                return None
+            path.extend(segment[1:])
+        return path
+
+    def find_path(self, start, goal):
+        ''' HPA* path from start to goal as a list of (row, col), None if unreachable '''
+        start, goal = tuple(start), tuple(goal)
+        if not self.map.is_reachable(start, goal):
+            return None
+        if start == goal:
+            return [start]
+        abstract = self.abstract_path(start, goal)
+        path = self.refine(abstract) if abstract is not None else None
+        return path if path is not None else self.planner.find_path(start, goal)
+
+    def find_path_aco(self, start, goal, n_ants=20, iterations=30, evaporation_factor=0.3,
+                      pheromone_adding_constant=100, alpha=2, beta=4, **colony_kwargs):
+        ''' Runs an ant colony on the abstract graph (ants walk between entrances), then refines
+            the best abstract route into cells. Returns [] when no ant reaches the goal '''
+        start, goal = tuple(start), tuple(goal)
+        if not self.map.is_reachable(start, goal):
+            return []
+        if start == goal:
+            return [start]
+        graph_map = AbstractGraphMap(self, start, goal)
+        colony = AbstractAntColony(graph_map, n_ants, iterations, evaporation_factor,
+                                   pheromone_adding_constant, alpha, beta, **colony_kwargs)
+        abstract = colony.calculate_path()
+        if not abstract:
+            return []
+        return self.refine(abstract) or []
+
+
+class AbstractNode:
+    ''' Node of the abstract graph, with edges in the same format as Map.Nodes '''
+
+    def __init__(self, node_pos, neighbours):
+        self.node_pos = node_pos
+        self.spec = 'E'
+        self.edges = [{'FinalNode': pos, 'Pheromone': 1.0, 'Probability': 0.0, 'Distance': cost}
+                      for pos, cost in neighbours.items()]
+
+
+class AbstractGraphMap:
+    ''' Map-like view of the abstract graph of one query that AntColony can walk on '''
+
+    def __init__(self, hierarchy, start, goal):
+        self.hierarchy = hierarchy
+        self.occupancy_map = hierarchy.occupancy_map
+        self.initial_node = start
+        self.final_node = goal
+        extra = hierarchy._query_edges(start, goal)
+        self.nodes_array = {}    # row -> {col -> AbstractNode}，只保存抽象节点
+        for pos in set(hierarchy.graph) | set(extra) | {goal}:
+            self.nodes_array.setdefault(pos[0], {})[pos[1]] = AbstractNode(pos, hierarchy.neighbours(pos, extra))
+
+    def robot_status(self, start, goal):
+        return self.hierarchy.map.robot_status(start, goal)
+
+
+class AbstractAntColony(AntColony):
+    ''' AntColony walking on an AbstractGraphMap, path lengths are sums of abstract edge costs '''
+
+    def iter_nodes(self):
+        for row in self.map.nodes_array.values():
+            for node in row.values():
+                yield node
+
+    def heuristic(self, actual_node, edge):
+        # 抽象边很长且分支多，用绕行代价（边长 + 终点到目标距离 - 当前到目标距离 >= 0）引导蚂蚁
+        goal = self.map.final_node
+        here, final = actual_node.node_pos, edge['FinalNode']
+        h_scale = self.map.hierarchy.h_scale   # 与边代价同一尺度，保证绕行代价 >= 0
+        detour = (edge['Distance'] + h_scale * math.hypot(final[0] - goal[0], final[1] - goal[1])
+                  - h_scale * math.hypot(here[0] - goal[0], here[1] - goal[1]))
+        return 1.0 / (detour + 1.0)
+
+    def calculate_euclidean_distance(self, path):
+        total_distance = 0
+        for i in range(len(path)-1):
+            total_distance += self.find_edge(path[i], path[i+1])['Distance']
+        return total_distance
+
+
+_HIERARCHY_CACHE = OrderedDict()
+HIERARCHY_CACHE_SIZE = 8
+
+
+def get_hierarchy(in_map, cluster_size=10):
+    """Returns the HierarchicalMap of a map, built once per map layout and cluster size"""
+    key = (in_map.fingerprint(), cluster_size)
+    if key in _HIERARCHY_CACHE:
+        _HIERARCHY_CACHE.move_to_end(key)
+        return _HIERARCHY_CACHE[key]
+    hierarchy = HierarchicalMap(in_map, cluster_size)
+    _HIERARCHY_CACHE[key] = hierarchy
+    if len(_HIERARCHY_CACHE) > HIERARCHY_CACHE_SIZE:
+        _HIERARCHY_CACHE.popitem(last=False)
+    return hierarchy
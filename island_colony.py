@@ -0,0 +1,124 @@
+# 多蚁群岛屿模型：每个岛屿一个进程，定期通过共享内存迁移信息素和最优路径
+
+import copy
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from ant_colony import AntColony
+from map_class import EDGE_DIRECTIONS
+from path_array import PathArray, as_path_array
+
+
+def _robot_map(in_map):
+    """Copy of a single-robot map without its nodes (each island builds its own)"""
+    robot = copy.copy(in_map)
+    robot.nodes_array = []
+    return robot
+
+
+def _island_worker(idx, in_map, params, seed, iterations, migration_interval, migration_rate,
+                   constraints, shm_names, n_islands, barrier):
+    """Runs one colony and takes part in the migration every `migration_interval` iterations"""
+    np.random.seed(seed)
+    in_map.nodes_array = in_map._create_nodes()
+    colony = AntColony(in_map, params['n_ants'], iterations, params['evaporation_factor'],
+                       params['pheromone_adding_constant'], params['alpha'], params['beta'], constraints)
+    rows, cols = in_map.occupancy_map.shape
+
+    shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    try:
+        pheromone = np.ndarray((n_islands, rows, cols, len(EDGE_DIRECTIONS)), dtype=np.float64, buffer=shms[0].buf)
+        scores = np.ndarray((n_islands,), dtype=np.float64, buffer=shms[1].buf)
+        path_lengths = np.ndarray((n_islands,), dtype=np.int32, buffer=shms[2].buf)
+        paths = np.ndarray((n_islands, rows * cols), dtype=np.int32, buffer=shms[3].buf)
+
+        def publish():
+            route = colony.shortest_route
+            scores[idx] = colony.calculate_euclidean_distance(route) if route else np.inf
+            path_lengths[idx] = len(route)
+            if route:
+                paths[idx, :len(route)] = as_path_array(route, cols).cells
+
+        for i in range(iterations):
+            colony.run_iteration(i)
+            last = i == iterations - 1
+            if last or (i + 1) % migration_interval == 0:
+                pheromone[idx] = colony.get_pheromone_matrix()
+                publish()
+                if last:
+                    break
+                barrier.wait()      # 所有岛屿都已发布
+                best = int(np.argmin(scores))
+                if best != idx and np.isfinite(scores[best]):
+                    own = pheromone[idx]
+                    colony.set_pheromone_matrix((1.0 - migration_rate) * own + migration_rate * pheromone[best])
+                    migrant = PathArray(paths[best, :path_lengths[best]].copy(), cols)
+                    colony.res.append(migrant)
+                    colony.shortest_route = min(colony.res, key=colony.calculate_euclidean_distance)
+                barrier.wait()      # 所有岛屿都已读取，允许下一轮覆盖
+    except Exception:
+        barrier.abort()     # 避免其他岛屿在屏障处死锁
+        raise
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+def run_islands(in_map, n_ants, iterations, evaporation_factor, pheromone_adding_constant, alpha, beta,
+                n_islands=4, migration_interval=10, migration_rate=0.5, island_params=None, seeds=None,
+                constraints=None):
+    """
+    Island model: `n_islands` colonies run in their own process and exchange their
+    best path and pheromone matrix through shared memory every `migration_interval` iterations.
+
+    Args:
+        in_map: single-robot map (initial_node / final_node are one position each)
+        island_params: optional list of dicts overriding n_ants / evaporation_factor /
+                       pheromone_adding_constant / alpha / beta per island
+        seeds: optional list of random seeds, one per island
+        migration_rate: weight of the best island's pheromone when blending into the others
+
+    Returns:
+        dict with the global best 'route', its 'length', the winning 'island' and
+        the best 'lengths' of every island
+    """
+    base = {'n_ants': n_ants, 'evaporation_factor': evaporation_factor,
+            'pheromone_adding_constant': pheromone_adding_constant, 'alpha': alpha, 'beta': beta}
+    island_params = island_params if island_params is not None else [{}] * n_islands
+    seeds = seeds if seeds is not None else list(range(n_islands))
+    if len(island_params) != n_islands or len(seeds) != n_islands:
+        raise ValueError("island_params and seeds must have one entry per island")
+
+    rows, cols = in_map.occupancy_map.shape
+    sizes = [n_islands * rows * cols * len(EDGE_DIRECTIONS) * 8,   # 信息素矩阵
+             n_islands * 8,                                      # 最优路径长度
+             n_islands * 4,                                      # 最优路径节点数
+             n_islands * rows * cols * 4]                        # 最优路径（扁平索引）
+    shms = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+    try:
+        scores = np.ndarray((n_islands,), dtype=np.float64, buffer=shms[1].buf)
+        scores[:] = np.inf
+        barrier = mp.Barrier(n_islands)
+        workers = []
+        for idx in range(n_islands):
+            params = dict(base, **island_params[idx])
+            worker = mp.Process(target=_island_worker,
+                                args=(idx, _robot_map(in_map), params, seeds[idx], iterations, migration_interval,
+                                      migration_rate, constraints, [shm.name for shm in shms], n_islands, barrier))
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
+        if any(worker.exitcode != 0 for worker in workers):
+            raise RuntimeError("An island process failed")
+
+        path_lengths = np.ndarray((n_islands,), dtype=np.int32, buffer=shms[2].buf)
+        paths = np.ndarray((n_islands, rows * cols), dtype=np.int32, buffer=shms[3].buf)
+        best = int(np.argmin(scores))
+        route = PathArray(paths[best, :path_lengths[best]], cols).to_list()
+        return {'route': route, 'length': float(scores[best]), 'island': best,
+                'lengths': [float(v) for v in scores]}
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
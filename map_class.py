@@ -8,6 +8,25 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import copy
+import hashlib
+import math
+from connectivity import label_components, strong_components
+
+# 边的方向顺序与 Nodes.compute_edges 的遍历顺序一致 (dj 外层, di 内层)
+EDGE_DIRECTIONS = [(di, dj) for dj in [-1, 0, 1] for di in [-1, 0, 1]]
+
+
+def edge_direction_index(from_pos, to_pos):
+    ''' Returns the index in EDGE_DIRECTIONS of the move from_pos -> to_pos '''
+    return (to_pos[1] - from_pos[1] + 1) * 3 + (to_pos[0] - from_pos[0] + 1)
+
+# 代价层地图 (edge_costs) 中每个方向的移动距离：直行 1，斜行 sqrt(2)，原地等待 0，
+# 与 A* 的 g 代价和 path_length 相同，只有一个全 1 代价层的地图路径代价不变
+EDGE_LENGTHS = [math.hypot(di, dj) for di, dj in EDGE_DIRECTIONS]
+# 蚁群节点边的 Distance (启发式)：沿用 Nodes.compute_edges 原来的取值 (水平 1，竖直和斜向 1.414，等待 0)，
+# 代价层地图上再乘以代价系数，保证全 1 代价层不改变蚂蚁的选择
+NODE_DISTANCES = [1.0 if di == 0 and dj != 0 else 0.0 if di == 0 and dj == 0 else 1.414 for di, dj in EDGE_DIRECTIONS]
+
 
 class Map:
     ''' Class used for handling the information provided by the input map '''
@@ -17,16 +36,26 @@ class Map:
     class Nodes:
         ''' Class for representing the nodes used by the ACO algorithm '''
 
-        def __init__(self, row, col, in_map, spec):
+        def __init__(self, row, col, in_map, spec, edge_factors=None):
             self.node_pos = (row, col)
-            self.edges = self.compute_edges(in_map)
+            self.edges = self.compute_edges(in_map, edge_factors)
             self.spec = spec
 
-        def compute_edges(self, map_arr):
-            ''' class that returns the edges connected to each node '''
+        def compute_edges(self, map_arr, edge_factors=None):
+            ''' class that returns the edges connected to each node; with an edge_factors table
+                (Map.edge_factors) the Distance of every edge is NODE_DISTANCES times its factor, and edges of
+                infinite factor are left out '''
             imax = map_arr.shape[0]  # map_arr的行数
             jmax = map_arr.shape[1]  # map_arr的列数
             edges = []
+            if edge_factors is not None:
+                factors = edge_factors[self.node_pos[0], self.node_pos[1]]
+                for k, (di, dj) in enumerate(EDGE_DIRECTIONS):   # 与下面的循环顺序相同
+                    if factors[k] < np.inf:
+                        edges.append({'FinalNode': (self.node_pos[0] + di, self.node_pos[1] + dj),
+                                      'Pheromone': 1.0, 'Probability': 0.0,
+                                      'Distance': NODE_DISTANCES[k] * float(factors[k])})
+                return edges
             if map_arr[self.node_pos[0]][self.node_pos[1]] == 1:
                 for dj in [-1, 0, 1]:
                     for di in [-1, 0, 1]:
@@ -49,8 +78,10 @@ class Map:
                                                   0.0, 'Distance': distance})
             return edges
 
-    def __init__(self, map_name):
-        self.in_map = self._read_map(map_name)  # in_map类型为str
+    def __init__(self, map_name=None, in_map=None):
+        self._robot_pairs = None  # 二进制地图 (.npz) 中保存的起点/终点配对
+        # 可以直接传入字符矩阵 in_map（例如 gen_map 生成的地图），否则从 ./maps/ 读取
+        self.in_map = self._read_map(map_name) if in_map is None else np.asarray(in_map, dtype=str)  # in_map类型为str
         self.occupancy_map = self._map_2_occupancy_map()  # 输入in_map 将地图转化成int matrix
         self.initial_node = self.add_initial_node()
         self.final_node = self.add_final_node()
@@ -59,20 +90,37 @@ class Map:
         # self.nodes_array = self._create_nodes()  # 地图中各个点可以走一步到达的位置集合，并记录概率和信息素
         self.nodes_array = []
         # (self, row, col, in_map, spec)
+        self._components = None  # 连通域标记，懒计算，见 component_labels()
+        # 代价层：与 occupancy_map 同形状的通行代价系数（1 为正常，>1 为慢速区、拥堵），多个层相乘；
+        # 单行道：格子的行进方向 (drow, dcol)，与其相反的移动不允许。两者都没有时地图保持原来的二值行为
+        self.cost_layers = {}
+        self.one_way = None
+        self._edge_factors = None  # edge_factors() 的缓存
+        self._edge_costs = None  # edge_costs() 的缓存
+        self._strong = None  # _strong_components() 的缓存 (单行道地图的有向可达性)
 
     def _create_nodes(self): # 创建节点
         ''' Create nodes out of the initial map '''
-        return [[self.Nodes(i, j, self.occupancy_map, self.in_map[i][j]) for j in
+        edge_factors = self.edge_factors() if self.weighted else None
+        return [[self.Nodes(i, j, self.occupancy_map, self.in_map[i][j], edge_factors) for j in
                  range(self.in_map.shape[1])] for i in range(self.in_map.shape[0])]
 
     # 读取map文件
     def _read_map(self, map_name):
-        ''' Reads data from an input map txt file'''
+        ''' Reads data from an input map txt file, or a binary .npz map written by gen_map.save_grid '''
+        if map_name.endswith('.npz'):
+            with np.load('./maps/' + map_name) as data:
+                in_map = np.array(['O', 'E', 'S', 'F'])[data['grid']]
+                if data['starts'].ndim == 2:
+                    self._robot_pairs = (data['starts'].tolist(), data['goals'].tolist())
+            return in_map
         in_map = np.loadtxt('./maps/' + map_name, dtype=str )
         return in_map
 
     def add_initial_node(self):
         ''' Get all starting positions marked with 'S' '''
+        if self._robot_pairs is not None:
+            return [list(p) for p in self._robot_pairs[0]]
         points = np.where(self.in_map == 'S')
         initial_nodes = []
         for i in range(len(points[0])):  # points[0] contains row indices, points[1] contains column indices
@@ -81,12 +129,206 @@ class Map:
 
     def add_final_node(self):
         ''' Get all goal positions marked with 'F' '''
+        if self._robot_pairs is not None:
+            return [list(p) for p in self._robot_pairs[1]]
         points = np.where(self.in_map == 'F')
         final_nodes = []
         for i in range(len(points[0])):  # points[0] contains row indices, points[1] contains column indices
             final_nodes.append([int(points[0][i]), int(points[1][i])])
         return final_nodes
 
+    def component_labels(self):
+        ''' Returns the (cached) 8-connected component label of every cell, 0 on obstacles '''
+        if self._components is None:
+            self._components, _ = label_components(self.occupancy_map)
+        return self._components
+
+    def is_reachable(self, start, goal):
+        ''' O(1) check (once the labels are computed) that goal can be reached from start '''
+        return self.robot_status(start, goal) == 'ok'
+
+    def robot_status(self, start, goal):
+        ''' Returns 'ok', 'out_of_bounds', 'start_blocked', 'goal_blocked' or 'unreachable' '''
+        rows, cols = self.occupancy_map.shape
+        for pos in (start, goal):
+            if not (0 <= pos[0] < rows and 0 <= pos[1] < cols):
+                return 'out_of_bounds'
+        if self.occupancy_map[start[0]][start[1]] == 0:
+            return 'start_blocked'
+        if self.occupancy_map[goal[0]][goal[1]] == 0:
+            return 'goal_blocked'
+        labels = self.component_labels()
+        if labels[start[0]][start[1]] != labels[goal[0]][goal[1]]:
+            return 'unreachable'
+        # 连通域不考虑方向：有单行道时同一连通域内的终点也可能到达不了
+        if self.one_way is not None and self.one_way.any() and not self._directed_reachable(start, goal):
+            return 'unreachable'
+        return 'ok'
+
+    def _strong_components(self):
+        ''' (labels, successors, reached) of the strongly connected components of the allowed moves, computed
+            once per layout and one-way cells (cached with edge_factors): successors[c] are the components
+            one move away from component c, reached[c] the components reachable from c, filled when queried '''
+        if self._strong is None:
+            labels, count, edges = strong_components(self.occupancy_map, np.isfinite(self.edge_factors()),
+                                                     EDGE_DIRECTIONS)
+            successors = [[] for _ in range(count + 1)]
+            for a, b in edges.tolist():
+                successors[a].append(b)
+            self._strong = (labels, successors, {})
+        return self._strong
+
+    def _directed_reachable(self, start, goal):
+        ''' Whether goal can be reached from start along the allowed moves: same strongly connected component,
+            or goal's component reachable from start's one (searched once per start component) '''
+        labels, successors, reached = self._strong_components()
+        a, b = int(labels[start[0]][start[1]]), int(labels[goal[0]][goal[1]])
+        if a == b:
+            return True
+        if a not in reached:
+            seen = {a}
+            queue = [a]
+            while queue:
+                for c in successors[queue.pop()]:
+                    if c not in seen:
+                        seen.add(c)
+                        queue.append(c)
+            reached[a] = seen
+        return b in reached[a]
+
+    def check_robots(self):
+        ''' Returns the robot_status of every (initial_node, final_node) pair of a multi-robot map '''
+        return [self.robot_status(start, goal) for start, goal in zip(self.initial_node, self.final_node)]
+
+    def set_cell(self, row, col, free):
+        ''' Opens (free=True) or blocks a cell, keeping the component labels and the nodes up to date '''
+        self.occupancy_map[row][col] = 1 if free else 0
+        if self.in_map[row][col] in ('E', 'O'):
+            self.in_map[row][col] = 'E' if free else 'O'
+        if self._components is not None:
+            if free:
+                # 打开一个格子只会合并相邻的连通域
+                window = self._components[max(row-1, 0):row+2, max(col-1, 0):col+2]
+                neighbours = np.unique(window[window > 0])
+                if len(neighbours) == 0:
+                    self._components[row][col] = self._components.max() + 1
+                else:
+                    label = neighbours[0]
+                    if len(neighbours) > 1:
+                        self._components[np.isin(self._components, neighbours[1:])] = label
+                    self._components[row][col] = label
+            else:
+                self._components = None  # 封堵可能把连通域分开，下次使用时重新标记
+        self._clear_edge_caches()
+        if self.nodes_array:
+            rows, cols = self.occupancy_map.shape
+            edge_factors = self.edge_factors() if self.weighted else None
+            for i in range(max(row-1, 0), min(row+2, rows)):
+                for j in range(max(col-1, 0), min(col+2, cols)):
+                    self.nodes_array[i][j] = self.Nodes(i, j, self.occupancy_map, self.in_map[i][j], edge_factors)
+
+    @property
+    def weighted(self):
+        ''' Whether the map has cost layers or one-way cells '''
+        return bool(self.cost_layers) or (self.one_way is not None and bool(self.one_way.any()))
+
+    def add_cost_layer(self, name, factors):
+        ''' Adds (or replaces) a layer of per-cell cost factors, a positive (rows, cols) array '''
+        factors = np.array(factors, dtype=np.float64)
+        if factors.shape != self.occupancy_map.shape:
+            raise ValueError(f"Cost layer shape {factors.shape} does not match the map {self.occupancy_map.shape}")
+        if not np.all(np.isfinite(factors)) or np.any(factors <= 0):
+            raise ValueError("Cost factors must be positive and finite")
+        self.cost_layers[name] = factors
+        self._costs_changed()
+
+    def remove_cost_layer(self, name):
+        ''' Removes a cost layer, if present '''
+        if self.cost_layers.pop(name, None) is not None:
+            self._costs_changed()
+
+    def set_one_way(self, cells, direction):
+        ''' Makes cells one-way: moves with a component against direction (drow, dcol) are not allowed from or
+            into them; direction (0, 0) makes them two-way again '''
+        if self.one_way is None:
+            self.one_way = np.zeros(self.occupancy_map.shape + (2,), dtype=np.int8)
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        self.one_way[cells[:, 0], cells[:, 1]] = np.sign(direction)
+        self._costs_changed()
+
+    def _clear_edge_caches(self):
+        self._edge_factors = None
+        self._edge_costs = None
+        self._strong = None
+
+    def _costs_changed(self):
+        self._clear_edge_caches()
+        if self.nodes_array:
+            self.nodes_array = self._create_nodes()
+
+    def cell_costs(self):
+        ''' Product of the cost layers, (rows, cols) array of ones without layers '''
+        costs = np.ones(self.occupancy_map.shape)
+        for factors in self.cost_layers.values():
+            costs = costs * factors
+        return costs
+
+    def edge_factors(self):
+        '''
+        (rows, cols, 9) cost factor of every move, directions in EDGE_DIRECTIONS order, computed once (cached
+        until the layers or a cell change): mean cost factor of its two cells, inf when the move leaves the map,
+        ends on an obstacle or goes against a one-way cell
+        '''
+        if self._edge_factors is None:
+            rows, cols = self.occupancy_map.shape
+            free = np.asarray(self.occupancy_map) == 1
+            factors = self.cell_costs()
+            table = np.full((rows, cols, len(EDGE_DIRECTIONS)), np.inf)
+            for k, (di, dj) in enumerate(EDGE_DIRECTIONS):
+                src = (slice(max(-di, 0), rows - max(di, 0)), slice(max(-dj, 0), cols - max(dj, 0)))
+                dst = (slice(max(di, 0), rows + min(di, 0)), slice(max(dj, 0), cols + min(dj, 0)))
+                allowed = free[src] & free[dst]
+                if self.one_way is not None and (di or dj):
+                    for cells in (src, dst):
+                        way = self.one_way[cells]
+                        allowed &= way[..., 0] * di + way[..., 1] * dj >= 0
+                table[src[0], src[1], k] = np.where(allowed, (factors[src] + factors[dst]) / 2, np.inf)
+            self._edge_factors = table
+        return self._edge_factors
+
+    def edge_costs(self):
+        ''' (rows, cols, 9) cost of every move: EDGE_LENGTHS * edge_factors, inf where the move is not allowed '''
+        if self._edge_costs is None:
+            factors = self.edge_factors()
+            self._edge_costs = np.multiply(factors, EDGE_LENGTHS, out=np.full(factors.shape, np.inf),
+                                           where=np.isfinite(factors))
+        return self._edge_costs
+
+    def path_cost(self, path):
+        ''' Cost of a path (list of positions or PathArray) along edge_costs, inf if it takes a missing edge '''
+        if hasattr(path, 'cells'):   # PathArray
+            positions = np.stack(np.divmod(np.asarray(path.cells, dtype=np.int64), path.cols), axis=1)
+        else:
+            positions = np.asarray([tuple(p) for p in path], dtype=np.int64).reshape(-1, 2)
+        if len(positions) < 2:
+            return 0.0
+        moves = np.diff(positions, axis=0)
+        if np.any(np.abs(moves) > 1):
+            return np.inf
+        k = (moves[:, 1] + 1) * 3 + (moves[:, 0] + 1)
+        return float(self.edge_costs()[positions[:-1, 0], positions[:-1, 1], k].sum())
+
+    def fingerprint(self, costs=True):
+        ''' Returns a hash identifying the occupancy layout of the map (and its costs, for a weighted map,
+            unless costs is False) '''
+        digest = hashlib.sha1(str(self.occupancy_map.shape).encode())
+        digest.update(np.ascontiguousarray(self.occupancy_map, dtype=np.int8).tobytes())
+        if costs and self.weighted:   # 没有代价层的地图 fingerprint 不变
+            digest.update(np.ascontiguousarray(self.cell_costs()).tobytes())
+            if self.one_way is not None:
+                digest.update(np.ascontiguousarray(self.one_way).tobytes())
+        return digest.hexdigest()
+
     # str地图转化为int matrice
     def _map_2_occupancy_map(self):
         ''' Takes the matrix and converts it into a float array '''
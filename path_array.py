@@ -0,0 +1,99 @@
+# 紧凑路径：用 int32 的 flat index (row * cols + col) 数组代替 (row, col) 元组列表
+#
+# 每个路径点 4 字节（元组列表约 100+ 字节），长度计算是向量化的。
+# 对外接口（calculate_path 的返回值、CBS 的输入输出）仍使用元组列表，转换见 to_list() / as_path_array()。
+
+import numpy as np
+
+
+class PathArray:
+    """Path stored as a NumPy int32 array of flat cell indices"""
+    __slots__ = ('cells', 'cols')
+
+    def __init__(self, cells, cols):
+        self.cells = np.asarray(cells, dtype=np.int32)
+        self.cols = int(cols)
+
+    @classmethod
+    def from_positions(cls, positions, cols):
+        ''' Builds a PathArray from a list of (row, col) '''
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        return cls(positions[:, 0] * cols + positions[:, 1], cols)
+
+    def positions(self):
+        ''' (n, 2) array of (row, col) '''
+        rows, cols = np.divmod(self.cells, self.cols)
+        return np.stack((rows, cols), axis=1)
+
+    def to_list(self):
+        ''' Legacy format: list of (row, col) tuples of Python ints '''
+        rows, cols = np.divmod(self.cells, self.cols)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    def length(self):
+        ''' Euclidean length, equal bit for bit to AntColony's former step-by-step sum '''
+        if len(self.cells) < 2:
+            return 0
+        rows, cols = np.divmod(self.cells.astype(np.int64), self.cols)
+        steps = np.sqrt(np.diff(rows) ** 2 + np.diff(cols) ** 2)
+        return np.cumsum(steps)[-1]   # cumsum 按顺序累加，与逐步相加的舍入相同
+
+    def pad(self, n):
+        ''' Path of n steps, the last cell repeated (robots wait at their goal); truncated if longer '''
+        if n <= len(self.cells):
+            return PathArray(self.cells[:n], self.cols)
+        return PathArray(np.concatenate((self.cells, np.full(n - len(self.cells), self.cells[-1], dtype=np.int32))),
+                         self.cols)
+
+    def at(self, t):
+        ''' Cell index occupied at time t, the goal after the path ends '''
+        return int(self.cells[min(t, len(self.cells) - 1)])
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return PathArray(self.cells[key], self.cols)
+        return divmod(int(self.cells[key]), self.cols)
+
+    def __eq__(self, other):
+        if isinstance(other, PathArray):
+            return self.cols == other.cols and np.array_equal(self.cells, other.cells)
+        try:
+            return self.to_list() == [tuple(p) for p in other]
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'PathArray({self.to_list()})'
+
+
+def as_path_array(path, cols):
+    """PathArray of a path given as a PathArray or a list of (row, col)"""
+    if isinstance(path, PathArray):
+        return path
+    return PathArray.from_positions(path, cols)
+
+
+def to_list(path):
+    """Legacy list of (row, col) tuples of a path given in either format"""
+    if isinstance(path, PathArray):
+        return path.to_list()
+    return [tuple(p) for p in path]
+
+
+def path_length(path):
+    """Euclidean length of a path given in either format, same value as the former per-step loop"""
+    if isinstance(path, PathArray):
+        return path.length()
+    if len(path) < 2:
+        return 0
+    positions = np.asarray(path, dtype=np.int64).reshape(-1, 2)
+    steps = np.sqrt(np.sum(np.diff(positions, axis=0) ** 2, axis=1))
+    return np.cumsum(steps)[-1]
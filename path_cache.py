@@ -0,0 +1,264 @@
+# 路径缓存：机器人反复执行相同的 起点 -> 终点 任务时，直接返回之前找到的最优路径
+#
+#   cache = PathCache('output/paths.sqlite', max_entries=10000)
+#   hit = cache.get(robot_map, start, goal)
+#   if hit is None:
+#       prior = cache.warm_start_prior(robot_map, start, goal)   # 相邻任务的缓存路径作为初始信息素
+#       ...
+#       cache.put(robot_map, start, goal, path, cost)
+#
+# 键为 (地图版本, 起点, 终点, 约束摘要)，地图版本默认为 Map.fingerprint()，也可以传入固定的 map_id
+# （如地图文件名），这时地图改变后需要调用 invalidate_cells()。
+# 地图改变后 update_map() 把仍然可以通行的路径转到新的版本下，经过被封堵格子的路径被删除；
+# get() 也会检查路径上的格子，已被封堵的条目会被删除并视为未命中。
+# 存储使用 sqlite（默认在内存中，给出文件路径时持久化），按最近使用时间 (LRU) 淘汰。
+
+import hashlib
+import sqlite3
+import numpy as np
+from map_class import edge_direction_index, EDGE_DIRECTIONS
+from pheromone_store import INITIAL_PHEROMONE
+
+MEMORY = ':memory:'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    map_id TEXT NOT NULL,
+    sr INTEGER NOT NULL, sc INTEGER NOT NULL, gr INTEGER NOT NULL, gc INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    cost REAL NOT NULL,
+    path BLOB NOT NULL,
+    used INTEGER NOT NULL,
+    UNIQUE (map_id, sr, sc, gr, gc, digest)
+);
+CREATE INDEX IF NOT EXISTS paths_used ON paths (used);
+CREATE TABLE IF NOT EXISTS path_cells (
+    path_id INTEGER NOT NULL REFERENCES paths (id) ON DELETE CASCADE,
+    map_id TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    col INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS path_cells_cell ON path_cells (map_id, row, col);
+CREATE INDEX IF NOT EXISTS path_cells_path ON path_cells (path_id);
+'''
+
+
+def constraint_digest(constraints):
+    """Digest of a set of AntColony constraints (CBSConstraint / CBSRangeConstraint / dicts), '' for none"""
+    if not constraints:
+        return ''
+    keys = []
+    for c in constraints:
+        if isinstance(c, dict):
+            keys.append(repr(('dict', tuple(c['pos']), c['time'])))
+        else:
+            loc = sorted(c.loc) if isinstance(c.loc, (set, frozenset)) else c.loc
+            keys.append(repr((type(c).__name__, c.agent, loc, c.timestep, getattr(c, 'end', None))))
+    return hashlib.sha1('\n'.join(sorted(keys)).encode()).hexdigest()
+
+
+class PathCache:
+    """
+    LRU cache of the best path of every (map version, start, goal, constraints)
+
+    Args:
+        filepath: sqlite database file, MEMORY (default) for a cache that is not persisted
+        max_entries: largest number of cached paths
+        max_bytes: largest total size of the cached paths (8 bytes per cell), None for no limit
+    """
+
+    def __init__(self, filepath=MEMORY, max_entries=10000, max_bytes=None):
+        self.filepath = filepath
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(filepath)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA synchronous = OFF')   # 缓存丢失只需重新规划，不需要每次提交都写盘
+        self.db.executescript(_SCHEMA)
+        self._clock = self.db.execute('SELECT COALESCE(MAX(used), 0) FROM paths').fetchone()[0]
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0, 'evicted': 0}
+
+    def _key(self, in_map, start, goal, constraints, map_id):
+        map_id = in_map.fingerprint() if map_id is None else map_id
+        return (map_id, int(start[0]), int(start[1]), int(goal[0]), int(goal[1]), constraint_digest(constraints))
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get(self, in_map, start, goal, constraints=None, map_id=None):
+        '''
+        Cached path from start to goal
+
+        Returns:
+            dict with 'path' (list of (row, col)) and 'cost', or None when not cached or when the path
+            crosses a cell that is now blocked (the entry is then removed)
+        '''
+        key = self._key(in_map, start, goal, constraints, map_id)
+        row = self.db.execute('SELECT id, cost, path FROM paths WHERE map_id = ? AND sr = ? AND sc = ? AND gr = ? '
+                              'AND gc = ? AND digest = ?', key).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        path_id, cost, blob = row
+        cells = np.frombuffer(blob, dtype=np.int32).reshape(-1, 2)
+        if not _is_free(in_map, cells):
+            with self.db:
+                self.db.execute('DELETE FROM paths WHERE id = ?', (path_id,))
+            self.stats['invalidated'] += 1
+            self.stats['misses'] += 1
+            return None
+        with self.db:
+            self.db.execute('UPDATE paths SET used = ? WHERE id = ?', (self._tick(), path_id))
+        self.stats['hits'] += 1
+        return {'path': [tuple(cell) for cell in cells.tolist()], 'cost': cost}
+
+    def put(self, in_map, start, goal, path, cost, constraints=None, map_id=None):
+        ''' Stores a path, unless a cheaper one is already cached for the same key; returns True if stored '''
+        if not path:
+            return False
+        key = self._key(in_map, start, goal, constraints, map_id)
+        cells = np.asarray([tuple(p) for p in path], dtype=np.int32).reshape(-1, 2)
+        with self.db:
+            row = self.db.execute('SELECT id, cost FROM paths WHERE map_id = ? AND sr = ? AND sc = ? AND gr = ? '
+                                  'AND gc = ? AND digest = ?', key).fetchone()
+            if row is not None:
+                if row[1] <= cost:
+                    self.db.execute('UPDATE paths SET used = ? WHERE id = ?', (self._tick(), row[0]))
+                    return False
+                self.db.execute('DELETE FROM paths WHERE id = ?', (row[0],))
+            path_id = self.db.execute('INSERT INTO paths (map_id, sr, sc, gr, gc, digest, cost, path, used) '
+                                      'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                      key + (float(cost), cells.tobytes(), self._tick())).lastrowid
+            unique = np.unique(cells, axis=0).tolist()
+            self.db.executemany('INSERT INTO path_cells (path_id, map_id, row, col) VALUES (?, ?, ?, ?)',
+                                [(path_id, key[0], r, c) for r, c in unique])
+            self._evict()
+        return True
+
+    def _evict(self):
+        ''' Removes the least recently used paths until the limits are met '''
+        count, total = self.db.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(path)), 0) FROM paths').fetchone()
+        if count <= self.max_entries and (self.max_bytes is None or total <= self.max_bytes):
+            return
+        evicted = []
+        for path_id, size in self.db.execute('SELECT id, LENGTH(path) FROM paths ORDER BY used'):
+            if count <= self.max_entries and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            evicted.append((path_id,))
+            count -= 1
+            total -= size
+        self.db.executemany('DELETE FROM paths WHERE id = ?', evicted)
+        self.stats['evicted'] += len(evicted)
+
+    def invalidate_cells(self, map_id, cells):
+        ''' Removes the paths of a map version going through any of the cells, returns how many '''
+        with self.db:
+            ids = {path_id for cell in cells for (path_id,) in self.db.execute(
+                'SELECT path_id FROM path_cells WHERE map_id = ? AND row = ? AND col = ?',
+                (map_id, int(cell[0]), int(cell[1])))}
+            self.db.executemany('DELETE FROM paths WHERE id = ?', [(path_id,) for path_id in ids])
+        self.stats['invalidated'] += len(ids)
+        return len(ids)
+
+    def update_map(self, in_map, previous, map_id=None):
+        '''
+        After the map changed from version `previous` (e.g. its fingerprint before set_cell), keeps the paths
+        of that version that are still free under the current version (map_id, the fingerprint by default)
+        and removes the others; returns the number of removed paths
+        '''
+        current = in_map.fingerprint() if map_id is None else map_id
+        removed = []
+        with self.db:
+            for path_id, blob in self.db.execute('SELECT id, path FROM paths WHERE map_id = ?', (previous,)).fetchall():
+                if not _is_free(in_map, np.frombuffer(blob, dtype=np.int32).reshape(-1, 2)):
+                    removed.append((path_id,))
+            self.db.executemany('DELETE FROM paths WHERE id = ?', removed)
+            if current != previous:
+                # 新版本下已有的条目优先
+                self.db.execute('DELETE FROM paths WHERE map_id = ? AND EXISTS (SELECT 1 FROM paths AS p WHERE '
+                                'p.map_id = ? AND p.sr = paths.sr AND p.sc = paths.sc AND p.gr = paths.gr AND '
+                                'p.gc = paths.gc AND p.digest = paths.digest)', (previous, current))
+                self.db.execute('UPDATE paths SET map_id = ? WHERE map_id = ?', (current, previous))
+                self.db.execute('UPDATE path_cells SET map_id = ? WHERE map_id = ?', (current, previous))
+        self.stats['invalidated'] += len(removed)
+        return len(removed)
+
+    def invalidate(self, map_id=None):
+        ''' Removes every path of a map version, or every path '''
+        with self.db:
+            if map_id is None:
+                self.db.execute('DELETE FROM paths')
+            else:
+                self.db.execute('DELETE FROM paths WHERE map_id = ?', (map_id,))
+
+    def neighbours(self, in_map, start, goal, radius=2, constraints=None, map_id=None):
+        '''
+        Cached paths of the pairs whose start and goal are both within radius cells (Chebyshev distance) of
+        the requested ones, also the reversed paths of the opposite missions
+
+        Returns:
+            list of (path, distance) sorted by distance
+        '''
+        key = self._key(in_map, start, goal, constraints, map_id)
+        map_id, sr, sc, gr, gc, digest = key
+        found = []
+        for a, b, reverse in (((sr, sc), (gr, gc), False), ((gr, gc), (sr, sc), True)):
+            rows = self.db.execute('SELECT sr, sc, gr, gc, path FROM paths WHERE map_id = ? AND digest = ? '
+                                   'AND sr BETWEEN ? AND ? AND sc BETWEEN ? AND ? AND gr BETWEEN ? AND ? '
+                                   'AND gc BETWEEN ? AND ?',
+                                   (map_id, digest, a[0] - radius, a[0] + radius, a[1] - radius, a[1] + radius,
+                                    b[0] - radius, b[0] + radius, b[1] - radius, b[1] + radius))
+            for r0, c0, r1, c1, blob in rows:
+                cells = np.frombuffer(blob, dtype=np.int32).reshape(-1, 2)
+                distance = max(abs(r0 - a[0]), abs(c0 - a[1]), abs(r1 - b[0]), abs(c1 - b[1]))
+                found.append((cells[::-1] if reverse else cells, distance))
+        found.sort(key=lambda item: item[1])
+        return [([tuple(cell) for cell in cells.tolist()], distance) for cells, distance in found]
+
+    def warm_start_prior(self, in_map, start=None, goal=None, radius=2, strength=4.0, constraints=None, map_id=None):
+        '''
+        Warm-start pheromone prior for AntColony(pheromone_prior=...) from the cached paths of neighbouring
+        missions: the edges of those paths get up to 1 + strength, closer missions weigh more
+
+        Returns:
+            (rows, cols, 9) pheromone array, or None when no neighbouring path is cached
+        '''
+        start = in_map.initial_node if start is None else start
+        goal = in_map.final_node if goal is None else goal
+        found = [(path, distance) for path, distance in
+                 self.neighbours(in_map, start, goal, radius, constraints, map_id) if _is_free(in_map, path)]
+        if not found:
+            return None
+        rows, cols = in_map.occupancy_map.shape
+        deposit = np.zeros((rows, cols, len(EDGE_DIRECTIONS)))
+        total_weight = 0.0
+        for path, distance in found:
+            weight = 1.0 / (1.0 + distance)
+            for a, b in zip(path[:-1], path[1:]):
+                deposit[a[0], a[1], edge_direction_index(a, b)] += weight
+            total_weight += weight
+        return INITIAL_PHEROMONE + strength * deposit / total_weight
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM paths').fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _is_free(in_map, cells):
+    """Whether every cell of a path is inside the map and free"""
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    rows, cols = in_map.occupancy_map.shape
+    inside = (cells[:, 0] >= 0) & (cells[:, 0] < rows) & (cells[:, 1] >= 0) & (cells[:, 1] < cols)
+    if not inside.all():
+        return False
+    return bool(np.all(np.asarray(in_map.occupancy_map)[cells[:, 0], cells[:, 1]] == 1))
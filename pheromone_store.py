@@ -0,0 +1,91 @@
+# 信息素快照：保存/复用蚁群的信息素，实现热启动
+
+import os
+import numpy as np
+
+DEFAULT_FOLDER = 'pheromones'
+INITIAL_PHEROMONE = 1.0   # 与 Map.Nodes.compute_edges 中的初始信息素一致
+
+
+def snapshot_filename(fingerprint, start, goal):
+    """File name of the snapshot for a (map, start, goal) triple"""
+    return '{}_{}_{}_{}_{}.npz'.format(fingerprint[:16], int(start[0]), int(start[1]), int(goal[0]), int(goal[1]))
+
+
+def save_snapshot(colony, folder=DEFAULT_FOLDER):
+    """
+    Save the pheromone state of a colony, keyed by map fingerprint, start and goal
+
+    Args:
+        colony: AntColony whose map has a single initial_node / final_node
+        folder: directory where the snapshots are stored
+
+    Returns:
+        Path of the written snapshot
+    """
+    os.makedirs(folder, exist_ok=True)
+    fingerprint = colony.map.fingerprint()
+    start, goal = colony.map.initial_node, colony.map.final_node
+    filepath = os.path.join(folder, snapshot_filename(fingerprint, start, goal))
+    np.savez_compressed(filepath,
+                        pheromone=colony.get_pheromone_matrix().astype(np.float32),
+                        fingerprint=fingerprint,
+                        start=np.asarray(start, dtype=np.int32),
+                        goal=np.asarray(goal, dtype=np.int32))
+    return filepath
+
+
+def find_snapshots(fingerprint, start, goal, radius=0, folder=DEFAULT_FOLDER):
+    """
+    List the snapshots of the same map whose start and goal are both
+    within `radius` cells (Chebyshev distance) of the requested ones
+
+    Returns:
+        List of (filepath, distance) sorted by distance
+    """
+    if not os.path.isdir(folder):
+        return []
+    prefix = fingerprint[:16] + '_'
+    found = []
+    for name in os.listdir(folder):
+        if not (name.startswith(prefix) and name.endswith('.npz')):
+            continue
+        try:
+            sr, sc, gr, gc = [int(v) for v in name[len(prefix):-len('.npz')].split('_')]
+        except ValueError:
+            continue
+        distance = max(abs(sr - start[0]), abs(sc - start[1]), abs(gr - goal[0]), abs(gc - goal[1]))
+        if distance <= radius:
+            found.append((os.path.join(folder, name), distance))
+    found.sort(key=lambda item: item[1])
+    return found
+
+
+def load_snapshot(in_map, start=None, goal=None, radius=0, strength=1.0, folder=DEFAULT_FOLDER):
+    """
+    Build a warm-start pheromone prior for AntColony(pheromone_prior=...)
+
+    Snapshots of the same map within `radius` are blended, closer pairs weigh more.
+    The blend is then pulled back towards the initial pheromone:
+    prior = 1.0 + strength * (blend - 1.0), strength=0 gives a cold start.
+
+    Returns:
+        (rows, cols, 9) pheromone array, or None if no snapshot matches
+    """
+    start = in_map.initial_node if start is None else start
+    goal = in_map.final_node if goal is None else goal
+    fingerprint = in_map.fingerprint()
+    blend = None
+    total_weight = 0.0
+    for filepath, distance in find_snapshots(fingerprint, start, goal, radius, folder):
+        with np.load(filepath) as data:
+            if str(data['fingerprint']) != fingerprint:   # 前缀碰撞
+                continue
+            pheromone = data['pheromone'].astype(np.float64)
+        weight = 1.0 / (1.0 + distance)
+        blend = weight * pheromone if blend is None else blend + weight * pheromone
+        total_weight += weight
+    if blend is None:
+        return None
+    blend /= total_weight
+    return INITIAL_PHEROMONE + strength * (blend - INITIAL_PHEROMONE)
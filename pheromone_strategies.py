@@ -0,0 +1,183 @@
+# 信息素更新策略：Ant System / MAX-MIN Ant System / Ant Colony System / Rank-based Ant System
+#
+# 每个策略提供三个钩子，由 AntColony 调用：
+#   select_edge(edges, attractiveness) -- 返回选中的边；返回 None 时使用轮盘赌选择
+#   local_update(colony, edge)         -- 蚂蚁走过一条边后立即调用
+#   update(colony)                     -- 每次迭代结束后调用 (colony.paths 已按长度排序)，返回最大信息素
+
+import numpy as np
+
+
+class AntSystem:
+    """Classic Ant System: evaporate every edge, every ant deposits Q/length"""
+
+    def select_edge(self, edges, attractiveness, rng=np.random):
+        return None
+
+    def local_update(self, colony, edge):
+        pass
+
+    def update(self, colony):
+        colony.evaporate()
+        max_pheromone = 0
+        for path in colony.paths:
+            path_length = colony.calculate_euclidean_distance(path)
+            max_pheromone = max(max_pheromone, colony.deposit(path, colony.pheromone_adding_constant/float(path_length)))
+        return max_pheromone
+
+
+class RankBasedAntSystem(AntSystem):
+    """
+    Rank-based Ant System: only the `weight`-1 best ants of the iteration deposit,
+    the r-th one with weight (weight - r), plus the best-so-far path with weight `weight`
+    """
+
+    def __init__(self, weight=6):
+        self.weight = weight
+        self.best_path = None
+        self.best_length = np.inf
+
+    def update(self, colony):
+        colony.evaporate()
+        if colony.paths:
+            length = colony.calculate_euclidean_distance(colony.paths[0])
+            if length < self.best_length:
+                self.best_path, self.best_length = colony.paths[0], length
+        max_pheromone = 0
+        for r, path in enumerate(colony.paths[:self.weight - 1]):
+            amount = (self.weight - 1 - r) * colony.pheromone_adding_constant / colony.calculate_euclidean_distance(path)
+            max_pheromone = max(max_pheromone, colony.deposit(path, amount))
+        if self.best_path is not None:
+            amount = self.weight * colony.pheromone_adding_constant / self.best_length
+            max_pheromone = max(max_pheromone, colony.deposit(self.best_path, amount))
+        return max_pheromone
+
+
+class MaxMinAntSystem(AntSystem):
+    """
+    MAX-MIN Ant System: a single path deposits (iteration-best or best-so-far) and the
+    pheromone is clamped to [tau_min, tau_max]. When tau_max is None it follows the
+    best-so-far length, tau_max = Q / (rho * L_best), and tau_min = tau_max * min_ratio.
+    After `stagnation_limit` iterations without improvement every edge is reset to tau_max.
+    """
+
+    def __init__(self, tau_min=None, tau_max=None, use_best_so_far=False, min_ratio=0.05, stagnation_limit=30):
+        self.tau_min = tau_min
+        self.tau_max = tau_max
+        self.use_best_so_far = use_best_so_far
+        self.min_ratio = min_ratio
+        self.stagnation_limit = stagnation_limit
+        self.best_path = None
+        self.best_length = np.inf
+        self.stagnation = 0
+
+    def bounds(self, colony):
+        ''' Returns the (tau_min, tau_max) currently in use '''
+        tau_max = self.tau_max
+        if tau_max is None:
+            tau_max = colony.pheromone_adding_constant / (colony.evaporation_factor * self.best_length)
+        tau_min = self.tau_min if self.tau_min is not None else tau_max * self.min_ratio
+        return tau_min, tau_max
+
+    def update(self, colony):
+        iteration_best = colony.paths[0] if colony.paths else None
+        if iteration_best is not None:
+            length = colony.calculate_euclidean_distance(iteration_best)
+            if length < self.best_length:
+                self.best_path, self.best_length = iteration_best, length
+                self.stagnation = 0
+            else:
+                self.stagnation += 1
+        else:
+            self.stagnation += 1
+        if self.best_path is None:      # 还没有任何蚂蚁到达终点
+            colony.evaporate()
+            return 0
+
+        tau_min, tau_max = self.bounds(colony)
+        if self.stagnation_limit and self.stagnation >= self.stagnation_limit:
+            for node in colony.iter_nodes():
+                for edge in node.edges:
+                    edge['Pheromone'] = tau_max
+            self.stagnation = 0
+            return tau_max
+
+        colony.evaporate()
+        if self.use_best_so_far or iteration_best is None:
+            path, length = self.best_path, self.best_length
+        else:
+            path, length = iteration_best, colony.calculate_euclidean_distance(iteration_best)
+        colony.deposit(path, colony.pheromone_adding_constant / length)
+        max_pheromone = 0
+        for node in colony.iter_nodes():
+            for edge in node.edges:
+                edge['Pheromone'] = min(max(edge['Pheromone'], tau_min), tau_max)
+                if edge['Pheromone'] > max_pheromone:
+                    max_pheromone = edge['Pheromone']
+        return max_pheromone
+
+
+class AntColonySystem(AntSystem):
+    """
+    Ant Colony System: pseudo-random-proportional rule (the most attractive edge is
+    taken with probability q0), local update tau = (1 - xi) * tau + xi * tau0 on every
+    traversed edge, and a global update restricted to the best-so-far path:
+    tau = (1 - rho) * tau + rho * Q / L_best
+    """
+
+    def __init__(self, q0=0.9, xi=0.1, tau0=1.0):
+        self.q0 = q0
+        self.xi = xi
+        self.tau0 = tau0
+        self.best_path = None
+        self.best_length = np.inf
+
+    def select_edge(self, edges, attractiveness, rng=np.random):
+        if rng.random() < self.q0:
+            return edges[int(np.argmax(attractiveness))]
+        return None
+
+    def local_update(self, colony, edge):
+        edge['Pheromone'] = (1.0 - self.xi) * edge['Pheromone'] + self.xi * self.tau0
+
+    def update(self, colony):
+        if colony.paths:
+            length = colony.calculate_euclidean_distance(colony.paths[0])
+            if length < self.best_length:
+                self.best_path, self.best_length = colony.paths[0], length
+        if self.best_path is None:
+            return 0
+        rho = colony.evaporation_factor
+        amount = rho * colony.pheromone_adding_constant / self.best_length
+        max_pheromone = 0
+        for j in range(len(self.best_path)-1):
+            edge = colony.find_edge(self.best_path[j], self.best_path[j+1])
+            if edge is not None:
+                edge['Pheromone'] = (1.0 - rho) * edge['Pheromone'] + amount
+                max_pheromone = max(max_pheromone, edge['Pheromone'])
+        return max_pheromone
+
+
+STRATEGIES = {
+    'as': AntSystem,
+    'rank': RankBasedAntSystem,
+    'mmas': MaxMinAntSystem,
+    'acs': AntColonySystem,
+}
+
+
+def make_strategy(strategy=None, **kwargs):
+    """
+    Returns an update strategy instance
+
+    Args:
+        strategy: None (Ant System), one of 'as', 'rank', 'mmas', 'acs', or a strategy instance
+        kwargs: passed to the strategy constructor when a name is given
+    """
+    if strategy is None:
+        return AntSystem()
+    if isinstance(strategy, str):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown pheromone update strategy: {strategy}")
+        return STRATEGIES[strategy](**kwargs)
+    return strategy
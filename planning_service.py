@@ -0,0 +1,245 @@
+# 异步规划服务：供 asyncio 程序（如车队管理器）调用的规划接口
+#
+#   service = PlanningService()
+#   result = await service.plan_aco(in_map, start, goal, timeout=2.0)
+#   result = await service.plan_astar(in_map, start, goal)
+#   result = await service.plan_cbs(in_map, k=1)
+#
+# 规划在 executor 中运行，不阻塞事件循环。timeout 是规划的截止时间：规划器在截止时间停止，
+# 返回当前最优结果（timed_out 为 True）。
+# 相同的请求（地图 fingerprint、起点、终点、约束、参数和 timeout 都相同）在运行期间只执行一次，结果共享；
+# 每个蚁群任务使用自己的随机数流（seed 参数），不受同时运行的其它任务影响。
+# 完整的结果保存在 LRU 缓存中，之后任何 timeout 的相同请求都可以使用。截止时间前停止或被取消的结果不完整，
+# 不缓存。缓存键包含地图 fingerprint：同一个 Map 对象改变后（如 set_cell），
+# 下一次请求时它旧 fingerprint 的结果会被清除；invalidate() 可以主动清除。
+
+import asyncio
+import copy
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ant_colony import AntColony
+from astar_path_planning import AStarPlanner
+from conflict_free import cbs_search
+
+ACO_DEFAULTS = {'n_ants': 20, 'iterations': 30, 'evaporation_factor': 0.3,
+                'pheromone_adding_constant': 100, 'alpha': 2, 'beta': 4}
+DEADLINE_GRACE = 1.0   # 规划器在截止时间后还要完成当前一步（如蚁群的一次迭代），等待结果时多留的秒数
+
+
+def _robot_map(in_map, start, goal):
+    """Single-robot view of a map, sharing its grids (the planners only read them)"""
+    robot = copy.copy(in_map)
+    robot.initial_node = list(start)
+    robot.final_node = list(goal)
+    robot.nodes_array = []
+    return robot
+
+
+def _constraint_key(c):
+    if isinstance(c, dict):
+        return ('dict', c['pos'], c['time'])
+    return (type(c).__name__, c.agent, c.loc, c.timestep, getattr(c, 'end', None))
+
+
+def _stop_check(deadline, cancel):
+    """should_stop callable of a job: its deadline has passed or it was cancelled; None without either"""
+    if deadline is None and cancel is None:
+        return None
+    return lambda: (cancel is not None and cancel.is_set()) or (deadline is not None and time.monotonic() >= deadline)
+
+
+def _run_aco(in_map, start, goal, constraints, params, deadline, cancel):
+    robot = _robot_map(in_map, start, goal)
+    robot.nodes_array = robot._create_nodes()
+    # 任务自己的随机数流：线程池中的其它任务不会改变它的抽样。使用 RandomState (与 np.random.seed 相同的
+    # 种子方式)，同一个 seed 的结果与脚本中 np.random.seed(seed) 后运行的蚁群相同
+    rng = np.random.RandomState(params.get('seed'))
+    colony = AntColony(robot, params['n_ants'], params['iterations'], params['evaporation_factor'],
+                       params['pheromone_adding_constant'], params['alpha'], params['beta'], constraints,
+                       update_strategy=params.get('update_strategy'), colony_sizing=params.get('colony_sizing'),
+                       rng=rng)
+    return colony.calculate_path_anytime(deadline=deadline, should_stop=cancel.is_set if cancel else None)
+
+
+def _run_astar(in_map, start, goal, deadline, cancel):
+    status = in_map.robot_status(start, goal)
+    planner = AStarPlanner(in_map)
+    route = None
+    if status == 'ok':
+        route = planner.find_path(tuple(start), tuple(goal), should_stop=_stop_check(deadline, cancel))
+    cancelled = planner.stopped and cancel is not None and cancel.is_set()
+    timed_out = planner.stopped and not cancelled
+    if planner.stopped:
+        status = 'cancelled' if cancelled else 'time_limit'
+    elif status == 'ok' and not route:
+        status = 'no_path'
+    return {'route': route or [], 'status': status, 'timed_out': timed_out, 'cancelled': cancelled}
+
+
+def _run_cbs(in_map, params, radius, k, deadline, cancel):
+    # CBS 以 A* 路径为初始解；无法规划的机器人停在起点
+    planner = AStarPlanner(in_map)
+    should_stop = _stop_check(deadline, cancel)
+    statuses = in_map.check_robots()
+    routes, robots = [], []
+    for start, goal, status in zip(in_map.initial_node, in_map.final_node, statuses):
+        # 截止时间已过或任务被取消后不再规划，下面的 CBS 会立即以 time_limit / cancelled 停止
+        route = None
+        if status == 'ok' and not (should_stop is not None and should_stop()):
+            route = planner.find_path(tuple(start), tuple(goal), should_stop=should_stop)
+        routes.append(route or [tuple(start)])
+        robots.append(_robot_map(in_map, start, goal))
+    max_seconds = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+    result = cbs_search(routes, robots, params['n_ants'], params['iterations'], params['evaporation_factor'],
+                        params['pheromone_adding_constant'], params['alpha'], params['beta'], radius=radius, k=k,
+                        max_seconds=max_seconds, should_stop=cancel.is_set if cancel else None)
+    return {'routes': result['routes'], 'statuses': statuses, 'status': result['status'],
+            'timed_out': result['status'] == 'time_limit', 'cancelled': result['status'] == 'cancelled'}
+
+
+class _Job:
+    def __init__(self, future, cancel):
+        self.future = future
+        self.cancel = cancel
+        self.waiters = 0
+
+
+class PlanningService:
+    """
+    asyncio front-end for AntColony, AStarPlanner and CBS with request coalescing and a result cache
+
+    Args:
+        executor: concurrent.futures executor running the jobs, a ThreadPoolExecutor by default.
+                  Cancelling ACO jobs early needs a thread executor; with a process pool the
+                  job only stops at its deadline
+        max_workers: size of the default executor
+        cache_size: number of results kept (LRU), 0 disables the cache
+    """
+
+    def __init__(self, executor=None, max_workers=None, cache_size=128):
+        self._own_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()   # key -> result
+        self._inflight = {}           # key -> _Job
+        self._fingerprints = weakref.WeakKeyDictionary()   # Map -> 上次请求时的 fingerprint
+        self.stats = {'runs': 0, 'coalesced': 0, 'cache_hits': 0, 'cancelled': 0}
+
+    async def plan_aco(self, in_map, start, goal, constraints=None, timeout=None, **params):
+        """
+        Ant colony route from start to goal
+
+        Args:
+            constraints: AntColony constraints (CBSConstraint / CBSRangeConstraint / dicts)
+            timeout: seconds; the colony stops at the deadline and returns its best route so far (timed_out)
+            params: overrides of ACO_DEFAULTS, update_strategy, colony_sizing and seed (random seed of the
+                    job's own RandomState; without it the job draws fresh entropy)
+
+        Returns:
+            dict of AntColony.calculate_path_anytime (route, status, length, iterations, ...)
+        """
+        params = dict(ACO_DEFAULTS, **params)
+        constraints = list(constraints or [])
+        key = ('aco', self._fingerprint(in_map), tuple(start), tuple(goal),
+               tuple(sorted(map(repr, map(_constraint_key, constraints)))), tuple(sorted(params.items())))
+        return await self._submit(key, _run_aco, (in_map, tuple(start), tuple(goal), constraints, params), timeout)
+
+    async def plan_astar(self, in_map, start, goal, timeout=None):
+        """A* route from start to goal: dict with 'route' ([] if none), 'status' ('time_limit' when
+        the search is stopped at the timeout), 'timed_out' and 'cancelled'"""
+        key = ('astar', self._fingerprint(in_map), tuple(start), tuple(goal))
+        return await self._submit(key, _run_astar, (in_map, tuple(start), tuple(goal)), timeout)
+
+    async def plan_cbs(self, in_map, radius=0, k=0, timeout=None, **params):
+        """Conflict-free routes for every robot of a multi-robot map: dict with 'routes', 'statuses',
+        'status' (of cbs_search, 'time_limit' when stopped at the timeout with the best routes so far),
+        'timed_out' and 'cancelled'"""
+        params = dict(ACO_DEFAULTS, **params)
+        key = ('cbs', self._fingerprint(in_map), tuple(map(tuple, in_map.initial_node)),
+               tuple(map(tuple, in_map.final_node)), radius, k, tuple(sorted(params.items())))
+        return await self._submit(key, _run_cbs, (in_map, params, radius, k), timeout)
+
+    async def _submit(self, key, fn, args, timeout=None):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return copy.deepcopy(self._cache[key])
+        # 只与 timeout 相同的请求共享任务：没有截止时间的请求不能拿到截止时间前停止的结果
+        job_key = key + (timeout,)
+        job = self._inflight.get(job_key)
+        if job is None:
+            cancel = threading.Event()
+            job_cancel = cancel if isinstance(self.executor, ThreadPoolExecutor) else None
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args, deadline, job_cancel)
+            job = self._inflight[job_key] = _Job(future, cancel)
+            future.add_done_callback(lambda f, key=key, job_key=job_key, job=job: self._finish(key, job_key, job, f))
+            self.stats['runs'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        job.waiters += 1
+        try:
+            # 规划器自己在截止时间停止并返回当前最优结果；
+            # shield：一个调用方取消或超时不会取消其他调用方共享的任务
+            result = await asyncio.wait_for(asyncio.shield(job.future),
+                                            None if timeout is None else timeout + DEADLINE_GRACE)
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0 and not job.future.done():
+                # 没有调用方在等待了：通知任务尽快停止，之后的相同请求重新开始
+                job.cancel.set()
+                self.stats['cancelled'] += 1
+                if self._inflight.get(job_key) is job:
+                    del self._inflight[job_key]
+        return copy.deepcopy(result)
+
+    def _finish(self, key, job_key, job, future):
+        if self._inflight.get(job_key) is job:
+            del self._inflight[job_key]
+        if job.cancel.is_set() or future.cancelled() or future.exception() is not None or not self.cache_size:
+            return   # 被取消的结果可能不完整，不缓存
+        result = future.result()
+        if result.get('timed_out') or result.get('cancelled'):
+            return   # 截止时间前停止的结果只属于这个 timeout，不缓存
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _fingerprint(self, in_map):
+        """Current fingerprint of a map, dropping the cached results of its previous layout"""
+        fingerprint = in_map.fingerprint()
+        previous = self._fingerprints.get(in_map)
+        if previous is not None and previous != fingerprint:
+            self._drop(previous)
+        self._fingerprints[in_map] = fingerprint
+        return fingerprint
+
+    def _drop(self, fingerprint):
+        for key in [key for key in self._cache if key[1] == fingerprint]:
+            del self._cache[key]
+
+    def invalidate(self, in_map=None):
+        """Drops the cached results of a map (all results when in_map is None)"""
+        if in_map is None:
+            self._cache.clear()
+            return
+        previous = self._fingerprints.pop(in_map, None)
+        if previous is not None:
+            self._drop(previous)
+        self._drop(in_map.fingerprint())
+
+    def close(self):
+        """Shuts down the executor if the service created it"""
+        if self._own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
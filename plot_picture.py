@@ -4,6 +4,8 @@ import numpy as np
 import random
 import os
 from matplotlib.animation import FuncAnimation, PillowWriter
+from matplotlib.colors import hsv_to_rgb
+from PIL import Image
 
 # 随机颜色
 def randomcolor():
@@ -41,87 +43,98 @@ def plot_picture(display,route,n,map): #display 是否画图； route 所有路
     plt.close()
 
 
-def motion_move(route, map, save_gif=False, output_folder='output', filename='motion_animation.gif'):
-    # 按路径长度排序
-    route_sort = sorted(route, key=lambda i: len(i), reverse=True)
-    max_length = len(route_sort[0])  # 使用最长路径的长度
+def conflict_cells(positions, previous=None):
+    """
+    Cells in conflict at one time step, found with hashing instead of comparing every pair
+
+    Args:
+        positions: (n, 2) int array, position of every robot at time t
+        previous: (n, 2) int array of the positions at t-1, to detect swaps
+
+    Returns:
+        list of (row, col): cells occupied by more than one robot, and both cells of every
+        swap between t-1 and t (a moved p -> q while b moved q -> p)
+    """
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+    if previous is not None:
+        previous = np.asarray(previous, dtype=np.int64).reshape(-1, 2)
+    both = positions if previous is None else np.concatenate((positions, previous))
+    width = int(both[:, 1].max()) + 1 if len(both) else 1
+    keys = positions[:, 0] * width + positions[:, 1]   # 每个格子一个整数键
+    values, counts = np.unique(keys, return_counts=True)
+    cells = set(values[counts > 1].tolist())
+    if previous is not None:
+        prev_keys = previous[:, 0] * width + previous[:, 1]
+        moving = prev_keys != keys
+        size = width * (int(both[:, 0].max()) + 1)
+        forward = prev_keys[moving] * size + keys[moving]    # 移动 p -> q 编码为一个整数
+        swapped = np.isin(keys[moving] * size + prev_keys[moving], forward)
+        cells.update(prev_keys[moving][swapped].tolist())
+        cells.update(keys[moving][swapped].tolist())
+    return [divmod(c, width) for c in sorted(cells)]
+
+
+def padded_positions(route):
+    """(T, n, 2) array of every robot's position at every time step, robots wait at their goal"""
+    horizon = max(len(path) for path in route)
+    frames = np.empty((horizon, len(route), 2), dtype=np.int64)
+    for i, path in enumerate(route):
+        path = np.asarray([tuple(p) for p in path], dtype=np.int64).reshape(-1, 2)
+        frames[:len(path), i] = path
+        frames[len(path):, i] = path[-1]
+    return frames
+
+
+def motion_move(route, map, save_gif=False, output_folder='output', filename='motion_animation.gif', show=True):
+    # 背景、起点和终点只画一次；每一帧只更新轨迹和机器人位置的数据 (set_data)，显示时使用 blit
+    frames = padded_positions(route)
+    max_length = len(frames)
     
     # 创建图形窗口
     fig, ax = plt.subplots(figsize=(10, 8))
+    ax.imshow(map.occupancy_map, cmap='gray', interpolation='nearest')
+    
+    # 绘制起点和终点
+    for i in range(len(map.initial_node)):
+        ax.plot(map.initial_node[i][1], map.initial_node[i][0], 'bo', markersize=8, label='Start' if i == 0 else "")
+        ax.plot(map.final_node[i][1], map.final_node[i][0], 'r*', markersize=8, label='Goal' if i == 0 else "")
     
-    # 为每条路径生成随机颜色
-    colors = [randomcolor() for _ in range(len(route_sort))]
+    # 为每条路径生成随机颜色，并创建轨迹和当前位置（三角形标记）的 artist
+    colors = [randomcolor() for _ in range(len(route))]
+    trails = [ax.plot([], [], marker='o', color=colors[i], markersize=4, label=f'Path {i+1}')[0]
+              for i in range(len(route))]
+    markers = [ax.plot([], [], marker='^', color=colors[i], markersize=10, linestyle='')[0]
+               for i in range(len(route))]
+    conflicts = ax.plot([], [], 'ro', markersize=8, alpha=0.5, linestyle='')[0]
+    title = ax.text(0.5, 1.01, '', transform=ax.transAxes, ha='center', va='bottom')
+    if len(route) <= 10:  # 机器人很多时图例会盖住地图
+        ax.legend(loc='best')
+    artists = trails + markers + [conflicts, title]
     
     # 初始化函数
     def init():
-        ax.clear()
-        ax.imshow(map.occupancy_map, cmap='gray', interpolation='nearest')
-        return []
+        for artist in trails + markers + [conflicts]:
+            artist.set_data([], [])
+        title.set_text('')
+        return artists
     
     # 动画更新函数
     def animate(t):
-        ax.clear()
-        ax.imshow(map.occupancy_map, cmap='gray', interpolation='nearest')
-        
-        # 存储当前时间步的所有位置
-        current_positions = []
-        next_positions = []
-        
-        # 绘制每条路径到当前时间步
-        for i, path in enumerate(route_sort):
-            x = []
-            y = []
+        for i, path in enumerate(route):
             # 获取到当前时间步的路径点
-            for p in path[:t+1]:
-                x.append(p[1])
-                y.append(p[0])
-            ax.plot(x, y, marker='o', color=colors[i], markersize=4, label=f'Path {i+1}')
-            
-            # 记录当前位置和下一位置
-            if t+1 < len(path):
-                current_positions.append((path[t+1][0], path[t+1][1], i))
-            if t + 2  < len(path):
-                next_positions.append((path[t+2][0], path[t+2][1], i))
-        for i, path in enumerate(route_sort):
-            # 突出显示当前时间步的位置点（使用三角形标记）
-            if t < len(path):
-                current_point = path[t]
-                ax.plot(current_point[1], current_point[0], marker='^', color=colors[i], 
-                       markersize=10,  
-                       label=f'Current {i+1}' if t == 0 else "")
+            trail = frames[:min(t + 1, len(path)), i]
+            trails[i].set_data(trail[:, 1], trail[:, 0])
+            markers[i].set_data([frames[t, i, 1]], [frames[t, i, 0]])
         
-        # 检查当前时间步的位置冲突
-        for i in range(len(current_positions)): # 遍历所有当前位置
-            for j in range(i+1, len(current_positions)): # 遍历当前位置之后的所有位置
-                pos1, pos2 = current_positions[i], current_positions[j]
-                if pos1[0] == pos2[0] and pos1[1] == pos2[1]:
-                    ax.plot(pos1[1], pos1[0], 'ro', markersize=8, alpha=0.5)
-        
-        # 检查当前时间步和下一时间步之间的交换
-        for i in range(len(current_positions)):
-            for j in range(len(next_positions)):
-                if current_positions[i][2] != next_positions[j][2]:  # 确保不是同一条路径
-                    curr_pos = current_positions[i]
-                    next_pos = next_positions[j]
-                    # 检查是否存在交换
-                    if (curr_pos[0] == next_pos[0] and curr_pos[1] == next_pos[1] and
-                        next_positions[i][0] == current_positions[j][0] and 
-                        next_positions[i][1] == current_positions[j][1]):
-                        ax.plot(curr_pos[1], curr_pos[0], 'ro', markersize=8, alpha=0.5)
-                        ax.plot(next_pos[1], next_pos[0], 'ro', markersize=8, alpha=0.5)
-        
-        # 绘制起点和终点
-        for i in range(len(map.initial_node)):
-            ax.plot(map.initial_node[i][1], map.initial_node[i][0], 'bo', markersize=8, label='Start' if i == 0 else "")
-            ax.plot(map.final_node[i][1], map.final_node[i][0], 'r*', markersize=8, label='Goal' if i == 0 else "")
-        
-        ax.set_title(f'Time Step: {t}')
-        ax.legend(loc='best')
-        return []
+        # 当前时间步的位置冲突，以及上一步到当前步之间的交换
+        cells = conflict_cells(frames[t], frames[t - 1] if t > 0 else None)
+        conflicts.set_data([c[1] for c in cells], [c[0] for c in cells])
+        title.set_text(f'Time Step: {t}')
+        return artists
     
     # 创建动画
     anim = FuncAnimation(fig, animate, init_func=init, frames=max_length, 
-                        interval=1000, blit=False, repeat=True)
+                        interval=1000, blit=True, repeat=True)
     
     # 如果需要保存GIF
     if save_gif:
@@ -137,5 +150,98 @@ def motion_move(route, map, save_gif=False, output_folder='output', filename='mo
         anim.save(filepath, writer=writer)
         print(f"GIF动画已保存到: {filepath}")
     
-    plt.show()
+    if show:
+        plt.show()
     plt.close()
+    return anim
+
+
+# 调色板中的固定颜色，之后是每个机器人的颜色和它的轨迹颜色
+_PALETTE_FIXED = [(0, 0, 0), (255, 255, 255), (40, 80, 255), (255, 160, 0), (255, 0, 0)]
+_OBSTACLE, _FREE, _START, _GOAL, _CONFLICT = range(5)
+
+
+def _robot_palette(n):
+    """Distinct robot colours and their lighter trail colours (at most 125 of each, reused cyclically)"""
+    m = max(1, min(n, 125))
+    hsv = np.stack([np.arange(m) / m, np.full(m, 0.85), np.full(m, 0.9)], axis=1)
+    robot = (hsv_to_rgb(hsv) * 255).astype(np.uint8)
+    trail = (robot * 0.45 + 255 * 0.55).astype(np.uint8)
+    return m, robot, trail
+
+
+def _open_writer(filepath, fps):
+    """Frame writer: imageio streams frames to disk when it is installed, otherwise Pillow
+    keeps the (1 byte per pixel, paletted) frames until close()"""
+    try:
+        import imageio.v2 as imageio
+    except ImportError:
+        imageio = None
+    if imageio is not None:
+        writer = imageio.get_writer(filepath, fps=fps) if not filepath.endswith('.gif') else \
+            imageio.get_writer(filepath, duration=1000.0 / fps, loop=0)
+        return lambda frame, palette: writer.append_data(palette[frame]), writer.close
+
+    frames = []
+
+    def append(frame, palette):
+        image = Image.fromarray(frame, mode='P')
+        image.putpalette(palette.ravel().tolist())
+        frames.append(image)
+
+    def close():
+        if frames:
+            frames[0].save(filepath, save_all=True, append_images=frames[1:], duration=1000.0 / fps, loop=0)
+
+    return append, close
+
+
+def render_motion(route, map, filepath, cell_size=6, fps=5, trail=True):
+    """
+    Renders a replay of the routes without matplotlib: every frame is rasterised with NumPy
+    (one palette index per cell, scaled up to cell_size pixels) and written as it is produced
+
+    Args:
+        route: list of paths, each a list of (row, col)
+        map: Map, for the occupancy grid, starts and goals
+        filepath: output file, .gif (Pillow or imageio) or a video format supported by imageio
+        cell_size: pixels per map cell
+        fps: frames (time steps) per second
+        trail: draw the cells every robot has already visited
+
+    Returns:
+        number of frames written
+    """
+    frames = padded_positions(route)
+    n = len(route)
+    m, robot_rgb, trail_rgb = _robot_palette(n)
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    palette[:len(_PALETTE_FIXED)] = _PALETTE_FIXED
+    palette[5:5 + m] = robot_rgb
+    palette[5 + m:5 + 2 * m] = trail_rgb
+    robot_index = (5 + np.arange(n) % m).astype(np.uint8)
+    trail_index = (5 + m + np.arange(n) % m).astype(np.uint8)
+
+    # 静态背景只计算一次
+    background = np.where(np.asarray(map.occupancy_map) != 0, _FREE, _OBSTACLE).astype(np.uint8)
+    for start, goal in zip(map.initial_node, map.final_node):
+        background[start[0], start[1]] = _START
+        background[goal[0], goal[1]] = _GOAL
+
+    folder = os.path.dirname(filepath)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    append, close = _open_writer(filepath, fps)
+    try:
+        for t in range(len(frames)):
+            rows, cols = frames[t, :, 0], frames[t, :, 1]
+            if trail:
+                background[rows, cols] = trail_index   # 轨迹累积在背景中
+            cells = background.copy()
+            cells[rows, cols] = robot_index
+            for r, c in conflict_cells(frames[t], frames[t - 1] if t > 0 else None):
+                cells[r, c] = _CONFLICT
+            append(np.repeat(np.repeat(cells, cell_size, axis=0), cell_size, axis=1), palette)
+    finally:
+        close()
+    return len(frames)
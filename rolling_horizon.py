@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# 滚动时域 (rolling-horizon) 多机器人规划，用于持续运行、不断有新任务的场景（参考 RHCR / Windowed HCA*）
+#
+# 每个机器人有完整的路径，但冲突只在之后 window 个时间步内解决 (do_conflict_free 的 horizon)，
+# 每 replan_every 步（或有机器人得到新目标时）重新规划一次；已有的路径保留下来继续使用。
+# 冲突解决只处理路径的前 window + k + 1 步，之后的部分原样接回，
+# 因此每次规划的开销只与机器人数和 window 有关，与路径长度和运行时间无关。
+#
+#   planner = RollingHorizonPlanner(map, window=10, replan_every=5)
+#   planner.add_goal(0, (12, 30))
+#   for _ in range(100):
+#       positions = planner.step()
+
+from collections import deque
+from batch_planning import BatchPlanner
+from conflict_free import do_conflict_free
+from telemetry import NULL_SINK
+
+# do_conflict_free 的蚁群参数；等待策略解决冲突时不会用到
+CBS_PARAMS = {'ants': 20, 'iterations': 30, 'p': 0.3, 'Q': 100, 'alpha': 2, 'beta': 4}
+
+
+class RollingHorizonPlanner:
+    """
+    Lifelong multi-robot planning with windowed conflict resolution
+
+    Args:
+        in_map: Map; its initial_node are the robots' positions at time 0
+        window: conflicts are resolved for this many timesteps ahead
+        replan_every: timesteps between two replans, must be smaller than window so that
+                      robots only execute conflict-free steps
+        radius, k: footprint and k-robustness, see do_conflict_free
+        planner: BatchPlanner of the map, to share its cached distance fields
+        telemetry: sink receiving the 'replan' and 'goal_reached' events
+    """
+
+    def __init__(self, in_map, window=10, replan_every=5, radius=0, k=0, planner=None, telemetry=NULL_SINK):
+        if not 0 < replan_every < window:
+            raise ValueError("replan_every must be between 1 and window - 1")
+        self.map = in_map
+        self.window = window
+        self.replan_every = replan_every
+        self.radius = radius
+        self.k = k
+        self.planner = planner if planner is not None else BatchPlanner(in_map)
+        self.telemetry = telemetry
+        self.positions = [tuple(pos) for pos in in_map.initial_node]
+        n = len(self.positions)
+        self.plans = [[pos] for pos in self.positions]   # 每个机器人从当前位置开始的剩余路径
+        self.goals = [None] * n                          # 当前目标，None 为空闲
+        self.queues = [deque() for _ in range(n)]        # 之后的目标
+        self.time = 0
+        self.completed = []   # (robot, goal, time)
+        self._needs_plan = set()
+        self._last_replan = None
+
+    def add_goal(self, robot, goal):
+        ''' Queues a goal for a robot, it is started as soon as the robot is idle '''
+        self.queues[robot].append(tuple(goal))
+        if self.goals[robot] is None:
+            self._next_goal(robot)
+
+    def _next_goal(self, robot):
+        self.goals[robot] = self.queues[robot].popleft() if self.queues[robot] else None
+        if self.goals[robot] is not None:
+            self._needs_plan.add(robot)
+
+    def replan(self):
+        ''' Plans the robots with a new goal, then resolves the conflicts of the next window timesteps '''
+        robots = sorted(self._needs_plan)
+        self._needs_plan.clear()
+        if robots:
+            result = self.planner.plan_many([(self.positions[r], self.goals[r]) for r in robots])
+            for r, path in zip(robots, result['paths']):
+                if path is None:   # 不可达的目标：放弃并取下一个
+                    self.completed.append((r, self.goals[r], None))
+                    self.plans[r] = [self.positions[r]]
+                    self._next_goal(r)
+                else:
+                    self.plans[r] = [tuple(p) for p in path]
+
+        # 只把时间窗口内的部分交给冲突解决，之后的部分在解决后接回（等待策略只插入等待，不改变格子顺序）
+        cut = self.window + self.k + 1
+        heads = [plan[:cut] for plan in self.plans]
+        tails = [plan[cut:] for plan in self.plans]
+        n = len(heads)
+        solved = do_conflict_free(heads, [self.map] * n, CBS_PARAMS['ants'], CBS_PARAMS['iterations'],
+                                  CBS_PARAMS['p'], CBS_PARAMS['Q'], CBS_PARAMS['alpha'], CBS_PARAMS['beta'],
+                                  self.telemetry, self.radius, self.k, horizon=self.window)
+        self.plans = [list(head) + tail for head, tail in zip(solved, tails)]
+        self._last_replan = self.time
+        if self.telemetry.enabled:
+            self.telemetry.event('replan', time=self.time, new_plans=len(robots))
+
+    def step(self):
+        ''' Advances one timestep (replanning first when due), returns the positions of the robots '''
+        if (self._needs_plan or self._last_replan is None
+                or self.time - self._last_replan >= self.replan_every):
+            self.replan()
+        for r, plan in enumerate(self.plans):
+            if len(plan) > 1:
+                plan.pop(0)
+            self.positions[r] = plan[0]
+            if self.goals[r] is not None and len(plan) == 1 and plan[0] == self.goals[r]:
+                self.completed.append((r, self.goals[r], self.time + 1))
+                if self.telemetry.enabled:
+                    self.telemetry.event('goal_reached', robot=r, goal=self.goals[r], time=self.time + 1)
+                self._next_goal(r)
+        self.time += 1
+        return list(self.positions)
+
+    def run(self, steps):
+        ''' Runs steps timesteps, returns the positions of every robot at every timestep (including the start) '''
+        history = [list(self.positions)]
+        for _ in range(steps):
+            history.append(self.step())
+        return history
+
+
+if __name__ == '__main__':
+    # 示例：仓库地图上机器人不断领取随机任务
+    import time
+    import numpy as np
+    from map_class import Map
+    from gen_map import CELL_CHARS, generate_large_map
+
+    rng = np.random.default_rng(0)
+    grid, _, _ = generate_large_map(40, 40, 20, 0.2, 'warehouse', seed=0)
+    in_map = Map(in_map=CELL_CHARS[grid])
+    free = np.argwhere(in_map.occupancy_map == 1)
+    planner = RollingHorizonPlanner(in_map, window=8, replan_every=4)
+    for robot in range(len(planner.positions)):
+        for _ in range(5):
+            planner.add_goal(robot, tuple(free[rng.integers(len(free))]))
+    t0 = time.perf_counter()
+    planner.run(200)
+    done = [c for c in planner.completed if c[2] is not None]
+    print(f"{len(done)} tasks completed in 200 timesteps, {time.perf_counter() - t0:.2f}s")
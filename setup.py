@@ -0,0 +1,12 @@
+# 只用于编译可选的 C 扩展（蚂蚁行走内核，见 ant_walk.py）：
+#
+#   python setup.py build_ext --inplace
+#
+# 没有编译时 ant_walk 使用纯 Python 实现，结果完全相同。
+
+from setuptools import Extension, setup
+
+setup(
+    name='aco-mapf-kernels',
+    ext_modules=[Extension('_ant_walk', ['_ant_walk.c'], optional=True)],
+)
@@ -0,0 +1,99 @@
+# 运行时指标输出：替代热循环中的 print()
+#
+# AntColony 每次迭代调用 sink.iteration(metrics)，do_conflict_free 调用 sink.event(name, **fields)。
+# 默认的 NullSink 的 enabled = False，此时不会收集任何指标。
+
+import time
+
+
+class NullSink:
+    """Discards everything; the default, costs one attribute check per iteration"""
+    enabled = False
+    timing = False           # 是否用 perf_counter 统计各阶段耗时
+    pheromone_stats = False  # 是否统计整张图的信息素 min / mean / max
+
+    def iteration(self, metrics):
+        pass
+
+    def event(self, name, **fields):
+        pass
+
+
+class PrintSink(NullSink):
+    """Prints the same progress lines the planners used to print"""
+    enabled = True
+
+    def __init__(self, timing=False):
+        self.timing = timing
+
+    def iteration(self, metrics):
+        print("max_pheromone: ", metrics['max_pheromone'])
+        if metrics['best_length'] is not None:
+            print('Iteration: ', metrics['iteration'], ' path length: ', round(metrics['best_length'], 2),
+                  ' nodes: ', metrics['nodes'])
+        if self.timing:
+            print('Phase times: ', {k: round(v, 6) for k, v in metrics['phase_times'].items()})
+
+    def event(self, name, **fields):
+        print(name + ': ' + ', '.join(f'{k}={v}' for k, v in fields.items()))
+
+
+class RecordingSink(NullSink):
+    """Keeps every metrics dict and event in memory, e.g. for benchmarks"""
+    enabled = True
+
+    def __init__(self, timing=False, pheromone_stats=False):
+        self.timing = timing
+        self.pheromone_stats = pheromone_stats
+        self.iterations = []
+        self.events = []
+
+    def iteration(self, metrics):
+        self.iterations.append(metrics)
+
+    def event(self, name, **fields):
+        self.events.append(dict(fields, event=name))
+
+    def phase_totals(self):
+        ''' Sums the phase times over all recorded iterations '''
+        totals = {}
+        for metrics in self.iterations:
+            for phase, seconds in metrics.get('phase_times', {}).items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return totals
+
+
+class CallbackSink(NullSink):
+    """Forwards metrics and events to user callables"""
+    enabled = True
+
+    def __init__(self, on_iteration=None, on_event=None, timing=False, pheromone_stats=False):
+        self.on_iteration = on_iteration
+        self.on_event = on_event
+        self.timing = timing
+        self.pheromone_stats = pheromone_stats
+
+    def iteration(self, metrics):
+        if self.on_iteration is not None:
+            self.on_iteration(metrics)
+
+    def event(self, name, **fields):
+        if self.on_event is not None:
+            self.on_event(name, fields)
+
+
+class PhaseTimer:
+    """Accumulates perf_counter time per phase name"""
+
+    def __init__(self):
+        self.times = {}
+
+    def add(self, phase, start):
+        ''' Adds the time elapsed since `start` (a perf_counter value) to `phase` '''
+        self.times[phase] = self.times.get(phase, 0.0) + time.perf_counter() - start
+
+    def reset(self):
+        self.times = {}
+
+
+NULL_SINK = NullSink()
@@ -0,0 +1,62 @@
+# ant_walk 内核与 AntColony 的 Python 循环必须在同一个种子下得到完全相同的路径
+# (python -m pytest test_ant_walk.py；C 扩展没有编译时只比较纯 Python 内核)
+
+import copy
+import os
+import numpy as np
+import pytest
+import ant_walk
+from ant_colony import AntColony
+from map_class import Map
+
+MAPS = ['middle.txt', 'big.txt', 'narrow.txt', 'map3.txt']
+STRATEGIES = [None, 'mmas', 'rank']
+
+
+def _run(map_name, strategy, seed=0):
+    """Best route and per-iteration best routes of every robot of a map"""
+    np.random.seed(seed)
+    in_map = Map(map_name)
+    results = []
+    for start, goal in zip(in_map.initial_node, in_map.final_node):
+        robot = copy.deepcopy(in_map)
+        robot.initial_node, robot.final_node = start, goal
+        robot.nodes_array = robot._create_nodes()
+        colony = AntColony(robot, 10, 8, 0.3, 100, 2, 4, update_strategy=strategy)
+        route = colony.calculate_path()
+        results.append((route, [list(map(tuple, path)) for path in colony.res]))
+    return results
+
+
+@pytest.fixture(autouse=True)
+def _in_repo(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))   # Map 从 ./maps/ 读取
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+@pytest.mark.parametrize('map_name', MAPS)
+def test_python_kernel_matches_loop(monkeypatch, map_name, strategy):
+    monkeypatch.setattr(AntColony, 'use_walk_kernel', False)
+    expected = _run(map_name, strategy)
+    monkeypatch.setattr(AntColony, 'use_walk_kernel', True)
+    monkeypatch.setattr(ant_walk, '_ant_walk', None)
+    assert _run(map_name, strategy) == expected
+
+
+@pytest.mark.skipif(ant_walk._ant_walk is None, reason='C extension not built (python setup.py build_ext --inplace)')
+@pytest.mark.parametrize('strategy', STRATEGIES)
+@pytest.mark.parametrize('map_name', MAPS)
+def test_c_kernel_matches_loop(monkeypatch, map_name, strategy):
+    monkeypatch.setattr(AntColony, 'use_walk_kernel', False)
+    expected = _run(map_name, strategy)
+    monkeypatch.setattr(AntColony, 'use_walk_kernel', True)
+    assert ant_walk._bit_generator_capsule() is not None
+    assert _run(map_name, strategy) == expected
+
+
+def test_missing_bit_generator_falls_back_to_python(monkeypatch):
+    monkeypatch.setattr(AntColony, 'use_walk_kernel', False)
+    expected = _run('middle.txt', None)
+    monkeypatch.setattr(AntColony, 'use_walk_kernel', True)
+    monkeypatch.setattr(ant_walk, '_bit_generator_capsule', lambda rng: None)
+    assert _run('middle.txt', None) == expected
@@ -0,0 +1,227 @@
+# 轨迹日志：替代打印到 output/*.txt 的路径列表
+#
+# 一个 .traj 文件只追加写入，可以保存多次运行（生产环境中每一次规划都追加到同一个归档文件）。
+# 文件以 MAGIC 开头，之后是一串 chunk，每个 chunk 为 16 字节的头 (tag, 保留, payload 长度) 加 payload，
+# payload 补齐到 8 字节，因此路径数据在文件中是对齐的，读取时直接 memmap，不需要解析：
+#   HEAD -- 一次运行的开始：JSON（地图 fingerprint、形状、起点/终点、参数、随机种子 ...）
+#   MAP  -- 可选：地图字符矩阵，每格 1 字节，用于脱离地图文件回放
+#   PATH -- 一个机器人在某一阶段的路径：JSON 元数据 (stage, agent, length) + int32 flat index 数组
+#
+#   with TrajectoryWriter('output/runs.traj', map, params={...}, seed=0) as log:
+#       log.write_routes('initial', route)
+#       log.write_routes('conflict_free', route_sort)
+#   runs = load_trajectories('output/runs.traj')
+#   motion_move(runs[-1].routes('conflict_free'), runs[-1].load_map())
+
+import ast
+import json
+import os
+import struct
+import sys
+import time
+import numpy as np
+from path_array import PathArray, as_path_array
+
+MAGIC = b'ACOTRAJ\x01'
+CHUNK = struct.Struct('<4sIQ')   # tag, 保留, payload 长度
+META_LENGTH = struct.Struct('<I')
+ALIGN = 8
+
+
+def _padded(data):
+    return data + b'\0' * (-len(data) % ALIGN)
+
+
+def _meta_bytes(meta):
+    ''' JSON metadata prefixed by its length, padded so that what follows is aligned '''
+    raw = json.dumps(meta, separators=(',', ':')).encode()
+    return _padded(META_LENGTH.pack(len(raw)) + raw)
+
+
+class TrajectoryWriter:
+    """
+    Appends one run (header, optional map and the routes of every stage) to a .traj file
+
+    Args:
+        filepath: .traj file, created if missing, otherwise appended to
+        in_map: Map of the run, for its fingerprint, shape, starts and goals
+        params: planner parameters recorded in the header (JSON serialisable)
+        seed: random seed of the run, if any
+        store_map: also store the map cells, so that the run can be replayed without the map file
+        meta: further header fields (e.g. map_name)
+    """
+
+    def __init__(self, filepath, in_map, params=None, seed=None, store_map=False, **meta):
+        folder = os.path.dirname(filepath)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.filepath = filepath
+        self.cols = int(in_map.occupancy_map.shape[1])
+        self._file = open(filepath, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        header = dict(meta,
+                      fingerprint=in_map.fingerprint(),
+                      shape=[int(v) for v in in_map.occupancy_map.shape],
+                      starts=[[int(v) for v in pos] for pos in _positions(in_map.initial_node)],
+                      goals=[[int(v) for v in pos] for pos in _positions(in_map.final_node)],
+                      params=params or {},
+                      seed=seed,
+                      created=time.time())
+        self._chunk(b'HEAD', _padded(json.dumps(header, separators=(',', ':')).encode()))
+        if store_map:
+            cells = np.asarray(in_map.in_map, dtype=str)
+            self._chunk(b'MAP\0', _padded(np.char.encode(cells, 'ascii').astype('S1').tobytes()))
+        self._file.flush()
+
+    def _chunk(self, tag, payload):
+        self._file.write(CHUNK.pack(tag, 0, len(payload)))
+        self._file.write(payload)
+
+    def write_path(self, stage, agent, path):
+        ''' Appends the path of one robot, given as a PathArray or a list of (row, col) '''
+        cells = as_path_array(path, self.cols).cells.astype('<i4', copy=False)
+        meta = {'stage': stage, 'agent': int(agent), 'length': len(cells)}
+        self._chunk(b'PATH', _meta_bytes(meta) + _padded(cells.tobytes()))
+
+    def write_routes(self, stage, routes):
+        ''' Appends the paths of every robot for one stage (e.g. 'initial', 'conflict_free') '''
+        for agent, path in enumerate(routes):
+            self.write_path(stage, agent, path)
+        self._file.flush()   # 每个阶段写完就落盘，进程中断时之前的阶段仍可读取
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _positions(nodes):
+    ''' initial_node / final_node as a list of positions, also for single-robot maps '''
+    if len(nodes) and np.ndim(nodes[0]) == 0:
+        return [nodes]
+    return list(nodes)
+
+
+class TrajectoryRun:
+    """One run read from a .traj file; the paths are PathArrays backed by the memory-mapped file"""
+
+    def __init__(self, header):
+        self.header = header
+        self.cols = header['shape'][1]
+        self.stages = {}   # stage -> {agent: PathArray}
+        self._map_cells = None
+
+    def add_path(self, stage, agent, cells):
+        self.stages.setdefault(stage, {})[agent] = PathArray(cells, self.cols)   # int32 视图，不复制
+
+    def paths(self, stage):
+        ''' PathArrays of a stage, ordered by robot '''
+        agents = self.stages.get(stage, {})
+        return [agents[i] for i in sorted(agents)]
+
+    def routes(self, stage):
+        ''' Legacy routes of a stage (lists of (row, col)), as motion_move / plot_picture expect '''
+        return [path.to_list() for path in self.paths(stage)]
+
+    def load_map(self, map_name=None):
+        '''
+        Map of the run, with its starts and goals: rebuilt from the stored cells, or read
+        from map_name (default: the map_name of the header), checked against the fingerprint
+        '''
+        from map_class import Map
+        if self._map_cells is not None:
+            in_map = Map(in_map=self._map_cells.astype(str))
+        else:
+            map_name = map_name or self.header.get('map_name')
+            if map_name is None:
+                raise ValueError("The run has no stored map and no map_name")
+            in_map = Map(map_name)
+            if in_map.fingerprint() != self.header['fingerprint']:
+                raise ValueError(f"{map_name} is not the map of this run (fingerprint mismatch)")
+        in_map.initial_node = [tuple(pos) for pos in self.header['starts']]
+        in_map.final_node = [tuple(pos) for pos in self.header['goals']]
+        return in_map
+
+    def __repr__(self):
+        counts = {stage: len(agents) for stage, agents in self.stages.items()}
+        return f"TrajectoryRun({self.header.get('map_name', self.header['fingerprint'][:16])}, {counts})"
+
+
+def load_trajectories(filepath):
+    """
+    Reads every run of a .traj file; path data is not copied but memory-mapped
+
+    Returns:
+        list of TrajectoryRun in the order they were written
+    """
+    data = np.memmap(filepath, dtype=np.uint8, mode='r')
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{filepath} is not a trajectory log")
+    runs = []
+    offset = len(MAGIC)
+    while offset + CHUNK.size <= len(data):
+        tag, _, size = CHUNK.unpack(bytes(data[offset:offset + CHUNK.size]))
+        start = offset + CHUNK.size
+        if start + size > len(data):
+            break   # 写到一半的 chunk（进程中断），忽略
+        if tag == b'HEAD':
+            runs.append(TrajectoryRun(json.loads(bytes(data[start:start + size]).rstrip(b'\0'))))
+        elif not runs:
+            raise ValueError(f"{filepath}: data before the first run header")
+        elif tag == b'MAP\0':
+            rows, cols = runs[-1].header['shape']
+            runs[-1]._map_cells = data[start:start + rows * cols].view('S1').reshape(rows, cols)
+        elif tag == b'PATH':
+            (length,) = META_LENGTH.unpack(bytes(data[start:start + META_LENGTH.size]))
+            meta = json.loads(bytes(data[start + META_LENGTH.size:start + META_LENGTH.size + length]))
+            cells_start = start + META_LENGTH.size + length
+            cells_start += -cells_start % ALIGN
+            cells = data[cells_start:cells_start + 4 * meta['length']].view('<i4')
+            runs[-1].add_path(meta['stage'], meta['agent'], cells)
+        offset = start + size
+    return runs
+
+
+def convert_text_log(text_path, filepath, in_map, **meta):
+    """
+    Converts a former printed dump (lines 'All routes before conflict resolution: [...]' and
+    'Conflict-free routes: [...]') into a run of a .traj file
+
+    Returns:
+        list of the stages found
+    """
+    stages = {'All routes before conflict resolution:': 'initial', 'Conflict-free routes:': 'conflict_free',
+              'Path found:': 'initial'}
+    found = []
+    with open(text_path, encoding='utf-8', errors='replace') as f, \
+            TrajectoryWriter(filepath, in_map, source=os.path.basename(text_path), **meta) as log:
+        for line in f:
+            for prefix, stage in stages.items():
+                if line.startswith(prefix) and stage not in found:
+                    routes = ast.literal_eval(line[len(prefix):].strip())
+                    log.write_routes(stage, routes if prefix != 'Path found:' else [routes])
+                    found.append(stage)
+    return found
+
+
+def dump_text(filepath, out=None):
+    """Writes the runs of a .traj file in the former text format, for reading or diffing"""
+    out = out or sys.stdout
+    for run in load_trajectories(filepath):
+        header = {k: v for k, v in run.header.items() if k not in ('starts', 'goals')}
+        print(f"Run: {json.dumps(header)}", file=out)
+        for stage in run.stages:
+            print(f"{stage}: {run.routes(stage)}", file=out)
+        print(file=out)
+
+
+if __name__ == '__main__':
+    # python trajectory_log.py output/runs.traj  -- 以文本形式查看日志
+    for name in sys.argv[1:]:
+        dump_text(name)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# 蚁群参数调优：在一组场景上比较参数配置，把每个地图类别的最佳参数写入 aco_params.json
+#
+#   python tune_params.py --map-class medium-cluttered                 # successive halving (racing)
+#   python tune_params.py --map-class small-open --method sweep        # 每个配置跑完所有场景
+#   python tune_params.py --map-class medium-open --configs 64 --workers 8 --time-weight 0.5
+#
+# 每个 (配置, 场景) 的结果为：路径长度与最短路径之比 (cost ratio) 的平均值和每个机器人的平均耗时。
+# 配置的得分 = cost ratio + time_weight * 秒，越小越好。
+# successive halving：所有配置先在少量场景上运行，只保留得分最好的 1/eta 进入下一轮，
+# 下一轮的场景数乘以 eta，差的配置在早期就被淘汰。所有配置使用相同的场景和随机种子，比较是成对的。
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing as mp
+import random
+import time
+import numpy as np
+from map_class import Map
+from ant_colony import AntColony
+from batch_planning import BatchPlanner
+from gen_map import CELL_CHARS, generate_large_map
+from aco_params import DEFAULT_FILE, DEFAULT_PARAMS, map_class, save_params
+from benchmark import robot_maps
+
+# 参数空间（iterations 固定，由 --iterations 指定）
+SPACE = {
+    'n_ants': [10, 20, 40, 80],
+    'alpha': [1, 2, 3],
+    'beta': [2, 4, 6, 8],
+    'evaporation_factor': [0.1, 0.3, 0.5],
+    'pheromone_adding_constant': [10, 100, 1000],
+}
+# 各地图类别生成场景时使用的 (边长, 障碍密度)，生成的地图会再用 map_class 检查
+CLASS_SCENARIOS = {
+    'small-open': (12, 0.1),
+    'small-cluttered': (14, 0.3),
+    'medium-open': (40, 0.1),
+    'medium-cluttered': (48, 0.3),
+    'large-open': (80, 0.1),
+    'large-cluttered': (96, 0.3),
+}
+FAILED_RATIO = 3.0   # 没有找到路径时计入的 cost ratio
+
+_scenarios = None    # 工作进程中的场景列表，见 _init_worker
+
+
+def make_scenarios(args):
+    """
+    Generated maps of the requested class, each with the shortest distance of every robot
+
+    Returns:
+        list of dicts with 'name', 'map' and 'optimal' (shortest distance of every robot)
+    """
+    side, density = CLASS_SCENARIOS[args.map_class]
+    scenarios = []
+    seed = args.seed
+    while len(scenarios) < args.scenarios and seed < args.seed + 20 * args.scenarios:
+        template = args.templates[seed % len(args.templates)]
+        grid, _, _ = generate_large_map(side, side, args.robots, density, template, seed=seed)
+        seed += 1
+        in_map = Map(in_map=CELL_CHARS[grid])
+        if map_class(in_map) != args.map_class:
+            continue
+        result = BatchPlanner(in_map).plan_many(list(zip(in_map.initial_node, in_map.final_node)),
+                                                return_paths=False)
+        if not np.all(result['reachable']) or np.any(np.asarray(result['distances']) == 0):
+            continue
+        scenarios.append({'name': f'{template}:{seed - 1}', 'map': in_map,
+                          'optimal': [float(d) for d in result['distances']]})
+    if not scenarios:
+        raise ValueError(f"No usable scenario generated for {args.map_class}")
+    return scenarios
+
+
+def sample_configs(count, seed):
+    """DEFAULT_PARAMS first, then `count - 1` distinct configurations drawn from SPACE (all if count is None)"""
+    grid = [dict(zip(SPACE, values)) for values in itertools.product(*SPACE.values())]
+    default = {key: DEFAULT_PARAMS[key] for key in SPACE}
+    grid = [config for config in grid if config != default]
+    if count is not None and count - 1 < len(grid):
+        grid = random.Random(seed).sample(grid, count - 1)
+    return [default] + grid
+
+
+def evaluate(config, scenario, iterations, seed):
+    """
+    Runs one configuration on one scenario, one colony per robot
+
+    Returns:
+        dict with 'ratio' (mean cost ratio), 'seconds' (mean time per robot) and 'failures'
+    """
+    ratios, seconds, failures = [], [], 0
+    for i, (robot, optimal) in enumerate(zip(robot_maps(scenario['map']), scenario['optimal'])):
+        np.random.seed(seed + i)   # 所有配置使用相同的随机种子
+        robot.nodes_array = robot._create_nodes()
+        colony = AntColony(robot, config['n_ants'], iterations, config['evaporation_factor'],
+                           config['pheromone_adding_constant'], config['alpha'], config['beta'])
+        t0 = time.perf_counter()
+        path = colony.calculate_path()
+        seconds.append(time.perf_counter() - t0)
+        if path:
+            ratios.append(float(colony.calculate_euclidean_distance(path)) / optimal)
+        else:
+            ratios.append(FAILED_RATIO)
+            failures += 1
+    return {'ratio': float(np.mean(ratios)), 'seconds': float(np.mean(seconds)), 'failures': failures}
+
+
+def _init_worker(scenarios):
+    global _scenarios
+    _scenarios = scenarios
+
+
+def _evaluate_task(task):
+    config_id, config, scenario_id, iterations, seed = task
+    return config_id, scenario_id, evaluate(config, _scenarios[scenario_id], iterations, seed)
+
+
+class Tuner:
+    """
+    Evaluates configurations on scenarios, in parallel, remembering every (configuration, scenario) result
+
+    Args:
+        configs: list of parameter dicts (keys of SPACE)
+        scenarios: see make_scenarios
+        iterations: colony iterations of every run
+        workers: number of processes, 1 runs everything in this process
+        seed: base random seed
+        time_weight: weight of the seconds in the score
+    """
+
+    def __init__(self, configs, scenarios, iterations, workers=1, seed=0, time_weight=0.0):
+        self.configs = configs
+        self.scenarios = scenarios
+        self.iterations = iterations
+        self.seed = seed
+        self.time_weight = time_weight
+        self.results = {}   # (config_id, scenario_id) -> evaluate() 的结果
+        self.eliminated = {}   # config_id -> 被淘汰时的轮次
+        self._pool = mp.Pool(workers, _init_worker, (scenarios,)) if workers > 1 else None
+        if self._pool is None:
+            _init_worker(scenarios)
+
+    def run(self, config_ids, scenario_ids):
+        ''' Evaluates the configurations on the scenarios, skipping the pairs already done '''
+        tasks = [(c, self.configs[c], s, self.iterations, self.seed * 1000003 + s * 101)
+                 for c in config_ids for s in scenario_ids if (c, s) not in self.results]
+        results = self._pool.imap_unordered(_evaluate_task, tasks) if self._pool else map(_evaluate_task, tasks)
+        for config_id, scenario_id, result in results:
+            self.results[config_id, scenario_id] = result
+
+    def summary(self, config_id):
+        ''' Mean cost ratio, seconds and score of a configuration over the scenarios it ran on '''
+        runs = [result for (c, _), result in self.results.items() if c == config_id]
+        ratio = float(np.mean([run['ratio'] for run in runs]))
+        seconds = float(np.mean([run['seconds'] for run in runs]))
+        return {'params': self.configs[config_id], 'scenarios': len(runs), 'ratio': ratio, 'seconds': seconds,
+                'failures': sum(run['failures'] for run in runs), 'score': ratio + self.time_weight * seconds,
+                'eliminated_at': self.eliminated.get(config_id)}
+
+    def score(self, config_id, scenario_ids):
+        runs = [self.results[config_id, s] for s in scenario_ids]
+        return float(np.mean([run['ratio'] + self.time_weight * run['seconds'] for run in runs]))
+
+    def sweep(self):
+        ''' Every configuration on every scenario, returns the configuration ids sorted by score '''
+        ids, scenario_ids = range(len(self.configs)), range(len(self.scenarios))
+        self.run(ids, scenario_ids)
+        return sorted(ids, key=lambda c: self.score(c, scenario_ids))
+
+    def successive_halving(self, eta=3, min_scenarios=2, log=print):
+        ''' Racing: keeps the best 1/eta configurations after every rung, multiplying the scenarios by eta '''
+        alive = list(range(len(self.configs)))
+        n, rung = min(min_scenarios, len(self.scenarios)), 0
+        while True:
+            scenario_ids = range(n)
+            self.run(alive, scenario_ids)
+            alive.sort(key=lambda c: self.score(c, scenario_ids))
+            if len(alive) == 1 or n == len(self.scenarios):
+                return alive
+            keep = max(1, math.ceil(len(alive) / eta))
+            for c in alive[keep:]:
+                self.eliminated[c] = rung
+            if log:
+                best = self.summary(alive[0])
+                log(f"rung {rung}: {len(alive)} configs on {n} scenarios, keeping {keep}, "
+                    f"best ratio {best['ratio']:.3f} in {best['seconds']:.3f}s")
+            alive = alive[:keep]
+            n, rung = min(n * eta, len(self.scenarios)), rung + 1
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tune the AntColony parameters of a map class')
+    parser.add_argument('--map-class', required=True, choices=sorted(CLASS_SCENARIOS))
+    parser.add_argument('--method', choices=['halving', 'sweep'], default='halving')
+    parser.add_argument('--configs', type=int, default=27, help='number of sampled configurations, 0 for all')
+    parser.add_argument('--scenarios', type=int, default=18)
+    parser.add_argument('--robots', type=int, default=2, help='robots (colonies) per scenario')
+    parser.add_argument('--templates', nargs='*', default=['random', 'warehouse', 'rooms'])
+    parser.add_argument('--iterations', type=int, default=DEFAULT_PARAMS['iterations'])
+    parser.add_argument('--eta', type=int, default=3, help='successive halving keeps 1/eta per rung')
+    parser.add_argument('--min-scenarios', type=int, default=2, help='scenarios of the first rung')
+    parser.add_argument('--time-weight', type=float, default=0.1, help='score = cost ratio + weight * seconds')
+    parser.add_argument('--workers', type=int, default=mp.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--params-file', default=DEFAULT_FILE, help='parameter file the best configuration is written to')
+    parser.add_argument('--dry-run', action='store_true', help='do not write the parameter file')
+    parser.add_argument('--output', help='write every configuration summary to this JSON file')
+    args = parser.parse_args(argv)
+
+    scenarios = make_scenarios(args)
+    configs = sample_configs(args.configs or None, args.seed)
+    print(f"{args.map_class}: {len(configs)} configurations, {len(scenarios)} scenarios, {args.method}")
+    tuner = Tuner(configs, scenarios, args.iterations, args.workers, args.seed, args.time_weight)
+    t0 = time.perf_counter()
+    try:
+        if args.method == 'sweep':
+            ranking = tuner.sweep()
+        else:
+            ranking = tuner.successive_halving(args.eta, args.min_scenarios)
+    finally:
+        tuner.close()
+    wall = time.perf_counter() - t0
+
+    summaries = [tuner.summary(c) for c in range(len(configs))]
+    finalists = [summaries[c] for c in ranking]
+    others = sorted((s for c, s in enumerate(summaries) if c not in ranking), key=lambda s: s['score'])
+    for s in finalists + others:
+        print(f"{json.dumps(s['params']):<110} ratio {s['ratio']:6.3f}  {s['seconds']:7.3f}s  "
+              f"scenarios {s['scenarios']:3d}  failures {s['failures']}")
+    best = finalists[0]
+    print(f"Best ({wall:.1f}s, {len(tuner.results)} runs): {best['params']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'map_class': args.map_class, 'method': args.method, 'summaries': summaries}, f, indent=2)
+    if not args.dry_run:
+        params = dict(best['params'], iterations=args.iterations)
+        save_params(args.map_class, params, args.params_file, ratio=best['ratio'], seconds=best['seconds'],
+                    scenarios=best['scenarios'], method=args.method, tuned=time.strftime('%Y-%m-%d'))
+        print(f"Written to {args.params_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())